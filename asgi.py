@@ -11,18 +11,24 @@ import os
 import django
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'protocol_core.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'protocol_core.runtime_settings')
+# 服务器进程：django.setup() 时启动定时任务和后台任务 worker（见 protocol_config.apps）
+os.environ.setdefault('PROTOCOL_SERVER_PROCESS', '1')
 django.setup()
 
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 import connections.routing
+import connections.sync_routing
+import read_check.routing
 
 application = ProtocolTypeRouter({
     "http": get_asgi_application(),
     "websocket": AuthMiddlewareStack(
         URLRouter(
-            connections.routing.websocket_urlpatterns
+            connections.sync_routing.websocket_urlpatterns
+            + connections.routing.websocket_urlpatterns
+            + read_check.routing.websocket_urlpatterns
         )
     ),
 })
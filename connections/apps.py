@@ -8,3 +8,11 @@ class ConnectionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'connections'
     verbose_name = '连接管理'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+
+        from .search import setup_after_migrate
+
+        # 聊天记录全文索引（FTS5 虚拟表 / 触发器或 pg_trgm 索引）不在模型里，迁移后创建
+        post_migrate.connect(setup_after_migrate, sender=self, dispatch_uid='chat_message_search_index')
@@ -0,0 +1,206 @@
+"""
+聊天消息归档（冷存储）
+
+超过 CHAT_ARCHIVE_DAYS 天的消息按 (账号, 会话, 月份) 分组，压缩（zlib，JSON 列表）
+后写入 ChatArchiveSegment，再从 chat_message 删除，热表和它的索引只保留近期数据。
+
+- 按主键顺序分批处理，每批一个事务：写入归档段并删除对应消息
+- 仍是某个会话 last_message 的消息暂不归档（会话列表要显示），下次运行时再处理
+- 消息保留原来的 id，(created_at, id) 游标在热表和归档之间连续
+- 归档的消息不再出现在全文搜索中（FTS 触发器随删除一并移除）
+
+读取：chat_history.get_history_page 在热表不足一页时调用 load_archived，
+按游标从归档段中解压出消息（未保存的 ChatMessage 实例），调用方无需区分。
+
+用法::
+
+    from connections.archive import archive_messages
+
+    result = archive_messages(days=90)
+    result = archive_messages(days=90, dry_run=True)
+
+配置（PROTOCOL_CONFIG）：
+- CHAT_ARCHIVE_DAYS     热表保留天数，默认 90；0 表示不归档
+"""
+import json
+import logging
+import time
+import zlib
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from config import PROTOCOL_CONFIG
+from utils.coalescing import TTLCache
+from utils.db_retry import retry_on_locked
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DAYS = PROTOCOL_CONFIG.get('CHAT_ARCHIVE_DAYS', 90)
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_PAUSE = 0.05
+COMPRESS_LEVEL = 6
+
+_FIELDS = ('id', 'message_id', 'from_user', 'to_user', 'content', 'push_content', 'message_type',
+           'is_from_self', 'partner_id')
+
+# 解压后的归档段（向上翻页时会反复读取同一段）
+_segment_cache = TTLCache(maxsize=64, ttl=300)
+
+
+# ==================== 编码 ====================
+
+def encode_messages(messages):
+    """消息列表 -> (压缩数据, 原始大小)"""
+    rows = []
+    for message in messages:
+        row = {field: getattr(message, field) for field in _FIELDS}
+        row['partner_id'] = message.chat_partner
+        row['created_at'] = message.created_at.isoformat()
+        rows.append(row)
+    raw = json.dumps(rows, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return zlib.compress(raw, COMPRESS_LEVEL), len(raw)
+
+
+def decode_segment(segment):
+    """归档段 -> 按 (created_at, id) 排序的未保存 ChatMessage 列表"""
+    from .models import ChatMessage
+
+    cached = _segment_cache.get(segment.pk)
+    if cached is not None:
+        return cached
+    rows = json.loads(zlib.decompress(bytes(segment.data)).decode('utf-8'))
+    messages = []
+    for row in rows:
+        row['created_at'] = datetime.fromisoformat(row['created_at'])
+        messages.append(ChatMessage(auth_code_id=segment.auth_code_id, **row))
+    _segment_cache.set(segment.pk, messages)
+    return messages
+
+
+def _period(created_at):
+    if timezone.is_aware(created_at):
+        created_at = timezone.localtime(created_at)
+    return created_at.date().replace(day=1)
+
+
+# ==================== 归档 ====================
+
+def _archivable(cutoff):
+    from .models import ChatMessage, ChatSession
+
+    pinned = ChatSession.objects.filter(last_message__isnull=False).values('last_message_id')
+    return ChatMessage.objects.filter(created_at__lt=cutoff).exclude(pk__in=pinned)
+
+
+@retry_on_locked()
+def archive_batch(cutoff, batch_size=DEFAULT_BATCH_SIZE):
+    """归档一批（主键最小的 batch_size 条），返回 (消息数, 段数, 原始字节, 压缩字节)"""
+    from .models import ChatArchiveSegment, ChatMessage
+
+    with transaction.atomic():
+        messages = list(_archivable(cutoff).order_by('id')[:batch_size])
+        if not messages:
+            return 0, 0, 0, 0
+
+        groups = defaultdict(list)
+        for message in messages:
+            groups[(message.auth_code_id, message.chat_partner, _period(message.created_at))].append(message)
+
+        segments = []
+        raw_total = compressed_total = 0
+        for (auth_code_id, partner_id, period), group in groups.items():
+            group.sort(key=lambda m: (m.created_at, m.id))
+            data, raw_size = encode_messages(group)
+            raw_total += raw_size
+            compressed_total += len(data)
+            segments.append(ChatArchiveSegment(
+                auth_code_id=auth_code_id,
+                partner_id=partner_id,
+                period=period,
+                first_created_at=group[0].created_at,
+                last_created_at=group[-1].created_at,
+                message_count=len(group),
+                raw_size=raw_size,
+                data=data,
+            ))
+        ChatArchiveSegment.objects.bulk_create(segments)
+        ChatMessage.objects.filter(pk__in=[m.pk for m in messages]).delete()
+    return len(messages), len(segments), raw_total, compressed_total
+
+
+def archive_messages(days=ARCHIVE_DAYS, batch_size=DEFAULT_BATCH_SIZE, pause=DEFAULT_PAUSE, dry_run=False):
+    """归档超过 days 天的消息"""
+    cutoff = timezone.now() - timedelta(days=days)
+    started = time.monotonic()
+    if dry_run:
+        return {'cutoff': cutoff, 'archivable': _archivable(cutoff).count(), 'duration': 0}
+
+    result = {'cutoff': cutoff, 'archived': 0, 'segments': 0, 'raw_bytes': 0, 'compressed_bytes': 0}
+    while True:
+        count, segments, raw_size, compressed_size = archive_batch(cutoff, batch_size)
+        if not count:
+            break
+        result['archived'] += count
+        result['segments'] += segments
+        result['raw_bytes'] += raw_size
+        result['compressed_bytes'] += compressed_size
+        if count < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+    result['duration'] = round(time.monotonic() - started, 2)
+    if result['archived']:
+        logger.info('归档聊天消息 %d 条，%d 段，%d -> %d 字节', result['archived'], result['segments'],
+                    result['raw_bytes'], result['compressed_bytes'])
+    return result
+
+
+# ==================== 读取 ====================
+
+def _after(message, key):
+    return (message.created_at, message.id) > key
+
+
+def _before(message, key):
+    return (message.created_at, message.id) < key
+
+
+def load_archived(auth_code, partner_id, before=None, after=None, limit=50):
+    """按游标读取归档消息
+
+    before / after 为 (created_at, id)。只给 after 时从旧到新返回，否则从新到旧返回。
+    """
+    from .models import ChatArchiveSegment
+
+    newest_first = not (after is not None and before is None)
+    segments = ChatArchiveSegment.objects.filter(auth_code=auth_code, partner_id=partner_id)
+    if before is not None:
+        segments = segments.filter(first_created_at__lte=before[0])
+    if after is not None:
+        segments = segments.filter(last_created_at__gte=after[0])
+    if newest_first:
+        segments = segments.order_by('-last_created_at', '-id')
+    else:
+        segments = segments.order_by('first_created_at', 'id')
+
+    collected = []
+    for segment in segments:
+        # 已凑满一页且后面的段不可能比已取到的更靠前时停止（段之间的时间范围可能重叠）
+        if len(collected) >= limit:
+            boundary = collected[limit - 1].created_at
+            if newest_first and segment.last_created_at < boundary:
+                break
+            if not newest_first and segment.first_created_at > boundary:
+                break
+        messages = decode_segment(segment)
+        if before is not None:
+            messages = [m for m in messages if _before(m, before)]
+        if after is not None:
+            messages = [m for m in messages if _after(m, after)]
+        collected.extend(messages)
+        collected.sort(key=lambda m: (m.created_at, m.id), reverse=newest_first)
+    return collected[:limit]
+
@@ -0,0 +1,195 @@
+"""
+聊天记录分页查询（keyset）
+
+按 (created_at, id) 游标翻页，不用 OFFSET：打开会话只读最近一页，向上滚动用
+before 游标读更早的一页，断线重连后用 after 游标补齐新消息。每页的代价只和
+页大小有关，与会话的历史长度无关。
+
+会话消息按 ChatMessage.partner_id（会话键）查询，走 (auth_code, partner_id, created_at, id)
+索引的一次范围扫描。升级前的消息需要先运行 backfill_partner_id 回填会话键。
+
+热表在翻页方向上不足一页时，再从归档段（connections.archive）中读取，
+归档的消息保留原 id，游标在热表和归档之间连续。
+
+用法::
+
+    from connections.chat_history import get_history_page
+
+    page = get_history_page(auth_code, partner_id, limit=50)                 # 最近一页
+    older = get_history_page(auth_code, partner_id, before=page['before'])   # 更早一页
+    newer = get_history_page(auth_code, partner_id, after=page['after'])     # 之后的新消息
+    pages = get_recent_pages(auth_code, partner_ids, limit=50)               # 多个会话各自最近一页
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+
+from .archive import load_archived
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def encode_cursor(message):
+    """游标格式：<created_at 微秒数>_<id>（整数运算，避免浮点误差导致重复或漏掉消息）"""
+    created_at = message.created_at
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(dt_timezone.utc).replace(tzinfo=None)
+    return f'{(created_at - _EPOCH) // _MICROSECOND}_{message.id}'
+
+
+def decode_cursor(cursor):
+    """返回 (created_at, id)"""
+    try:
+        stamp, pk = str(cursor).split('_', 1)
+        created_at = _EPOCH + int(stamp) * _MICROSECOND
+        if settings.USE_TZ:
+            created_at = created_at.replace(tzinfo=dt_timezone.utc)
+        return created_at, int(pk)
+    except (TypeError, ValueError, OverflowError):
+        raise InvalidCursor(f'无效的游标: {cursor}')
+
+
+def clamp_page_size(limit):
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return min(max(limit, 1), MAX_PAGE_SIZE)
+
+
+def _keyset(queryset, before=None, after=None):
+    """按游标截取并排序：只给 after 时从旧到新，否则从新到旧"""
+    if before is not None:
+        created_at, pk = before
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+    if after is not None:
+        created_at, pk = after
+        queryset = queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+    if after is not None and before is None:
+        return queryset.order_by('created_at', 'id')
+    return queryset.order_by('-created_at', '-id')
+
+
+def conversation_queryset(auth_code, partner_id):
+    from .models import ChatMessage
+
+    return ChatMessage.objects.filter(auth_code=auth_code, partner_id=partner_id)
+
+
+def get_history_page(auth_code, partner_id, before=None, after=None, limit=DEFAULT_PAGE_SIZE):
+    """读取一页会话消息
+
+    before / after 为游标字符串，都不传时读最近一页。返回::
+
+        {
+            'messages': [...],      # ChatMessage，按时间从旧到新
+            'before': '...',        # 本页最早一条的游标（继续向前翻），没有消息时为 None
+            'after': '...',         # 本页最新一条的游标（读取之后的新消息）
+            'has_more': bool,       # 翻页方向上是否还有更多
+        }
+    """
+    limit = clamp_page_size(limit)
+    before_key = decode_cursor(before) if before else None
+    after_key = decode_cursor(after) if after else None
+
+    # 多取一条判断是否还有更多
+    newest_first = not (after_key is not None and before_key is None)
+    queryset = _keyset(conversation_queryset(auth_code, partner_id), before_key, after_key)
+    messages = list(queryset[:limit + 1])
+
+    # 向前翻页时热表不够一页才读归档；向后翻页时游标可能还在归档范围内
+    if len(messages) <= limit or not newest_first:
+        archived = load_archived(auth_code, partner_id, before=before_key, after=after_key, limit=limit + 1)
+        if archived:
+            messages = sorted(messages + archived, key=lambda m: (m.created_at, m.id), reverse=newest_first)
+            messages = messages[:limit + 1]
+
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    if newest_first:
+        messages.reverse()
+
+    return {
+        'messages': messages,
+        'before': encode_cursor(messages[0]) if messages else before,
+        'after': encode_cursor(messages[-1]) if messages else after,
+        'has_more': has_more,
+    }
+
+
+def get_recent_pages(auth_code, partner_ids, limit=DEFAULT_PAGE_SIZE):
+    """多个会话各自的最近一页，返回 {partner_id: page}（page 同 get_history_page）
+
+    热表用一条窗口函数查询（按 partner_id 分区，各取最近 limit + 1 条）。
+    热表不足一页且有归档段的会话才单独调用 get_history_page 读取归档。
+    """
+    from .models import ChatArchiveSegment, ChatMessage
+
+    limit = clamp_page_size(limit)
+    partner_ids = list(partner_ids)
+    if not partner_ids:
+        return {}
+
+    queryset = ChatMessage.objects.filter(auth_code=auth_code, partner_id__in=partner_ids).annotate(
+        row_number=Window(RowNumber(), partition_by=[F('partner_id')],
+                          order_by=[F('created_at').desc(), F('id').desc()]),
+    ).filter(row_number__lte=limit + 1).order_by('partner_id', '-created_at', '-id')
+    recent = defaultdict(list)
+    for message in queryset:
+        recent[message.partner_id].append(message)
+
+    short = [partner_id for partner_id in partner_ids if len(recent[partner_id]) <= limit]
+    archived = set(ChatArchiveSegment.objects.filter(auth_code=auth_code, partner_id__in=short)
+                   .values_list('partner_id', flat=True).distinct()) if short else set()
+
+    pages = {}
+    for partner_id in partner_ids:
+        if partner_id in archived:
+            pages[partner_id] = get_history_page(auth_code, partner_id, limit=limit)
+            continue
+        messages = recent[partner_id]
+        has_more = len(messages) > limit
+        messages = messages[:limit][::-1]
+        pages[partner_id] = {
+            'messages': messages,
+            'before': encode_cursor(messages[0]) if messages else None,
+            'after': encode_cursor(messages[-1]) if messages else None,
+            'has_more': has_more,
+        }
+    return pages
+
+
+def serialize_message(message):
+    return {
+        'id': message.id,
+        'message_id': message.message_id,
+        'from_user': message.from_user,
+        'to_user': message.to_user,
+        'content': message.content,
+        'push_content': message.push_content,
+        'message_type': message.message_type,
+        'is_from_self': message.is_from_self,
+        'created_at': message.created_at.isoformat(),
+        'cursor': encode_cursor(message),
+    }
+
+
+def serialize_page(page):
+    return {
+        'messages': [serialize_message(m) for m in page['messages']],
+        'before': page['before'],
+        'after': page['after'],
+        'has_more': page['has_more'],
+    }
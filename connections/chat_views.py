@@ -0,0 +1,133 @@
+"""
+聊天记录接口（keyset 分页，见 connections.chat_history）
+
+- chat/history/   每个会话只返回最近一页消息（格式与原接口相同），附带向前翻页的游标
+- chat/messages/  单个会话按游标翻页
+- chat/sync/      前端拉到的消息批量入库（见 connections.ingest）
+- chat/search/    全文搜索（见 connections.search）
+"""
+import json
+
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET, require_POST
+
+from config import PROTOCOL_CONFIG
+
+from . import chat_history, search
+from .ingest import ingest_messages
+from .models import AuthCode, ChatSession, Connection
+
+# 打开聊天页时每个会话加载的消息数、最多加载的会话数
+HISTORY_WINDOW = PROTOCOL_CONFIG.get('CHAT_HISTORY_WINDOW', 50)
+HISTORY_MAX_SESSIONS = PROTOCOL_CONFIG.get('CHAT_HISTORY_MAX_SESSIONS', 200)
+
+
+def _get_auth_code(request, pk, wxid=None):
+    connections = Connection.objects.all()
+    if not getattr(request.user, 'is_admin', False):
+        connections = connections.filter(user=request.user)
+    connection = get_object_or_404(connections, pk=pk)
+    if wxid is None:
+        wxid = request.GET.get('wxid', '')
+    return get_object_or_404(AuthCode, connection=connection, code=wxid)
+
+
+def _legacy_message(message):
+    """原 chat/history/ 接口的消息格式（id 为协议消息 ID，前端用于去重）"""
+    return {
+        'id': message.message_id,
+        'content': message.content,
+        'fromUser': message.from_user,
+        'toUser': message.to_user,
+        'pushContent': message.push_content,
+        'timestamp': message.created_at.isoformat(),
+        'cursor': chat_history.encode_cursor(message),
+    }
+
+
+@login_required
+@require_GET
+def api_chat_history(request, pk):
+    """各会话最近的消息，?wxid=<授权码>&limit=<每个会话条数>"""
+    auth_code = _get_auth_code(request, pk)
+    limit = chat_history.clamp_page_size(request.GET.get('limit', HISTORY_WINDOW))
+
+    data = {}
+    sessions = list(ChatSession.objects.filter(auth_code=auth_code).order_by('-last_activity')[:HISTORY_MAX_SESSIONS])
+    pages = chat_history.get_recent_pages(auth_code, [session.partner_id for session in sessions], limit=limit)
+    for session in sessions:
+        page = pages[session.partner_id]
+        data[session.partner_id] = {
+            'partner_name': session.partner_name,
+            'last_activity': session.last_activity.isoformat(),
+            'messages': [_legacy_message(m) for m in page['messages']],
+            'before': page['before'],
+            'has_more': page['has_more'],
+        }
+    return JsonResponse({'code': 200, 'msg': 'success', 'data': data})
+
+
+@login_required
+@require_GET
+def api_chat_messages(request, pk):
+    """单个会话翻页，?wxid=&partner=&before=<游标>|after=<游标>&limit="""
+    auth_code = _get_auth_code(request, pk)
+    partner_id = request.GET.get('partner', '').strip()
+    if not partner_id:
+        return JsonResponse({'code': 400, 'msg': '缺少 partner 参数'}, status=400)
+    try:
+        page = chat_history.get_history_page(
+            auth_code, partner_id,
+            before=request.GET.get('before') or None,
+            after=request.GET.get('after') or None,
+            limit=request.GET.get('limit', chat_history.DEFAULT_PAGE_SIZE),
+        )
+    except chat_history.InvalidCursor as e:
+        return JsonResponse({'code': 400, 'msg': str(e)}, status=400)
+
+    return JsonResponse({'code': 200, 'msg': 'success', 'data': chat_history.serialize_page(page)})
+
+
+@login_required
+@require_POST
+def api_chat_sync_messages(request, pk):
+    """批量保存消息，body: {"wxid": ..., "messages": [AddMsgs 格式的消息]}"""
+    try:
+        data = json.loads(request.body or b'{}')
+        wxid = str(data.get('wxid') or '')
+        messages = [m for m in data.get('messages') or [] if isinstance(m, dict)]
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({'code': 400, 'msg': '请求数据格式错误'}, status=400)
+
+    auth_code = _get_auth_code(request, pk, wxid)
+    saved = ingest_messages(auth_code, messages)
+    return JsonResponse({'code': 200, 'msg': f'保存 {len(saved)} 条新消息', 'data': {
+        'received': len(messages),
+        'saved': len(saved),
+    }})
+
+
+@login_required
+@require_GET
+def api_chat_search(request, pk):
+    """搜索聊天记录，?wxid=&q=<关键词>&partner=<可选，限定会话>&limit="""
+    auth_code = _get_auth_code(request, pk)
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'code': 400, 'msg': '请输入搜索关键词'}, status=400)
+    try:
+        limit = int(request.GET.get('limit', search.DEFAULT_LIMIT))
+    except ValueError:
+        limit = search.DEFAULT_LIMIT
+
+    results = search.search_messages(auth_code, query, partner_id=request.GET.get('partner') or None, limit=limit)
+    return JsonResponse({'code': 200, 'msg': 'success', 'data': {
+        'query': query,
+        'backend': search.backend(),
+        'results': [
+            dict(chat_history.serialize_message(r['message']), snippet=r['snippet'], rank=r['rank'])
+            for r in results
+        ],
+    }})
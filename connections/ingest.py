@@ -0,0 +1,130 @@
+"""
+同步消息批量入库
+
+一次同步拉到的消息作为一批处理，重连后的几百条消息只需要固定几条查询：
+
+1. 批内按 message_id 去重，再去掉最近已入库的 ID（进程内缓存，不查库）
+2. 锁住授权码行（SELECT ... FOR UPDATE），同一授权码的入库串行执行
+3. 一次查询排除库里已有的消息，bulk_create(ignore_conflicts=True) 插入其余消息
+   （其他途径并发写入同一条消息时由 unique_together(auth_code, message_id) 兜底）
+4. 一次查询取回新消息的主键：锁内没有其他入库，查到的就是这次插入的消息，
+   并发同步同一批消息时不会重复计入会话的未读数
+5. 缺少的 ChatSession 批量创建，每个涉及的会话只执行一次 UPDATE：
+   last_message 指向最新一条，unread_count 用 F() 累加收到的消息数
+
+用法::
+
+    from connections.ingest import ingest_messages
+
+    saved = ingest_messages(auth_code, raw_messages)   # 新入库的 ChatMessage，按时间顺序
+
+配置（PROTOCOL_CONFIG）：
+- CHAT_INGEST_RECENT_IDS   最近入库 ID 缓存条数，默认 50000
+- CHAT_INGEST_RECENT_TTL   缓存时间（秒），默认 600
+"""
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from config import PROTOCOL_CONFIG
+from utils.coalescing import TTLCache
+from utils.db_retry import retry_on_locked
+
+RECENT_IDS_SIZE = PROTOCOL_CONFIG.get('CHAT_INGEST_RECENT_IDS', 50000)
+RECENT_IDS_TTL = PROTOCOL_CONFIG.get('CHAT_INGEST_RECENT_TTL', 600)
+
+# (auth_code_id, message_id) -> True
+recent_ids = TTLCache(maxsize=RECENT_IDS_SIZE, ttl=RECENT_IDS_TTL)
+
+
+def _text(value):
+    if isinstance(value, dict):
+        return value.get('string') or ''
+    return '' if value is None else str(value)
+
+
+def normalize_message(raw, wxid):
+    """把协议返回的 AddMsgs 条目转换为 ChatMessage 字段"""
+    from .models import ChatMessage
+
+    from_user = _text(raw.get('FromUserName'))
+    to_user = _text(raw.get('ToUserName'))
+    is_from_self = from_user == wxid
+    return {
+        'message_id': str(raw.get('NewMsgId') or raw.get('MsgId') or ''),
+        'from_user': from_user,
+        'to_user': to_user,
+        'content': _text(raw.get('Content')),
+        'push_content': (raw.get('PushContent') or '')[:200],
+        'is_from_self': is_from_self,
+        'partner_id': ChatMessage.conversation_key(from_user, to_user, is_from_self),
+    }
+
+
+def _candidates(auth_code, raw_messages):
+    """批内去重并排除最近已入库的消息，返回 {message_id: 字段}（保持原顺序）"""
+    batch = {}
+    for raw in raw_messages:
+        fields = normalize_message(raw, auth_code.code)
+        message_id = fields['message_id']
+        if not message_id or message_id in batch:
+            continue
+        if recent_ids.get((auth_code.pk, message_id)):
+            continue
+        batch[message_id] = fields
+    return batch
+
+
+@retry_on_locked()
+def _insert(auth_code, batch):
+    from .models import AuthCode, ChatMessage, ChatSession
+
+    with transaction.atomic():
+        # 必须是事务中的第一个查询：之后的已有消息查询能看到先拿到锁的入库
+        list(AuthCode.objects.select_for_update().filter(pk=auth_code.pk).values_list('pk', flat=True))
+        existing = set(ChatMessage.objects.filter(auth_code=auth_code, message_id__in=list(batch))
+                       .values_list('message_id', flat=True))
+        rows = [ChatMessage(auth_code=auth_code, **fields)
+                for message_id, fields in batch.items() if message_id not in existing]
+        if not rows:
+            return [], existing
+
+        ChatMessage.objects.bulk_create(rows, ignore_conflicts=True)
+
+        # ignore_conflicts 时数据库不返回主键，按消息 ID 取回（锁内只有这次插入）
+        saved = list(ChatMessage.objects.filter(
+            auth_code=auth_code, message_id__in=[row.message_id for row in rows],
+        ).order_by('id'))
+
+        # partner_id -> (最新一条消息, 收到的消息数)
+        touched = {}
+        for message in saved:
+            unread = touched.get(message.partner_id, (None, 0))[1]
+            touched[message.partner_id] = (message, unread + (0 if message.is_from_self else 1))
+
+        ChatSession.objects.bulk_create(
+            [ChatSession(auth_code=auth_code, partner_id=partner_id) for partner_id in touched],
+            ignore_conflicts=True,
+        )
+        now = timezone.now()
+        for partner_id, (last, unread) in touched.items():
+            ChatSession.objects.filter(auth_code=auth_code, partner_id=partner_id).update(
+                last_message_id=last.pk,
+                unread_count=F('unread_count') + unread,
+                last_activity=now,
+            )
+    return saved, existing
+
+
+def ingest_messages(auth_code, raw_messages):
+    """保存一批同步到的消息，返回新入库的 ChatMessage 列表"""
+    batch = _candidates(auth_code, raw_messages)
+    if not batch:
+        return []
+
+    saved, existing = _insert(auth_code, batch)
+    for message_id in existing:
+        recent_ids.set((auth_code.pk, message_id), True)
+    for message in saved:
+        recent_ids.set((auth_code.pk, message.message_id), True)
+    return saved
@@ -0,0 +1,45 @@
+"""
+归档旧聊天消息（压缩后移出 chat_message）
+
+python manage.py archive_chat_messages                # 使用 CHAT_ARCHIVE_DAYS
+python manage.py archive_chat_messages --days 180
+python manage.py archive_chat_messages --dry-run      # 只统计可归档的消息数
+python manage.py archive_chat_messages --vacuum       # 归档后 VACUUM（SQLite，归还空间）
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from connections.archive import ARCHIVE_DAYS, DEFAULT_BATCH_SIZE, DEFAULT_PAUSE, archive_messages
+
+
+class Command(BaseCommand):
+    help = '把超过保留天数的聊天消息按 账号/会话/月份 压缩归档'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=ARCHIVE_DAYS, help='热表保留天数')
+        parser.add_argument('--dry-run', action='store_true', help='只统计，不归档')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='每批消息数')
+        parser.add_argument('--pause', type=float, default=DEFAULT_PAUSE, help='批次之间休眠（秒）')
+        parser.add_argument('--vacuum', action='store_true', help='完成后执行 VACUUM（仅 SQLite）')
+
+    def handle(self, *args, **options):
+        days = options['days']
+        if days <= 0:
+            raise CommandError('保留天数必须大于 0')
+
+        result = archive_messages(days, batch_size=options['batch_size'], pause=options['pause'],
+                                  dry_run=options['dry_run'])
+        self.stdout.write(f"保留 {days} 天（{result['cutoff']:%Y-%m-%d %H:%M} 之前的消息）")
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f"可归档 {result['archivable']} 条"))
+            return
+
+        ratio = result['compressed_bytes'] / result['raw_bytes'] if result['raw_bytes'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"归档 {result['archived']} 条，{result['segments']} 段，"
+            f"{result['raw_bytes']} -> {result['compressed_bytes']} 字节（{ratio:.0%}），耗时 {result['duration']}s"))
+
+        if options['vacuum'] and connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('VACUUM')
+            self.stdout.write('VACUUM 完成')
@@ -0,0 +1,54 @@
+"""
+回填 ChatMessage.partner_id（会话键）
+
+升级后运行一次，之前保存的消息 partner_id 为空，聊天记录查不到。可重复执行，
+只处理 partner_id 为空的行。
+
+python manage.py backfill_partner_id
+python manage.py backfill_partner_id --chunk-size 2000 --pause 0.1
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Max, Min
+
+from connections.models import ChatMessage
+from utils.db_retry import retry_on_locked
+
+DEFAULT_CHUNK_SIZE = 5000
+DEFAULT_PAUSE = 0.05
+
+
+@retry_on_locked()
+def backfill_range(lo, hi):
+    """回填主键在 [lo, hi) 内的消息，返回更新行数"""
+    pending = ChatMessage.objects.filter(pk__gte=lo, pk__lt=hi, partner_id='')
+    with transaction.atomic():
+        updated = pending.filter(is_from_self=True).update(partner_id=F('to_user'))
+        updated += pending.filter(is_from_self=False).update(partner_id=F('from_user'))
+    return updated
+
+
+class Command(BaseCommand):
+    help = '按主键范围分批回填聊天消息的会话键 partner_id'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='每批主键范围大小')
+        parser.add_argument('--pause', type=float, default=DEFAULT_PAUSE, help='批次之间休眠（秒）')
+
+    def handle(self, *args, **options):
+        chunk_size = max(options['chunk_size'], 1)
+        bounds = ChatMessage.objects.filter(partner_id='').aggregate(lo=Min('pk'), hi=Max('pk'))
+        if bounds['lo'] is None:
+            self.stdout.write(self.style.SUCCESS('没有需要回填的消息'))
+            return
+
+        started = time.monotonic()
+        total = 0
+        for lo in range(bounds['lo'], bounds['hi'] + 1, chunk_size):
+            total += backfill_range(lo, lo + chunk_size)
+            self.stdout.write(f'  {min(lo + chunk_size - 1, bounds["hi"])}/{bounds["hi"]}  已回填 {total} 条')
+            if options['pause']:
+                time.sleep(options['pause'])
+        self.stdout.write(self.style.SUCCESS(f'回填完成，共 {total} 条，耗时 {time.monotonic() - started:.2f}s'))
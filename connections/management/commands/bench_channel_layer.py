@@ -0,0 +1,211 @@
+"""
+Channel layer 吞吐基准
+
+python manage.py bench_channel_layer --layer memory --workers 4
+python manage.py bench_channel_layer --layer redis-pubsub --workers 4 --stub
+python manage.py bench_channel_layer --layer redis --redis-url redis://127.0.0.1:6379/0 --workers 8
+
+每个 worker 把自己的 channel 加入同一个组，然后向组发送 --messages 条消息，
+每条消息会分发给全部 worker（与聊天消息的组推送相同）。
+memory 后端只能在单进程内模拟多个 worker；redis 后端每个 worker 是独立进程。
+"""
+import asyncio
+import multiprocessing
+import queue
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+from protocol_core.channel_layers import build_channel_layers, DEFAULT_REDIS_URL, BACKENDS
+
+GROUP = 'bench_channel_layer'
+# 子进程启动（django.setup、连接 Redis、等待其他进程）允许的时间（秒）
+STARTUP_TIMEOUT = 60
+
+
+def receive_timeout(workers, messages):
+    return max(30, messages * workers / 500)
+
+
+def create_layer(backend, redis_url, capacity):
+    config = build_channel_layers(backend, redis_url, capacity=capacity)['default']
+    return import_string(config['BACKEND'])(**config['CONFIG'])
+
+
+async def run_worker(layer, workers, messages, payload, ready, start):
+    """单个 worker：加入组、发送、接收，返回 (开始时间, 结束时间, 收到条数)"""
+    channel = await layer.new_channel()
+    await layer.group_add(GROUP, channel)
+    expected = workers * messages
+    received = 0
+
+    async def receive_all():
+        nonlocal received
+        while received < expected:
+            await layer.receive(channel)
+            received += 1
+
+    receiver = asyncio.ensure_future(receive_all())
+    await ready()
+    await start()
+
+    started = time.monotonic()
+    for index in range(messages):
+        await layer.group_send(GROUP, {'type': 'bench.message', 'index': index, 'payload': payload})
+    try:
+        await asyncio.wait_for(receiver, timeout=receive_timeout(workers, messages))
+    except asyncio.TimeoutError:
+        pass
+    finished = time.monotonic()
+    await layer.group_discard(GROUP, channel)
+    return started, finished, received
+
+
+def _process_main(backend, redis_url, capacity, workers, messages, payload, barrier, results):
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+    async def main():
+        layer = create_layer(backend, redis_url, capacity)
+        loop = asyncio.get_running_loop()
+        wait_barrier = lambda: loop.run_in_executor(None, barrier.wait)  # noqa: E731
+
+        async def ready():
+            # 等待所有进程完成订阅
+            await wait_barrier()
+            await asyncio.sleep(0.2)
+
+        async def start():
+            await wait_barrier()
+
+        result = await run_worker(layer, workers, messages, payload, ready, start)
+        if hasattr(layer, 'flush'):
+            await layer.flush()
+        return result
+
+    results.put(asyncio.run(main()))
+
+
+class Command(BaseCommand):
+    help = '测试 channel layer 在多个 worker 之间的消息吞吐'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--layer', default='memory', choices=list(BACKENDS), help='channel layer 后端')
+        parser.add_argument('--redis-url', default=DEFAULT_REDIS_URL)
+        parser.add_argument('--workers', type=int, default=4, help='worker 数量')
+        parser.add_argument('--messages', type=int, default=500, help='每个 worker 发送的消息数')
+        parser.add_argument('--payload', type=int, default=256, help='消息体大小（字节）')
+        parser.add_argument('--stub', action='store_true', help='启动本地 Redis 发布/订阅替身（仅 redis-pubsub）')
+
+    def handle(self, *args, **options):
+        backend = options['layer']
+        workers = options['workers']
+        messages = options['messages']
+        payload = 'x' * options['payload']
+        capacity = workers * messages + 100
+
+        redis_url = options['redis_url']
+        if options['stub']:
+            if backend != 'redis-pubsub':
+                raise CommandError('--stub 只支持 redis-pubsub 后端')
+            redis_url = self.start_stub()
+
+        if backend == 'memory':
+            results = asyncio.run(self.run_in_process(workers, messages, payload, capacity))
+        else:
+            results = self.run_multiprocess(backend, redis_url, capacity, workers, messages, payload)
+
+        started = min(result[0] for result in results)
+        finished = max(result[1] for result in results)
+        received = sum(result[2] for result in results)
+        expected = workers * workers * messages
+        elapsed = finished - started or 1e-9
+
+        mode = '单进程' if backend == 'memory' else f'{workers} 个进程'
+        self.stdout.write(self.style.SUCCESS(f'后端: {backend}（{mode}）'))
+        self.stdout.write(f'发送: {workers * messages} 条，投递: {received}/{expected} 条，耗时 {elapsed:.2f}s')
+        self.stdout.write(f'发送吞吐: {workers * messages / elapsed:.0f} msg/s')
+        self.stdout.write(f'投递吞吐: {received / elapsed:.0f} msg/s')
+        if received < expected:
+            self.stdout.write(self.style.WARNING(f'有 {expected - received} 条消息未送达（超时或容量不足）'))
+
+    async def run_in_process(self, workers, messages, payload, capacity):
+        layer = create_layer('memory', None, capacity)
+        subscribed = 0
+        all_subscribed = asyncio.Event()
+        go = asyncio.Event()
+
+        async def ready():
+            nonlocal subscribed
+            subscribed += 1
+            if subscribed == workers:
+                all_subscribed.set()
+            await all_subscribed.wait()
+
+        async def start():
+            go.set()
+            await go.wait()
+
+        return await asyncio.gather(*(
+            run_worker(layer, workers, messages, payload, ready, start) for _ in range(workers)
+        ))
+
+    def run_multiprocess(self, backend, redis_url, capacity, workers, messages, payload):
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+        # 某个进程启动失败时，其他进程不会一直等在 barrier 上
+        barrier = context.Barrier(workers, timeout=STARTUP_TIMEOUT)
+        results = context.Queue()
+        processes = [
+            context.Process(target=_process_main,
+                            args=(backend, redis_url, capacity, workers, messages, payload, barrier, results))
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+
+        deadline = time.monotonic() + STARTUP_TIMEOUT + receive_timeout(workers, messages) + 30
+        collected = []
+        try:
+            while len(collected) < len(processes):
+                try:
+                    collected.append(results.get(timeout=1))
+                    continue
+                except queue.Empty:
+                    pass
+                failed = [process.exitcode for process in processes if process.exitcode not in (None, 0)]
+                if failed:
+                    raise CommandError(f'有 {len(failed)} 个 worker 进程异常退出（exitcode: {failed}）')
+                if time.monotonic() > deadline:
+                    raise CommandError(f'等待 worker 结果超时，已收到 {len(collected)}/{len(processes)} 个')
+        finally:
+            for process in processes:
+                process.join(5)
+                if process.is_alive():
+                    process.terminate()
+                    process.join()
+        return collected
+
+    def start_stub(self):
+        from utils.redis_stub import RedisPubSubStub
+
+        started = threading.Event()
+        address = {}
+
+        def serve():
+            async def main():
+                server = await RedisPubSubStub().start()
+                address['port'] = server.sockets[0].getsockname()[1]
+                started.set()
+                await server.serve_forever()
+            asyncio.run(main())
+
+        threading.Thread(target=serve, daemon=True).start()
+        started.wait(5)
+        url = f"redis://127.0.0.1:{address['port']}/0"
+        self.stdout.write(f'已启动本地 Redis 替身: {url}')
+        return url
@@ -0,0 +1,68 @@
+"""
+协议客户端压测命令
+
+python manage.py protocol_loadtest --requests 5000 --concurrency 500
+python manage.py protocol_loadtest --url http://127.0.0.1:9901 --path /api/Msg/Sync
+"""
+import asyncio
+import time
+
+from django.core.management.base import BaseCommand
+
+from utils.async_protocol_client import get_async_client, close_async_clients, ProtocolRequestError
+from utils.protocol_stub import ProtocolStub
+
+
+class Command(BaseCommand):
+    help = '使用异步协议客户端压测协议服务器（默认启动本地替身服务器）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='', help='协议地址，不填则启动本地替身服务器')
+        parser.add_argument('--path', default='/api/Msg/Sync', help='压测的接口路径')
+        parser.add_argument('--requests', type=int, default=2000, help='总请求数')
+        parser.add_argument('--concurrency', type=int, default=200, help='并发数')
+        parser.add_argument('--latency', type=float, default=0.02, help='替身服务器的模拟延迟（秒）')
+
+    def handle(self, *args, **options):
+        asyncio.run(self.run(options))
+
+    async def run(self, options):
+        server = None
+        url = options['url']
+        if not url:
+            stub = ProtocolStub(latency=options['latency'])
+            server = await stub.start()
+            url = 'http://127.0.0.1:%d' % server.sockets[0].getsockname()[1]
+            self.stdout.write(f'已启动本地替身服务器: {url}')
+
+        client = get_async_client(url)
+        path = options['path']
+        total = options['requests']
+        semaphore = asyncio.Semaphore(options['concurrency'])
+        failed = 0
+
+        async def one(index):
+            nonlocal failed
+            async with semaphore:
+                try:
+                    response = await client.post(path, json={'Scene': 0, 'Synckey': '', 'Wxid': f'wxid_{index % 100}'})
+                    if response.status_code != 200:
+                        failed += 1
+                except ProtocolRequestError:
+                    failed += 1
+
+        started = time.monotonic()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.monotonic() - started
+
+        stats = client.stats()
+        await close_async_clients()
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'完成 {total} 个请求，失败 {failed}，耗时 {elapsed:.2f}s，吞吐 {total / elapsed:.0f} req/s'
+        ))
+        self.stdout.write(f"平均延迟: {stats['avg_latency']}s")
+        self.stdout.write(f"延迟分布: {stats['latency_histogram']}")
@@ -0,0 +1,28 @@
+"""
+重建聊天记录全文索引
+
+python manage.py rebuild_chat_search                 # 创建（如不存在）并重建
+python manage.py rebuild_chat_search --no-optimize   # 重建后不合并索引段
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from connections import search
+
+
+class Command(BaseCommand):
+    help = '用 chat_message 的全部数据重建全文索引（SQLite FTS5 / PostgreSQL pg_trgm）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--no-optimize', action='store_true', help='重建后不执行 optimize / ANALYZE')
+
+    def handle(self, *args, **options):
+        backend = search.backend()
+        if backend == 'scan':
+            self.stdout.write(self.style.WARNING('当前数据库不支持全文索引，搜索使用范围扫描'))
+            return
+
+        started = time.monotonic()
+        search.rebuild_search_index(optimize=not options['no_optimize'])
+        self.stdout.write(self.style.SUCCESS(f'{backend} 索引重建完成，耗时 {time.monotonic() - started:.2f}s'))
@@ -74,23 +74,23 @@ class Connection(models.Model):
     def test_connection(self):
         """测试连接"""
         import requests
+        from utils.protocol_client import get_client_for_connection
+        client = get_client_for_connection(self)
         try:
-            # 根据连接类型选择不同的测试端点
+            # 根据连接类型选择不同的测试端点（探测请求不重试，服务器不可用时立即返回）
             if self.connection_type == 'WeCharPadPro':
                 # 测试WeCharPadPro的健康检查端点
-                test_url = f"{self.url.rstrip('/')}/health"
-                response = requests.get(test_url, timeout=5)
+                response = client.get('/health', timeout=5, retry=False)
                 return response.status_code == 200
             elif self.connection_type in ['wechatx', 'wechatx-861']:
                 # 测试wechatx类型的API端点
-                test_url = f"{self.url.rstrip('/')}/api/Login/GetQR"
                 headers = {"accept": "application/json", "Content-Type": "application/json"}
-                response = requests.post(test_url, headers=headers, json={}, timeout=5)
+                response = client.post('/api/Login/GetQR', headers=headers, json={}, timeout=5, retry=False)
                 # 即使返回错误，只要能连接到服务器就算成功
                 return response.status_code in [200, 400, 401, 403, 500]
             else:
                 # 默认测试：尝试访问根路径
-                response = requests.get(f"{self.url.rstrip('/')}/", timeout=5)
+                response = client.get('/', timeout=5, retry=False)
                 return response.status_code < 500
         except requests.exceptions.ConnectTimeout:
             return False
@@ -272,6 +272,11 @@ class ConnectionLog(models.Model):
         verbose_name_plural = '连接日志'
         db_table = 'connection_log'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['connection', '-created_at']),
+            models.Index(fields=['log_type', 'created_at']),
+        ]
     
     def __str__(self):
         status = '成功' if self.success else '失败'
@@ -321,6 +326,13 @@ class ChatMessage(models.Model):
         default=False,
         verbose_name='是否为自己发送'
     )
+    partner_id = models.CharField(
+        max_length=100,
+        blank=True,
+        default='',
+        verbose_name='聊天对象ID',
+        help_text='会话键，保存时由 from_user / to_user 计算（见 chat_partner）'
+    )
     created_at = models.DateTimeField(
         auto_now_add=True,
         verbose_name='创建时间'
@@ -335,18 +347,27 @@ class ChatMessage(models.Model):
         indexes = [
             models.Index(fields=['auth_code', 'created_at']),
             models.Index(fields=['from_user', 'to_user']),
+            # 会话消息分页（见 connections.chat_history）
+            models.Index(fields=['auth_code', 'partner_id', 'created_at', 'id']),
         ]
     
     def __str__(self):
         return f"{self.from_user} -> {self.to_user}: {self.content[:50]}"
+
+    def save(self, *args, **kwargs):
+        if not self.partner_id:
+            self.partner_id = self.conversation_key(self.from_user, self.to_user, self.is_from_self)
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def conversation_key(from_user, to_user, is_from_self):
+        """会话键：自己发出的消息是接收者，收到的消息是发送者"""
+        return to_user if is_from_self else from_user
     
     @property
     def chat_partner(self):
         """获取聊天对象"""
-        if self.is_from_self:
-            return self.to_user
-        else:
-            return self.from_user
+        return self.partner_id or self.conversation_key(self.from_user, self.to_user, self.is_from_self)
     
     @property
     def display_name(self):
@@ -407,3 +428,65 @@ class ChatSession(models.Model):
     
     def __str__(self):
         return f"{self.auth_code.code} - {self.partner_name or self.partner_id}"
+
+
+class ChatArchiveSegment(models.Model):
+    """聊天消息归档段
+
+    超过保留天数的消息按 (账号, 会话, 月份) 压缩后存放在这里，
+    热表 chat_message 只保留近期消息。读取见 connections.archive。
+    """
+    auth_code = models.ForeignKey(
+        AuthCode,
+        on_delete=models.CASCADE,
+        related_name='chat_archive_segments',
+        verbose_name='授权码'
+    )
+    partner_id = models.CharField(
+        max_length=100,
+        verbose_name='聊天对象ID'
+    )
+    period = models.DateField(
+        verbose_name='月份',
+        help_text='所属月份的第一天'
+    )
+    first_created_at = models.DateTimeField(
+        verbose_name='最早消息时间'
+    )
+    last_created_at = models.DateTimeField(
+        verbose_name='最晚消息时间'
+    )
+    message_count = models.IntegerField(
+        default=0,
+        verbose_name='消息数'
+    )
+    raw_size = models.IntegerField(
+        default=0,
+        verbose_name='原始大小（字节）'
+    )
+    compression = models.CharField(
+        max_length=10,
+        default='zlib',
+        verbose_name='压缩方式'
+    )
+    data = models.BinaryField(
+        verbose_name='压缩数据',
+        help_text='按 (created_at, id) 排序的消息 JSON 列表'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='归档时间'
+    )
+
+    class Meta:
+        verbose_name = '聊天归档段'
+        verbose_name_plural = '聊天归档段'
+        db_table = 'chat_archive_segment'
+        ordering = ['auth_code', 'partner_id', 'first_created_at']
+        indexes = [
+            models.Index(fields=['auth_code', 'partner_id', 'last_created_at']),
+            models.Index(fields=['auth_code', 'partner_id', 'first_created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.auth_code_id} - {self.partner_id} - {self.period:%Y-%m} ({self.message_count})"
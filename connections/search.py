@@ -0,0 +1,220 @@
+"""
+聊天记录全文搜索
+
+SQLite：FTS5 外部内容表 chat_message_fts（trigram 分词，支持中文子串），
+内容来自视图 chat_message_fts_source，由 chat_message 上的触发器同步，
+bulk_create 和批量入库同样生效。除 content 外还索引一列 scope（"|a<auth_code_id>|p<partner_id>|"），
+搜索时 scope 和关键词在同一个 MATCH 中求交集，只读取该账号 / 会话的倒排列表。
+
+PostgreSQL：pg_trgm 的 GIN 索引（content gin_trgm_ops），ILIKE 走索引，按 word_similarity 排序。
+
+其他数据库或少于 3 个字的关键词（trigram 无法索引）：在账号 / 会话范围内 icontains，
+按时间倒序，走 (auth_code, partner_id, created_at) 索引。
+
+post_migrate 时自动创建（CREATE ... IF NOT EXISTS），已有数据用 rebuild_chat_search 命令重建。
+
+用法::
+
+    from connections.search import search_messages
+
+    results = search_messages(auth_code, '关键词', partner_id='wxid_xxx', limit=20)
+    # [{'message': ChatMessage, 'snippet': '...<mark>关键词</mark>...', 'rank': float}, ...]
+"""
+import html
+import logging
+import re
+
+from django.db import connections, router
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'chat_message_fts'
+FTS_SOURCE = 'chat_message_fts_source'
+PG_TRGM_INDEX = 'chat_message_content_trgm'
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+MIN_TRIGRAM_LENGTH = 3
+SNIPPET_TOKENS = 24
+
+# 高亮标记先用控制字符，转义 HTML 后再替换为 <mark>
+_MARK_START = '\x02'
+_MARK_END = '\x03'
+
+_SCOPE_SQL = "'|a' || {row}.auth_code_id || '|p' || {row}.partner_id || '|'"
+
+_SQLITE_SETUP = [
+    f"""CREATE VIEW IF NOT EXISTS {FTS_SOURCE} AS
+        SELECT id, content, {_SCOPE_SQL.format(row='chat_message')} AS scope FROM chat_message""",
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        content, scope, content='{FTS_SOURCE}', content_rowid='id', tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS chat_message_fts_ai AFTER INSERT ON chat_message BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, content, scope)
+        VALUES (new.id, new.content, {_SCOPE_SQL.format(row='new')});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS chat_message_fts_ad AFTER DELETE ON chat_message BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content, scope)
+        VALUES ('delete', old.id, old.content, {_SCOPE_SQL.format(row='old')});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS chat_message_fts_au AFTER UPDATE OF content, auth_code_id, partner_id ON chat_message BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content, scope)
+        VALUES ('delete', old.id, old.content, {_SCOPE_SQL.format(row='old')});
+        INSERT INTO {FTS_TABLE}(rowid, content, scope)
+        VALUES (new.id, new.content, {_SCOPE_SQL.format(row='new')});
+    END""",
+]
+
+_POSTGRES_SETUP = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    f'CREATE INDEX IF NOT EXISTS {PG_TRGM_INDEX} ON chat_message USING gin (content gin_trgm_ops)',
+]
+
+
+def _connection():
+    from .models import ChatMessage
+    return connections[router.db_for_read(ChatMessage)]
+
+
+def backend():
+    """当前数据库使用的搜索方式：fts5 / trigram / scan"""
+    vendor = _connection().vendor
+    if vendor == 'sqlite':
+        return 'fts5'
+    if vendor == 'postgresql':
+        return 'trigram'
+    return 'scan'
+
+
+# ==================== 建立 / 重建索引 ====================
+
+def ensure_search_index(using=None):
+    """创建全文索引（可重复执行）"""
+    connection = connections[using] if using else _connection()
+    if connection.vendor == 'sqlite':
+        statements = _SQLITE_SETUP
+    elif connection.vendor == 'postgresql':
+        statements = _POSTGRES_SETUP
+    else:
+        return False
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+    return True
+
+
+def setup_after_migrate(sender, using=None, **kwargs):
+    """post_migrate：chat_message 表存在后建立索引"""
+    from .models import ChatMessage
+
+    connection = connections[using or 'default']
+    if ChatMessage._meta.db_table not in connection.introspection.table_names():
+        return
+    try:
+        ensure_search_index(using)
+    except Exception:
+        logger.exception('创建聊天记录全文索引失败')
+
+
+def rebuild_search_index(optimize=True):
+    """用 chat_message 的全部数据重建索引"""
+    connection = _connection()
+    ensure_search_index()
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+            if optimize:
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+        elif connection.vendor == 'postgresql':
+            cursor.execute(f'REINDEX INDEX {PG_TRGM_INDEX}')
+            if optimize:
+                cursor.execute('ANALYZE chat_message')
+
+
+# ==================== 搜索 ====================
+
+def _fts_phrase(text):
+    """FTS5 字符串字面量（双引号转义）"""
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _highlight(text, query):
+    """在 Python 中高亮（PostgreSQL / 扫描方式），返回关键词附近的片段"""
+    match = re.search(re.escape(query), text, re.IGNORECASE)
+    if match is None:
+        return html.escape(text[:SNIPPET_TOKENS * 4])
+    start = max(match.start() - SNIPPET_TOKENS * 2, 0)
+    end = min(match.end() + SNIPPET_TOKENS * 2, len(text))
+    snippet = (text[start:match.start()] + _MARK_START + text[match.start():match.end()] + _MARK_END
+               + text[match.end():end])
+    return _render_snippet(snippet, start > 0, end < len(text))
+
+
+def _render_snippet(snippet, head=False, tail=False):
+    snippet = html.escape(snippet).replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>')
+    return ('…' if head else '') + snippet + ('…' if tail else '')
+
+
+def _search_fts(auth_code, query, partner_id, limit):
+    from .models import ChatMessage
+
+    scope = f'|a{auth_code.pk}|' + (f'p{partner_id}|' if partner_id else '')
+    match = f'scope : {_fts_phrase(scope)} AND content : {_fts_phrase(query)}'
+    sql = f"""
+        SELECT rowid, snippet({FTS_TABLE}, 0, %s, %s, '…', {SNIPPET_TOKENS}), rank
+        FROM {FTS_TABLE}
+        WHERE {FTS_TABLE} MATCH %s
+        ORDER BY rank
+        LIMIT %s
+    """
+    params = [_MARK_START, _MARK_END, match, limit]
+    with _connection().cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    messages = ChatMessage.objects.in_bulk([row[0] for row in rows])
+    return [
+        {'message': messages[pk], 'snippet': _render_snippet(snippet), 'rank': rank}
+        for pk, snippet, rank in rows if pk in messages
+    ]
+
+
+def _scoped(auth_code, partner_id):
+    from .models import ChatMessage
+
+    queryset = ChatMessage.objects.filter(auth_code=auth_code)
+    if partner_id:
+        queryset = queryset.filter(partner_id=partner_id)
+    return queryset
+
+
+def _search_trigram(auth_code, query, partner_id, limit):
+    from django.contrib.postgres.search import TrigramWordSimilarity
+
+    queryset = (_scoped(auth_code, partner_id)
+                .filter(content__icontains=query)
+                .annotate(rank=TrigramWordSimilarity(query, 'content'))
+                .order_by('-rank', '-created_at')[:limit])
+    return [{'message': m, 'snippet': _highlight(m.content, query), 'rank': m.rank} for m in queryset]
+
+
+def _search_scan(auth_code, query, partner_id, limit):
+    queryset = _scoped(auth_code, partner_id).filter(content__icontains=query).order_by('-created_at', '-id')
+    return [{'message': m, 'snippet': _highlight(m.content, query), 'rank': None} for m in queryset[:limit]]
+
+
+def search_messages(auth_code, query, partner_id=None, limit=DEFAULT_LIMIT):
+    """在一个账号（可选限定会话）内搜索消息，按相关度排序"""
+    query = (query or '').strip()
+    if not query:
+        return []
+    limit = min(max(int(limit), 1), MAX_LIMIT)
+
+    method = backend()
+    if len(query) < MIN_TRIGRAM_LENGTH:
+        method = 'scan'
+    if method == 'fts5':
+        return _search_fts(auth_code, query, partner_id, limit)
+    if method == 'trigram':
+        return _search_trigram(auth_code, query, partner_id, limit)
+    return _search_scan(auth_code, query, partner_id, limit)
@@ -0,0 +1,138 @@
+"""
+授权码状态批量写回
+
+刷新、头像更新等流程把查询结果交给 AuthCodeStatusWriter，
+由它合并、去掉没有变化的行，再按批次在一个事务内写入。
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from utils.db_retry import retry_on_locked
+
+from .models import AuthCode
+
+
+# 资料/状态字段：值变化时才需要逐行写入
+STATUS_FIELDS = ['nickname', 'avatar_url', 'is_online', 'last_query_success']
+# 时间戳字段：每次查询都会变化，统一用一条 UPDATE 刷新
+TOUCH_FIELDS = ['last_query_time', 'last_status_check_time']
+
+DEFAULT_BATCH_SIZE = 500
+
+
+class AuthCodeStatusWriter:
+    """收集授权码状态变化并批量写回
+
+    用法::
+
+        with AuthCodeStatusWriter() as writer:
+            for auth_code, result in results:
+                writer.record(auth_code, is_online=True, nickname='...')
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE):
+        self.batch_size = batch_size
+        self._changed = {}          # pk -> (auth_code, set(fields))
+        self._touched = {}          # pk -> {field: value}
+        self.written = 0            # 逐行写入（状态有变化）的行数
+        self.touched = 0            # 只刷新时间戳的行数
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+
+    def __len__(self):
+        return len(self._changed) + len(self._touched)
+
+    def record(self, auth_code, **values):
+        """记录一个授权码的新状态（只修改实例，不保存）"""
+        unknown = set(values) - set(STATUS_FIELDS) - set(TOUCH_FIELDS)
+        if unknown:
+            raise ValueError(f"不支持写回的字段: {', '.join(sorted(unknown))}")
+
+        changed_fields = set()
+        for field in STATUS_FIELDS:
+            if field in values and getattr(auth_code, field) != values[field]:
+                setattr(auth_code, field, values[field])
+                changed_fields.add(field)
+
+        touched = {field: values[field] for field in TOUCH_FIELDS if field in values}
+        for field, value in touched.items():
+            setattr(auth_code, field, value)
+
+        if changed_fields or auth_code.pk in self._changed:
+            pending, fields = self._changed.setdefault(auth_code.pk, (auth_code, set()))
+            # 之前只记录了时间戳：一并写入，本次没有提供的字段保留之前的值
+            earlier = self._touched.pop(auth_code.pk, {})
+            for field, value in dict(earlier, **touched).items():
+                setattr(pending, field, value)
+            if pending is not auth_code:
+                for field in changed_fields:
+                    setattr(pending, field, getattr(auth_code, field))
+            fields.update(changed_fields, earlier, touched)
+        elif touched:
+            self._touched.setdefault(auth_code.pk, {}).update(touched)
+
+        if len(self) >= self.batch_size:
+            self.flush()
+
+    def record_result(self, auth_code, success, is_online=None, nickname=None, avatar_url=None, now=None):
+        """按协议查询结果记录状态
+
+        查询失败时视为离线，且不覆盖已有的昵称和头像。
+        """
+        now = now or timezone.now()
+        values = {
+            'is_online': bool(is_online) if success else False,
+            'last_query_success': bool(success),
+            'last_query_time': now,
+            'last_status_check_time': now,
+        }
+        if success and nickname:
+            values['nickname'] = nickname[:100]
+        if success and avatar_url:
+            values['avatar_url'] = avatar_url
+        self.record(auth_code, **values)
+
+    def flush(self):
+        """写入所有待保存的变化，每批一个事务"""
+        if not self._changed and not self._touched:
+            return
+
+        changed, self._changed = self._changed, {}
+        touched, self._touched = self._touched, {}
+        now = timezone.now()
+
+        # 按字段组合分组，bulk_update 只更新真正变化的列
+        groups = defaultdict(list)
+        for auth_code, fields in changed.values():
+            auth_code.updated_at = now
+            groups[tuple(sorted(fields | {'updated_at'}))].append(auth_code)
+
+        # 仅时间戳变化的行：相同取值合并为一条 UPDATE
+        touch_groups = defaultdict(list)
+        for pk, values in touched.items():
+            touch_groups[tuple(sorted(values.items()))].append(pk)
+
+        self._write(groups, touch_groups)
+
+        # bulk_update 不触发信号，在线状态等变化后使仪表盘缓存失效
+        if changed:
+            from protocol_config.dashboard import invalidate_for_connections
+            invalidate_for_connections({auth_code.connection_id for auth_code, _ in changed.values()})
+
+        self.written += len(changed)
+        self.touched += len(touched)
+
+    @retry_on_locked()
+    def _write(self, groups, touch_groups):
+        with transaction.atomic():
+            for fields, objs in groups.items():
+                AuthCode.objects.bulk_update(objs, list(fields), batch_size=self.batch_size)
+            for values, pks in touch_groups.items():
+                AuthCode.objects.filter(pk__in=pks).update(**dict(values))
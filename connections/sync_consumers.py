@@ -0,0 +1,78 @@
+"""
+聊天消息推送 WebSocket（共享同步任务，见 connections.sync_hub）
+
+连接 ws/chat/<connection_id>/sync/?wxid=<授权码>，同一账号的所有连接共享
+一个 Msg/Sync 轮询任务，新消息入库后推送::
+
+    {"type": "new_messages", "AddMsgs": [{"NewMsgId": ..., "Content": ..., ...}]}
+
+AddMsgs 与协议接口的格式一致，前端可以直接按原来的方式处理。
+WebSocket 只用于接收，发送消息仍通过 HTTP。
+"""
+from datetime import datetime
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from .sync_hub import sync_hub
+
+
+def get_auth_code_for_user(user, connection_id, wxid):
+    """当前用户可访问的授权码（管理员可访问全部连接），没有时返回 None"""
+    from .models import AuthCode
+
+    queryset = AuthCode.objects.filter(connection_id=connection_id, code=wxid)
+    if not getattr(user, 'is_admin', False):
+        queryset = queryset.filter(connection__user=user)
+    return queryset.first()
+
+
+def to_protocol_message(message):
+    """推送格式：与协议 AddMsgs 条目相同的字段"""
+    return {
+        'NewMsgId': message['message_id'],
+        'Content': message['content'],
+        'FromUserName': message['from_user'],
+        'ToUserName': message['to_user'],
+        'PushContent': message['push_content'],
+        'CreateTime': int(datetime.fromisoformat(message['created_at']).timestamp()),
+    }
+
+
+class ChatSyncConsumer(AsyncJsonWebsocketConsumer):
+
+    async def connect(self):
+        user = self.scope.get('user')
+        self.auth_code_id = None
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+
+        connection_id = int(self.scope['url_route']['kwargs']['connection_id'])
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        wxid = query.get('wxid', [''])[0]
+        auth_code = await database_sync_to_async(get_auth_code_for_user)(user, connection_id, wxid)
+        if auth_code is None:
+            await self.close(code=4404)
+            return
+
+        self.auth_code_id = auth_code.pk
+        await sync_hub.subscribe(self.auth_code_id, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        if self.auth_code_id is not None:
+            await sync_hub.unsubscribe(self.auth_code_id, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        if content.get('type') == 'ping':
+            await self.send_json({'type': 'pong'})
+
+    # ---- 组消息 ----
+
+    async def chat_new_messages(self, event):
+        await self.send_json({
+            'type': 'new_messages',
+            'AddMsgs': [to_protocol_message(message) for message in event['messages']],
+        })
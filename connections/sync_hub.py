@@ -0,0 +1,151 @@
+"""
+聊天消息同步多路复用
+
+每个 AuthCode 只运行一个同步任务，同一账号的所有 WebSocket 订阅者
+共享它：新消息通过 channel layer 的组消息推送给所有订阅者。
+
+- 第一个订阅者加入时启动同步任务，最后一个离开时停止
+- 有新消息时按最短间隔轮询，空闲时逐步放慢
+
+订阅方为 connections.sync_consumers.ChatSyncConsumer（ws/chat/<connection_id>/sync/）::
+
+    await sync_hub.subscribe(auth_code_id, self.channel_name)     # connect
+    await sync_hub.unsubscribe(auth_code_id, self.channel_name)   # disconnect
+    # 新消息以 chat.new_messages 组消息送达 consumer
+"""
+import asyncio
+import logging
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+
+from utils.async_protocol_client import get_async_client, ProtocolRequestError
+
+from .ingest import ingest_messages, normalize_message  # noqa: F401  normalize_message 供原有调用方导入
+
+logger = logging.getLogger(__name__)
+
+# 轮询间隔（秒）
+MIN_POLL_INTERVAL = 1.0
+MAX_POLL_INTERVAL = 10.0
+IDLE_BACKOFF = 1.5
+ERROR_POLL_INTERVAL = 15.0
+
+
+def group_name(auth_code_id):
+    """账号同步组名"""
+    return f'chat_sync_{auth_code_id}'
+
+
+def serialize_message(message):
+    """推送给前端的消息格式"""
+    return {
+        'id': message.id,
+        'message_id': message.message_id,
+        'from_user': message.from_user,
+        'to_user': message.to_user,
+        'content': message.content,
+        'push_content': message.push_content,
+        'is_from_self': message.is_from_self,
+        'created_at': message.created_at.isoformat(),
+    }
+
+
+class AccountSyncHub:
+    """按账号共享的消息同步任务管理器（每个进程一个实例）"""
+
+    def __init__(self, channel_layer=None):
+        self._channel_layer = channel_layer
+        self._subscribers = {}   # auth_code_id -> set(channel_name)
+        self._tasks = {}         # auth_code_id -> asyncio.Task
+        self._lock = asyncio.Lock()
+
+    @property
+    def channel_layer(self):
+        if self._channel_layer is None:
+            self._channel_layer = get_channel_layer()
+        return self._channel_layer
+
+    def subscriber_count(self, auth_code_id):
+        return len(self._subscribers.get(auth_code_id, ()))
+
+    def is_running(self, auth_code_id):
+        task = self._tasks.get(auth_code_id)
+        return task is not None and not task.done()
+
+    async def subscribe(self, auth_code_id, channel_name):
+        """订阅账号的新消息推送"""
+        await self.channel_layer.group_add(group_name(auth_code_id), channel_name)
+        async with self._lock:
+            self._subscribers.setdefault(auth_code_id, set()).add(channel_name)
+            if not self.is_running(auth_code_id):
+                self._tasks[auth_code_id] = asyncio.create_task(self._sync_loop(auth_code_id))
+
+    async def unsubscribe(self, auth_code_id, channel_name):
+        """取消订阅，最后一个订阅者离开时停止同步任务"""
+        await self.channel_layer.group_discard(group_name(auth_code_id), channel_name)
+        task = None
+        async with self._lock:
+            subscribers = self._subscribers.get(auth_code_id)
+            if subscribers is not None:
+                subscribers.discard(channel_name)
+                if not subscribers:
+                    del self._subscribers[auth_code_id]
+                    task = self._tasks.pop(auth_code_id, None)
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _load_auth_code(self, auth_code_id):
+        from .models import AuthCode
+        return await database_sync_to_async(
+            AuthCode.objects.select_related('connection').get
+        )(pk=auth_code_id)
+
+    async def poll_once(self, auth_code):
+        """向协议服务器拉取一次新消息，返回原始消息列表"""
+        client = get_async_client(auth_code.connection.url)
+        response = await client.post('/api/Msg/Sync', json={'Scene': 0, 'Synckey': '', 'Wxid': auth_code.code})
+        data = response.json()
+        if not data.get('Success'):
+            raise ProtocolRequestError(data.get('Message') or '同步失败')
+        return (data.get('Data') or {}).get('AddMsgs') or []
+
+    async def _sync_loop(self, auth_code_id):
+        try:
+            auth_code = await self._load_auth_code(auth_code_id)
+        except Exception as e:
+            logger.warning('同步任务启动失败 auth_code=%s: %s', auth_code_id, e)
+            return
+
+        store = database_sync_to_async(ingest_messages)
+        interval = MIN_POLL_INTERVAL
+        while True:
+            try:
+                raw_messages = await self.poll_once(auth_code)
+                saved = await store(auth_code, raw_messages) if raw_messages else []
+                if saved:
+                    await self.channel_layer.group_send(group_name(auth_code_id), {
+                        'type': 'chat.new_messages',
+                        'auth_code_id': auth_code_id,
+                        'messages': [serialize_message(message) for message in saved],
+                    })
+                    interval = MIN_POLL_INTERVAL
+                else:
+                    interval = min(interval * IDLE_BACKOFF, MAX_POLL_INTERVAL)
+            except asyncio.CancelledError:
+                raise
+            except (ProtocolRequestError, ValueError) as e:
+                logger.info('消息同步失败 auth_code=%s: %s', auth_code_id, e)
+                interval = ERROR_POLL_INTERVAL
+            except Exception:
+                logger.exception('消息同步异常 auth_code=%s', auth_code_id)
+                interval = ERROR_POLL_INTERVAL
+            await asyncio.sleep(interval)
+
+
+# 进程内共享实例
+sync_hub = AccountSyncHub()
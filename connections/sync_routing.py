@@ -0,0 +1,10 @@
+"""
+聊天消息推送 WebSocket 路由（编译的 connections.routing 之外新增的路由）
+"""
+from django.urls import re_path
+
+from . import sync_consumers
+
+websocket_urlpatterns = [
+    re_path(r'ws/chat/(?P<connection_id>\d+)/sync/$', sync_consumers.ChatSyncConsumer.as_asgi()),
+]
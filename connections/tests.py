@@ -0,0 +1,335 @@
+import threading
+import unittest
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+from django.db import connection as db_connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import User
+
+from . import archive, chat_history, ingest, search
+from .status_writer import AuthCodeStatusWriter
+from .models import AuthCode, ChatArchiveSegment, ChatMessage, ChatSession, Connection
+
+
+class CursorRoundTripTests(SimpleTestCase):
+    def _round_trip(self, created_at, pk=7):
+        message = ChatMessage(id=pk, created_at=created_at)
+        return chat_history.decode_cursor(chat_history.encode_cursor(message))
+
+    @override_settings(USE_TZ=True)
+    def test_aware_datetime(self):
+        created_at = datetime(2024, 3, 1, 8, 30, 15, 123456, tzinfo=dt_timezone(timedelta(hours=8)))
+        decoded, pk = self._round_trip(created_at)
+        self.assertEqual(decoded, created_at)
+        self.assertEqual(decoded.tzinfo, dt_timezone.utc)
+        self.assertEqual(pk, 7)
+
+    @override_settings(USE_TZ=False)
+    def test_naive_datetime(self):
+        created_at = datetime(2024, 3, 1, 8, 30, 15, 123456)
+        decoded, pk = self._round_trip(created_at)
+        self.assertEqual(decoded, created_at)
+        self.assertIsNone(decoded.tzinfo)
+        self.assertEqual(pk, 7)
+
+    @override_settings(USE_TZ=True)
+    def test_microseconds_survive_large_timestamps(self):
+        # 整数编码：浮点时间戳在这个量级会丢失微秒
+        created_at = datetime(2099, 12, 31, 23, 59, 59, 999999, tzinfo=dt_timezone.utc)
+        self.assertEqual(self._round_trip(created_at)[0], created_at)
+
+    def test_invalid_cursor(self):
+        for cursor in ('', 'abc', '123', '1_x', None):
+            with self.assertRaises(chat_history.InvalidCursor):
+                chat_history.decode_cursor(cursor)
+
+
+class HistoryPagingTests(TestCase):
+    """翻页的游标在 USE_TZ 开启和关闭时都不重复、不遗漏"""
+
+    def _create_messages(self, base):
+        user = User.objects.create_user('chat', password='x')
+        connection = Connection.objects.create(user=user, name='c', url='http://p')
+        auth_code = AuthCode.objects.create(connection=connection, code='me')
+        for index in range(7):
+            message = ChatMessage.objects.create(auth_code=auth_code, message_id=str(index), from_user='friend',
+                                                 to_user='me', content=f'm{index}')
+            # 每两条共用一个时间，检查 id 作为第二排序键
+            ChatMessage.objects.filter(pk=message.pk).update(created_at=base + timedelta(microseconds=index // 2))
+        return auth_code, message.partner_id
+
+    def _page_backwards(self, auth_code, partner_id):
+        page = chat_history.get_history_page(auth_code, partner_id, limit=2)
+        contents = [m.content for m in page['messages']]
+        while page['has_more']:
+            page = chat_history.get_history_page(auth_code, partner_id, before=page['before'], limit=2)
+            contents = [m.content for m in page['messages']] + contents
+        return contents
+
+    def _page_forwards(self, auth_code, partner_id):
+        page = chat_history.get_history_page(auth_code, partner_id, after='0_0', limit=3)
+        contents = [m.content for m in page['messages']]
+        while page['has_more']:
+            page = chat_history.get_history_page(auth_code, partner_id, after=page['after'], limit=3)
+            contents += [m.content for m in page['messages']]
+        return contents
+
+    @override_settings(USE_TZ=True)
+    def test_paging_with_time_zone_support(self):
+        auth_code, partner_id = self._create_messages(datetime(2024, 3, 1, 8, 0, tzinfo=dt_timezone.utc))
+        expected = [f'm{index}' for index in range(7)]
+        self.assertEqual(self._page_backwards(auth_code, partner_id), expected)
+        self.assertEqual(self._page_forwards(auth_code, partner_id), expected)
+
+    @override_settings(USE_TZ=False)
+    def test_paging_without_time_zone_support(self):
+        auth_code, partner_id = self._create_messages(datetime(2024, 3, 1, 8, 0))
+        expected = [f'm{index}' for index in range(7)]
+        self.assertEqual(self._page_backwards(auth_code, partner_id), expected)
+        self.assertEqual(self._page_forwards(auth_code, partner_id), expected)
+
+
+def _raw(message_id, from_user='friend', to_user='me', content='hi'):
+    return {'NewMsgId': message_id, 'FromUserName': {'string': from_user}, 'ToUserName': {'string': to_user},
+            'Content': {'string': content}}
+
+
+class IngestTestMixin:
+    def _auth_code(self):
+        ingest.recent_ids.clear()
+        user = User.objects.create_user('ingest', password='x')
+        connection = Connection.objects.create(user=user, name='c', url='http://p')
+        return AuthCode.objects.create(connection=connection, code='me')
+
+
+class IngestTests(IngestTestMixin, TestCase):
+    def setUp(self):
+        self.auth_code = self._auth_code()
+
+    def test_new_messages_update_session_once(self):
+        saved = ingest.ingest_messages(self.auth_code, [_raw('1'), _raw('2'), _raw('2'), _raw('3', 'me', 'friend')])
+
+        self.assertEqual([m.message_id for m in saved], ['1', '2', '3'])
+        session = ChatSession.objects.get(auth_code=self.auth_code, partner_id='friend')
+        self.assertEqual(session.unread_count, 2)
+        self.assertEqual(session.last_message_id, saved[-1].pk)
+
+    def test_already_stored_messages_are_not_counted(self):
+        ingest.ingest_messages(self.auth_code, [_raw('1')])
+        ingest.recent_ids.clear()
+
+        saved = ingest.ingest_messages(self.auth_code, [_raw('1'), _raw('2')])
+
+        self.assertEqual([m.message_id for m in saved], ['2'])
+        self.assertEqual(ChatSession.objects.get(partner_id='friend').unread_count, 2)
+        self.assertEqual(ChatMessage.objects.count(), 2)
+
+    def test_recent_ids_skip_the_database(self):
+        ingest.ingest_messages(self.auth_code, [_raw('1')])
+        with self.assertNumQueries(0):
+            self.assertEqual(ingest.ingest_messages(self.auth_code, [_raw('1')]), [])
+
+    def test_auth_code_is_locked_before_reading_existing_messages(self):
+        with CaptureQueriesContext(db_connection) as queries:
+            ingest.ingest_messages(self.auth_code, [_raw('1')])
+        selects = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('SELECT')]
+        self.assertIn(AuthCode._meta.db_table, selects[0])
+        self.assertIn(ChatMessage._meta.db_table, selects[1])
+
+
+@unittest.skipUnless(db_connection.features.has_select_for_update, '需要支持 SELECT ... FOR UPDATE 的数据库')
+class ConcurrentIngestTests(IngestTestMixin, TransactionTestCase):
+    def test_concurrent_ingest_counts_each_message_once(self):
+        auth_code = self._auth_code()
+        barrier = threading.Barrier(4)
+        results = []
+
+        def run():
+            try:
+                barrier.wait(5)
+                results.append(ingest._insert(auth_code, {str(i): ingest.normalize_message(_raw(str(i)), 'me')
+                                                          for i in range(20)})[0])
+            finally:
+                db_connection.close()
+
+        threads = [threading.Thread(target=run) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+
+        self.assertEqual(sum(len(saved) for saved in results), 20)
+        self.assertEqual(ChatSession.objects.get(partner_id='friend').unread_count, 20)
+
+
+class StatusWriterTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('status', password='x')
+        connection = Connection.objects.create(user=user, name='c', url='http://p')
+        self.codes = [AuthCode.objects.create(connection=connection, code=f'w{index}', nickname='old',
+                                              is_online=False, last_query_success=True)
+                      for index in range(3)]
+        self.now = datetime(2024, 3, 1, 8, 0, tzinfo=dt_timezone.utc)
+
+    def test_unchanged_rows_only_touch_timestamps(self):
+        codes = list(AuthCode.objects.order_by('pk'))
+        # 3 行时间戳合并为一条 UPDATE，外加事务的 SAVEPOINT
+        with AuthCodeStatusWriter() as writer:
+            for code in codes:
+                writer.record(code, last_query_time=self.now, last_status_check_time=self.now)
+            with self.assertNumQueries(3):
+                writer.flush()
+
+        self.assertEqual((writer.written, writer.touched), (0, 3))
+        self.assertEqual(AuthCode.objects.filter(last_query_time=self.now).count(), 3)
+
+    def test_changed_rows_are_written_and_failures_keep_profile(self):
+        codes = list(AuthCode.objects.order_by('pk'))
+        with AuthCodeStatusWriter() as writer:
+            writer.record_result(codes[0], success=True, is_online=True, nickname='new', now=self.now)
+            writer.record_result(codes[1], success=False, is_online=True, nickname='ignored', now=self.now)
+            writer.record_result(codes[2], success=True, is_online=False, now=self.now)
+
+        self.assertEqual((writer.written, writer.touched), (2, 1))
+        stored = {code.code: code for code in AuthCode.objects.all()}
+        self.assertEqual((stored['w0'].nickname, stored['w0'].is_online), ('new', True))
+        self.assertEqual((stored['w1'].nickname, stored['w1'].last_query_success), ('old', False))
+        self.assertEqual(stored['w2'].last_status_check_time, self.now)
+
+    def test_touched_row_promoted_to_changed_keeps_earlier_timestamps(self):
+        code = AuthCode.objects.get(code='w0')
+        writer = AuthCodeStatusWriter()
+        writer.record(code, last_query_time=self.now, last_status_check_time=self.now)
+        writer.record(AuthCode.objects.get(pk=code.pk), is_online=True)
+        writer.flush()
+
+        stored = AuthCode.objects.get(pk=code.pk)
+        self.assertTrue(stored.is_online)
+        self.assertEqual(stored.last_status_check_time, self.now)
+        self.assertEqual((writer.written, writer.touched), (1, 0))
+
+    def test_batches_flush_automatically(self):
+        writer = AuthCodeStatusWriter(batch_size=2)
+        for code in AuthCode.objects.order_by('pk'):
+            writer.record(code, nickname=f'n-{code.code}')
+        self.assertEqual(writer.written, 2)
+        self.assertEqual(len(writer), 1)
+
+    def test_unknown_field_is_rejected(self):
+        with self.assertRaises(ValueError):
+            AuthCodeStatusWriter().record(self.codes[0], code='x')
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('search', password='x')
+        connection = Connection.objects.create(user=user, name='c', url='http://p')
+        self.auth_code = AuthCode.objects.create(connection=connection, code='me')
+        self.other = AuthCode.objects.create(connection=connection, code='other')
+        self._message(self.auth_code, 'alice', '明天下午开会讨论<预算>')
+        self._message(self.auth_code, 'bob', '预算已经批下来了')
+        self._message(self.auth_code, 'bob', '周末一起吃饭')
+        self._message(self.other, 'alice', '另一个账号的预算表')
+
+    def _message(self, auth_code, partner, content):
+        return ChatMessage.objects.create(auth_code=auth_code, message_id=f'{auth_code.code}-{content}',
+                                          from_user=partner, to_user=auth_code.code, content=content)
+
+    def _contents(self, query, **kwargs):
+        return sorted(r['message'].content for r in search.search_messages(self.auth_code, query, **kwargs))
+
+    def test_scoped_to_account_and_partner(self):
+        self.assertEqual(self._contents('批下来'), ['预算已经批下来了'])
+        self.assertEqual(self._contents('预算'), ['明天下午开会讨论<预算>', '预算已经批下来了'])
+        self.assertEqual(self._contents('预算', partner_id='alice'), ['明天下午开会讨论<预算>'])
+        self.assertEqual(self._contents('另一个账号'), [])
+
+    def test_snippet_is_escaped_and_highlighted(self):
+        result = search.search_messages(self.auth_code, '开会讨论')[0]
+        self.assertIn('<mark>开会讨论</mark>', result['snippet'])
+        self.assertIn('&lt;预算&gt;', result['snippet'])
+
+    def test_index_follows_updates_and_deletes(self):
+        message = ChatMessage.objects.get(content='周末一起吃饭')
+        ChatMessage.objects.filter(pk=message.pk).update(content='周末一起爬山')
+        self.assertEqual(self._contents('一起吃饭'), [])
+        self.assertEqual(self._contents('一起爬山'), ['周末一起爬山'])
+        message.delete()
+        self.assertEqual(self._contents('一起爬山'), [])
+
+    def test_rebuild_keeps_results(self):
+        search.rebuild_search_index()
+        self.assertEqual(self._contents('批下来'), ['预算已经批下来了'])
+
+    def test_short_and_empty_queries(self):
+        self.assertEqual(self._contents('周末'), ['周末一起吃饭'])
+        self.assertEqual(self._contents('  '), [])
+        self.assertEqual(len(search.search_messages(self.auth_code, '预', limit=1)), 1)
+
+
+@override_settings(USE_TZ=True)
+class ArchiveTests(TestCase):
+    def setUp(self):
+        archive._segment_cache.clear()
+        user = User.objects.create_user('archive', password='x')
+        connection = Connection.objects.create(user=user, name='c', url='http://p')
+        self.auth_code = AuthCode.objects.create(connection=connection, code='me')
+        now = datetime(2024, 6, 15, 12, 0, tzinfo=dt_timezone.utc)
+        # 两个月前 4 条、一个月前 4 条、近期 3 条，同一会话
+        ages = [60, 60, 59, 59, 30, 30, 29, 29, 2, 1, 0]
+        for index, age in enumerate(ages):
+            message = ChatMessage.objects.create(auth_code=self.auth_code, message_id=str(index), from_user='friend',
+                                                 to_user='me', content=f'm{index}')
+            ChatMessage.objects.filter(pk=message.pk).update(created_at=now - timedelta(days=age))
+        self.partner_id = message.partner_id
+        self.now = now
+
+    def _archive(self, **kwargs):
+        with mock.patch.object(archive.timezone, 'now', return_value=self.now):
+            return archive.archive_messages(days=14, pause=0, **kwargs)
+
+    def test_moves_old_messages_into_monthly_segments(self):
+        self.assertEqual(self._archive(dry_run=True)['archivable'], 8)
+        result = self._archive(batch_size=3)
+
+        self.assertEqual(result['archived'], 8)
+        self.assertEqual(ChatMessage.objects.count(), 3)
+        segments = ChatArchiveSegment.objects.all()
+        self.assertEqual(sum(segment.message_count for segment in segments), 8)
+        self.assertEqual({segment.period.month for segment in segments}, {4, 5})
+        self.assertLess(result['compressed_bytes'], result['raw_bytes'])
+
+    def test_last_message_of_a_session_is_kept(self):
+        pinned = ChatMessage.objects.get(message_id='7')
+        ChatSession.objects.create(auth_code=self.auth_code, partner_id=self.partner_id, last_message=pinned)
+
+        self.assertEqual(self._archive()['archived'], 7)
+        self.assertTrue(ChatMessage.objects.filter(pk=pinned.pk).exists())
+
+    def test_archived_messages_keep_ids_and_content(self):
+        originals = {m.pk: (m.content, m.created_at) for m in ChatMessage.objects.all()}
+        self._archive()
+        archived = archive.load_archived(self.auth_code, self.partner_id, limit=100)
+
+        self.assertEqual(len(archived), 8)
+        self.assertEqual([m.pk for m in archived], sorted((m.pk for m in archived), reverse=True))
+        for message in archived:
+            self.assertEqual((message.content, message.created_at), originals[message.pk])
+
+    def test_history_pages_continue_into_archive(self):
+        self._archive()
+        page = chat_history.get_history_page(self.auth_code, self.partner_id, limit=4)
+        contents = [m.content for m in page['messages']]
+        while page['has_more']:
+            page = chat_history.get_history_page(self.auth_code, self.partner_id, before=page['before'], limit=4)
+            contents = [m.content for m in page['messages']] + contents
+
+        self.assertEqual(contents, [f'm{index}' for index in range(11)])
+
+    def test_archived_messages_leave_search(self):
+        self._archive()
+        self.assertEqual(search.search_messages(self.auth_code, 'm0'), [])
+        self.assertEqual(len(search.search_messages(self.auth_code, 'm10')), 1)
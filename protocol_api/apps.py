@@ -8,3 +8,17 @@ class ProtocolApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'protocol_api'
     verbose_name = '协议服务API'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+
+        from . import audit, odrea_cache
+        from .models import OdreaCachePolicy
+
+        # 原接口的 API 请求日志改由后台写入器批量写入
+        audit.route_compiled_views()
+
+        post_save.connect(odrea_cache.invalidate_policies, sender=OdreaCachePolicy,
+                          dispatch_uid='odrea_cache_policy_saved')
+        post_delete.connect(odrea_cache.invalidate_policies, sender=OdreaCachePolicy,
+                            dispatch_uid='odrea_cache_policy_deleted')
@@ -0,0 +1,272 @@
+"""
+API 请求审计日志异步批量写入
+
+请求处理中只把 APIRequest 放入进程内队列，由后台线程每 N 条或每 T 毫秒
+用 bulk_create 写入一次：
+
+- 队列有上限（背压）：满了以后按策略阻塞等待、丢弃新记录或丢弃最旧记录
+- 成功请求可按比例采样，失败请求始终保留
+- 进程退出时（atexit）把队列中剩余记录全部写入
+
+经这里写入的记录：
+
+- 编译的原接口 protocol_api.views（get_code / get_openid / get_mobile / read_article 等）：
+  原来通过模块级的 log_api_request 同步 APIRequest.objects.create，应用启动时替换为
+  这里的 log_api_request（见 route_compiled_views，api.views.odrea_system 同样调用这些处理函数）
+- odrea_system 命中缓存 / 共享结果的请求（protocol_api.odrea_views）
+
+用法（替代直接 APIRequest.objects.create）::
+
+    from protocol_api.audit import log_api_request
+
+    log_api_request(request, 'get_code', wxid=wxid, appid=appid,
+                    request_data=data, response_data=result, success=True)
+
+配置（API_CONFIG）：
+- AUDIT_ASYNC                 是否异步写入，默认 True；False 时在请求中直接写入
+- AUDIT_BATCH_SIZE            每批条数，默认 200
+- AUDIT_FLUSH_INTERVAL_MS     最长写入间隔（毫秒），默认 500
+- AUDIT_QUEUE_SIZE            队列上限，默认 10000
+- AUDIT_OVERFLOW_POLICY       block | drop_newest | drop_oldest，默认 block
+- AUDIT_BLOCK_TIMEOUT_MS      block 策略最长等待（毫秒），超时后丢弃，默认 50
+- AUDIT_SUCCESS_SAMPLE_RATE   成功请求的记录比例 0~1，默认 1（全部记录）
+"""
+import atexit
+import importlib
+import logging
+import os
+import queue
+import random
+import threading
+import time
+
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from config import API_CONFIG
+from utils.db_retry import retry_on_locked
+
+logger = logging.getLogger(__name__)
+
+AUDIT_ASYNC = API_CONFIG.get('AUDIT_ASYNC', True)
+BATCH_SIZE = API_CONFIG.get('AUDIT_BATCH_SIZE', 200)
+FLUSH_INTERVAL_MS = API_CONFIG.get('AUDIT_FLUSH_INTERVAL_MS', 500)
+QUEUE_SIZE = API_CONFIG.get('AUDIT_QUEUE_SIZE', 10000)
+OVERFLOW_POLICY = API_CONFIG.get('AUDIT_OVERFLOW_POLICY', 'block')
+BLOCK_TIMEOUT_MS = API_CONFIG.get('AUDIT_BLOCK_TIMEOUT_MS', 50)
+SUCCESS_SAMPLE_RATE = API_CONFIG.get('AUDIT_SUCCESS_SAMPLE_RATE', 1.0)
+
+OVERFLOW_POLICIES = ('block', 'drop_newest', 'drop_oldest')
+
+
+def get_client_ip(request):
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if forwarded:
+        return forwarded.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR') or '0.0.0.0'
+
+
+def build_api_request(request, request_type, wxid='', appid='', request_data=None, response_data=None,
+                      success=True, error_message='', cache_status=''):
+    """根据请求构造（未保存的）APIRequest"""
+    from .models import APIRequest
+
+    user = getattr(request, 'user', None)
+    return APIRequest(
+        user=user if user is not None and user.is_authenticated else None,
+        request_type=request_type,
+        wxid=wxid or '',
+        appid=appid or '',
+        request_data=request_data or {},
+        response_data=response_data or {},
+        success=success,
+        error_message=error_message or '',
+        ip_address=get_client_ip(request),
+        user_agent=request.META.get('HTTP_USER_AGENT', ''),
+        cache_status=cache_status or '',
+        created_at=timezone.now(),
+    )
+
+
+class AuditLogWriter:
+    """审计日志后台批量写入器（每个进程一个实例）"""
+
+    def __init__(self, batch_size=BATCH_SIZE, flush_interval_ms=FLUSH_INTERVAL_MS, queue_size=QUEUE_SIZE,
+                 overflow_policy=OVERFLOW_POLICY, block_timeout_ms=BLOCK_TIMEOUT_MS,
+                 success_sample_rate=SUCCESS_SAMPLE_RATE):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f'不支持的溢出策略: {overflow_policy}')
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout_ms / 1000
+        self.success_sample_rate = success_sample_rate
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'enqueued': 0, 'written': 0, 'dropped': 0, 'sampled_out': 0,
+                       'failed': 0, 'flushes': 0, 'last_flush_ms': 0.0}
+
+    def _count(self, key, value=1):
+        with self._stats_lock:
+            self._stats[key] += value
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['queued'] = self._queue.qsize()
+        return stats
+
+    # ---- 生产者 ----
+
+    def submit(self, record):
+        """放入队列，返回是否被接受"""
+        if record.success and self.success_sample_rate < 1 and random.random() >= self.success_sample_rate:
+            self._count('sampled_out')
+            return False
+
+        self._ensure_started()
+        try:
+            if self.overflow_policy == 'block':
+                self._queue.put(record, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(record)
+        except queue.Full:
+            if self.overflow_policy != 'drop_oldest':
+                self._count('dropped')
+                return False
+            try:
+                self._queue.get_nowait()
+                self._count('dropped')
+            except queue.Empty:
+                pass
+            try:
+                self._queue.put_nowait(record)
+            except queue.Full:
+                self._count('dropped')
+                return False
+        self._count('enqueued')
+        return True
+
+    # ---- 写入线程 ----
+
+    def _ensure_started(self):
+        # fork 出的子进程（多 worker）需要重新启动自己的写入线程
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)
+            self._pid = os.getpid()
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+            self._thread.start()
+
+    def _next_batch(self):
+        """等待直到凑满一批或超过写入间隔"""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        try:
+            while not self._stop_event.is_set():
+                batch = self._next_batch()
+                if batch:
+                    self._write(batch)
+        finally:
+            close_old_connections()
+
+    @retry_on_locked()
+    def _bulk_create(self, batch):
+        from protocol_config.stats import record_many
+        from .models import APIRequest
+
+        # bulk_create 不触发 post_save，同一事务内更新每日统计
+        with transaction.atomic():
+            APIRequest.objects.bulk_create(batch, batch_size=self.batch_size)
+            record_many('api_request', batch)
+
+    def _write(self, batch):
+        started = time.monotonic()
+        try:
+            self._bulk_create(batch)
+            self._count('written', len(batch))
+        except Exception:
+            logger.exception('写入 API 请求日志失败，丢弃 %d 条', len(batch))
+            self._count('failed', len(batch))
+        with self._stats_lock:
+            self._stats['flushes'] += 1
+            self._stats['last_flush_ms'] = round((time.monotonic() - started) * 1000, 2)
+
+    def flush(self):
+        """在当前线程写入队列中的全部记录"""
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self._write(batch)
+
+    def shutdown(self, timeout=5):
+        """停止写入线程并写入剩余记录"""
+        self._stop_event.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout)
+        self.flush()
+        close_old_connections()
+
+
+audit_writer = AuditLogWriter()
+atexit.register(audit_writer.shutdown)
+
+
+def log_api_request(request, request_type, wxid='', appid='', request_data=None, response_data=None,
+                    success=True, error_message='', cache_status=''):
+    """记录一次 API 调用（cache_status 见 protocol_api.odrea_cache）"""
+    record = build_api_request(request, request_type, wxid, appid, request_data, response_data,
+                               success, error_message, cache_status)
+    if not AUDIT_ASYNC:
+        record.save()
+        return record
+    audit_writer.submit(record)
+    return record
+
+
+# 编译的原接口模块，其中的 log_api_request 签名与上面一致
+COMPILED_VIEWS = 'protocol_api.views'
+
+
+def route_compiled_views():
+    """把编译的原接口记录 APIRequest 的函数替换为 log_api_request，返回是否已替换
+
+    编译模块调用函数时按模块全局名查找，替换模块属性即可生效。模块无法导入（与当前
+    Python 版本不匹配等）时保持原样，原接口继续同步写入。
+    """
+    try:
+        views = importlib.import_module(COMPILED_VIEWS)
+    except Exception as e:
+        logger.warning('无法导入 %s，原接口的 API 请求日志仍同步写入: %s', COMPILED_VIEWS, e)
+        return False
+    if not callable(getattr(views, 'log_api_request', None)):
+        logger.warning('%s 中没有 log_api_request，原接口的 API 请求日志仍同步写入', COMPILED_VIEWS)
+        return False
+    views.log_api_request = log_api_request
+    return True
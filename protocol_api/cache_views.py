@@ -0,0 +1,98 @@
+"""
+odrea_system 接口缓存策略管理（管理员）
+"""
+import json
+from datetime import timedelta
+
+from django.db.models import Count
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET, require_http_methods, require_POST
+
+from protocol_config.job_views import admin_required
+
+from . import odrea_cache
+from .models import APIRequest, OdreaCachePolicy
+
+POLICY_FIELDS = ('code_ttl', 'code_coalesce', 'openid_ttl', 'openid_coalesce',
+                 'mobile_ttl', 'mobile_coalesce', 'is_active')
+
+
+def serialize_policy(policy):
+    data = {'id': policy.id, 'appid': policy.appid, 'updated_at': policy.updated_at.isoformat()}
+    data.update({field: getattr(policy, field) for field in POLICY_FIELDS})
+    return data
+
+
+@admin_required
+@require_http_methods(['GET', 'POST'])
+def policy_list(request):
+    """GET 策略列表；POST 按 appid 新建或更新策略（appid 为空是默认策略）"""
+    if request.method == 'GET':
+        policies = [serialize_policy(p) for p in OdreaCachePolicy.objects.all()]
+        return JsonResponse({'code': 200, 'msg': 'success', 'data': {
+            'policies': policies,
+            'defaults': odrea_cache.DEFAULT_POLICY,
+        }})
+
+    try:
+        data = json.loads(request.body or b'{}')
+        appid = str(data.get('appid') or '').strip()
+        values = {}
+        for field in POLICY_FIELDS:
+            if field not in data:
+                continue
+            if field.endswith('_ttl'):
+                values[field] = max(int(data[field]), 0)
+            else:
+                values[field] = bool(data[field])
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({'code': 400, 'msg': '请求数据格式错误'}, status=400)
+
+    policy, created = OdreaCachePolicy.objects.update_or_create(appid=appid, defaults=values)
+    return JsonResponse({'code': 200, 'msg': '已创建' if created else '已更新', 'data': serialize_policy(policy)})
+
+
+@admin_required
+@require_POST
+def policy_delete(request, policy_id):
+    deleted, _ = OdreaCachePolicy.objects.filter(pk=policy_id).delete()
+    if not deleted:
+        return JsonResponse({'code': 404, 'msg': '策略不存在'}, status=404)
+    return JsonResponse({'code': 200, 'msg': '已删除'})
+
+
+@admin_required
+@require_POST
+def cache_clear(request):
+    """清空缓存，body 可选 {"wxid": ..., "appid": ...} 只清除一个账号"""
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'code': 400, 'msg': '请求数据格式错误'}, status=400)
+    if data.get('wxid'):
+        odrea_cache.invalidate(data['wxid'], data.get('appid') or '')
+    else:
+        odrea_cache.clear()
+    return JsonResponse({'code': 200, 'msg': '已清除'})
+
+
+@admin_required
+@require_GET
+def cache_report(request):
+    """进程内命中统计 + 最近 N 小时审计记录中按 appid / 接口 / 缓存状态的请求数"""
+    try:
+        hours = min(max(int(request.GET.get('hours', 24)), 1), 24 * 30)
+    except ValueError:
+        hours = 24
+    since = timezone.now() - timedelta(hours=hours)
+    rows = (APIRequest.objects
+            .filter(created_at__gte=since, request_type__in=list(odrea_cache.ENDPOINTS))
+            .values('appid', 'request_type', 'cache_status')
+            .annotate(count=Count('id'))
+            .order_by('appid', 'request_type', 'cache_status'))
+    return JsonResponse({'code': 200, 'msg': 'success', 'data': {
+        'hours': hours,
+        'process': odrea_cache.stats(),
+        'requests': list(rows),
+    }})
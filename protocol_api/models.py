@@ -3,6 +3,7 @@
 """
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -16,6 +17,13 @@ class APIRequest(models.Model):
         ('get_mobile', '获取手机号'),
         ('get_openid', '获取OpenID'),
     ]
+    CACHE_STATUS_CHOICES = [
+        ('', '未缓存'),
+        ('miss', '未命中'),
+        ('hit', '命中缓存'),
+        ('coalesced', '合并请求'),
+        ('bypass', '跳过缓存'),
+    ]
     
     user = models.ForeignKey(
         User,
@@ -63,8 +71,17 @@ class APIRequest(models.Model):
         blank=True,
         verbose_name='用户代理'
     )
+    cache_status = models.CharField(
+        max_length=10,
+        choices=CACHE_STATUS_CHOICES,
+        blank=True,
+        default='',
+        verbose_name='缓存状态'
+    )
+    # 异步批量写入时保留请求发生的时间（auto_now_add 会被 bulk_create 覆盖为写入时间）
     created_at = models.DateTimeField(
-        auto_now_add=True,
+        default=timezone.now,
+        editable=False,
         verbose_name='请求时间'
     )
     
@@ -73,6 +90,12 @@ class APIRequest(models.Model):
         verbose_name_plural = 'API请求记录'
         db_table = 'api_request'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['user', '-created_at']),
+            models.Index(fields=['request_type', 'created_at']),
+            models.Index(fields=['user', 'request_type', 'created_at']),
+        ]
     
     def __str__(self):
         status = '成功' if self.success else '失败'
@@ -126,3 +149,61 @@ class APIKey(models.Model):
     def has_permission(self, permission):
         """检查是否有指定权限"""
         return permission in self.permissions or 'all' in self.permissions
+
+
+class OdreaCachePolicy(models.Model):
+    """odrea_system 接口缓存策略（按 appid）
+
+    appid 为空的记录是默认策略。TTL 为 0 时不缓存；
+    合并开启时同一 (wxid, appid) 的并发请求只转发一次协议服务。
+    """
+    appid = models.CharField(
+        max_length=100,
+        unique=True,
+        blank=True,
+        verbose_name='应用ID',
+        help_text='留空为默认策略'
+    )
+    code_ttl = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Code缓存时间（秒）',
+        help_text='code 只能换取一次 session，一般不缓存'
+    )
+    code_coalesce = models.BooleanField(
+        default=False,
+        verbose_name='合并Code请求',
+        help_text='开启后并发请求会拿到同一个 code，只有一方能换取成功'
+    )
+    openid_ttl = models.PositiveIntegerField(
+        default=3600,
+        verbose_name='OpenID缓存时间（秒）'
+    )
+    openid_coalesce = models.BooleanField(
+        default=True,
+        verbose_name='合并OpenID请求'
+    )
+    mobile_ttl = models.PositiveIntegerField(
+        default=600,
+        verbose_name='手机号缓存时间（秒）'
+    )
+    mobile_coalesce = models.BooleanField(
+        default=True,
+        verbose_name='合并手机号请求'
+    )
+    is_active = models.BooleanField(
+        default=True,
+        verbose_name='是否启用'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='更新时间'
+    )
+
+    class Meta:
+        verbose_name = '接口缓存策略'
+        verbose_name_plural = '接口缓存策略'
+        db_table = 'api_odrea_cache_policy'
+        ordering = ['appid']
+
+    def __str__(self):
+        return self.appid or '默认策略'
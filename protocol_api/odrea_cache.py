@@ -0,0 +1,136 @@
+"""
+odrea_system 接口（get_code / get_openid / get_mobile）请求合并与缓存
+
+下游小程序后端经常在一秒内多次请求同一 (wxid, appid)。这里按 appid 的策略
+（OdreaCachePolicy，appid 为空的记录是默认策略）：
+
+- 合并：同一 (接口, wxid, appid, 其他参数) 的并发请求只转发一次协议服务，其他请求共享结果
+- 缓存：openid / 手机号稳定，默认缓存一段时间；code 只能换取一次 session，默认不缓存也不合并
+
+返回的 cache_status（hit / miss / coalesced / bypass，未走缓存时为空）写入 APIRequest.cache_status。
+
+接口入口见 protocol_api.odrea_views（在 runtime_urls 中替换 api/protocol/odrea_system/）::
+
+    from protocol_api.odrea_cache import call
+
+    result, cache_status = call('get_openid', wxid, appid, load, extra=to_wxid, scope='protocol')
+
+配置（API_CONFIG，没有策略记录时使用）：
+- ODREA_CACHE_ENABLED      是否启用，默认 True
+- ODREA_CACHE_SIZE         每个接口最多缓存的条目数，默认 10000
+- ODREA_CODE_TTL           code 缓存时间（秒），默认 0
+- ODREA_OPENID_TTL         openid 缓存时间（秒），默认 3600
+- ODREA_MOBILE_TTL         手机号缓存时间（秒），默认 600
+- ODREA_POLICY_REFRESH     策略在进程内的缓存时间（秒），默认 30
+"""
+import logging
+
+from config import API_CONFIG
+from utils.coalescing import CoalescingCache, TTLCache
+
+logger = logging.getLogger(__name__)
+
+CACHE_ENABLED = API_CONFIG.get('ODREA_CACHE_ENABLED', True)
+CACHE_SIZE = API_CONFIG.get('ODREA_CACHE_SIZE', 10000)
+POLICY_REFRESH = API_CONFIG.get('ODREA_POLICY_REFRESH', 30)
+
+# 接口 -> 策略字段前缀
+ENDPOINTS = {
+    'get_code': 'code',
+    'get_openid': 'openid',
+    'get_mobile': 'mobile',
+}
+
+DEFAULT_POLICY = {
+    'code': {'ttl': API_CONFIG.get('ODREA_CODE_TTL', 0), 'coalesce': False},
+    'openid': {'ttl': API_CONFIG.get('ODREA_OPENID_TTL', 3600), 'coalesce': True},
+    'mobile': {'ttl': API_CONFIG.get('ODREA_MOBILE_TTL', 600), 'coalesce': True},
+}
+
+
+def _cacheable(value):
+    """只缓存成功的结果"""
+    if value is None or value is False:
+        return False
+    if isinstance(value, dict):
+        return bool(value.get('success', True))
+    return True
+
+
+caches = {endpoint: CoalescingCache(maxsize=CACHE_SIZE, cache_if=_cacheable) for endpoint in ENDPOINTS}
+_policies = TTLCache(maxsize=1024, ttl=POLICY_REFRESH)
+
+
+# ==================== 策略 ====================
+
+def _policy_from_model(policy):
+    return {
+        prefix: {'ttl': getattr(policy, f'{prefix}_ttl'), 'coalesce': getattr(policy, f'{prefix}_coalesce')}
+        for prefix in DEFAULT_POLICY
+    }
+
+
+def load_policy(appid):
+    """从数据库读取 appid 的策略（没有时用默认策略记录，再没有时用配置）"""
+    from .models import OdreaCachePolicy
+
+    policies = {p.appid: p for p in OdreaCachePolicy.objects.filter(appid__in={appid or '', ''}, is_active=True)}
+    policy = policies.get(appid or '') or policies.get('')
+    if policy is None:
+        return DEFAULT_POLICY
+    return _policy_from_model(policy)
+
+
+def get_policy(appid):
+    appid = appid or ''
+    policy = _policies.get(appid)
+    if policy is None:
+        try:
+            policy = load_policy(appid)
+        except Exception:
+            logger.exception('读取接口缓存策略失败，使用默认策略')
+            return DEFAULT_POLICY
+        _policies.set(appid, policy)
+    return policy
+
+
+def invalidate_policies(*args, **kwargs):
+    """策略修改后清空进程内的策略缓存（post_save / post_delete 信号）"""
+    _policies.clear()
+
+
+# ==================== 调用 ====================
+
+def call(endpoint, wxid, appid, loader, bypass=False, extra='', scope=''):
+    """按策略调用 loader，返回 (结果, cache_status)
+
+    extra 为影响结果的其他参数（如 get_openid 的 to_wxid），一并作为缓存键。
+    scope 区分调用方（接口入口、按用户校验权限的入口再加上用户），不同 scope 之间
+    既不共享缓存也不合并请求，避免把一个用户的结果返回给另一个用户。
+    """
+    if not CACHE_ENABLED or endpoint not in ENDPOINTS:
+        return loader(), ''
+
+    rule = get_policy(appid)[ENDPOINTS[endpoint]]
+    if not rule['ttl'] and not rule['coalesce'] and not bypass:
+        return loader(), ''
+    return caches[endpoint].fetch((wxid, appid or '', extra, scope), loader, bypass=bypass,
+                                  ttl=rule['ttl'], coalesce=rule['coalesce'])
+
+
+def invalidate(wxid, appid, endpoint=None):
+    """清除某个 (wxid, appid) 的缓存（如账号重新登录后）"""
+    appid = appid or ''
+    for name in ([endpoint] if endpoint else ENDPOINTS):
+        caches[name].invalidate_matching(lambda key: key[0] == wxid and key[1] == appid)
+
+
+def clear():
+    for cache in caches.values():
+        cache.clear()
+
+
+def stats():
+    data = {endpoint: cache.stats() for endpoint, cache in caches.items()}
+    data['enabled'] = CACHE_ENABLED
+    return data
@@ -0,0 +1,134 @@
+"""
+odrea_system 接口入口（请求合并与缓存，见 protocol_api.odrea_cache）
+
+在 runtime_urls 中替换两个入口，get_code / get_openid / get_mobile 按 appid 的策略
+合并并发请求、缓存成功的响应：
+
+- api/protocol/odrea_system/      原接口 protocol_api.views.odrea_system（服务密码）
+- api/v1/protocol/odrea-system/   原接口 api.views.odrea_system（DRF 认证）
+
+只有通过了原接口同样的校验（服务密码 / 已登录）才会使用缓存；其他 action、格式错误
+或校验不通过的请求原样交给原接口处理，响应格式不变。缓存按入口分开，DRF 入口再按用户
+分开（原接口按用户限制可查询的账号），命中的只会是同一入口、同一用户之前的响应。
+
+未命中时由原接口请求协议服务并记录 APIRequest（经 protocol_api.audit 的后台写入器）；
+命中缓存或共享了其他请求的结果时原接口不会执行，这里记录（cache_status 为 hit / coalesced）。
+"""
+import json
+import secrets
+
+from django.http import JsonResponse
+from django.utils.module_loading import import_string
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from . import odrea_cache
+from .audit import log_api_request
+
+PROTOCOL_VIEW = 'protocol_api.views.odrea_system'
+API_VIEW = 'api.views.odrea_system'
+
+# 不参与缓存键的请求字段
+_KEY_EXCLUDED = ('action', 'password', 'wxid', 'appid')
+
+
+def _password_scope(request, data):
+    """与原接口相同的服务密码校验（未设置密码时不校验），通过时返回缓存范围，否则返回 None"""
+    from protocol_config.models import ProtocolConfig
+
+    expected = ProtocolConfig.get_config().service_password
+    if expected and not secrets.compare_digest(str(data.get('password') or ''), expected):
+        return None
+    return 'protocol'
+
+
+def _api_user_scope(request, data):
+    """按 DRF 的认证方式（Token / Session）确认已登录，返回按用户区分的缓存范围"""
+    from rest_framework.exceptions import APIException
+    from rest_framework.request import Request
+    from rest_framework.settings import api_settings
+
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        user = drf_request.user
+    except APIException:
+        return None
+    if user is None or not user.is_authenticated:
+        return None
+    return f'api:{user.pk}'
+
+
+def _param(data, name):
+    value = data.get(name)
+    if value in (None, '') and isinstance(data.get('params'), dict):
+        value = data['params'].get(name)
+    return '' if value is None else str(value)
+
+
+def _cache_key_extra(data):
+    """除 wxid / appid 外影响结果的参数（to_wxid、data、opt 等）"""
+    rest = {key: value for key, value in data.items() if key not in _KEY_EXCLUDED}
+    return json.dumps(rest, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+def _success_payload(response):
+    """成功响应的 JSON（{"code": 200, ...}），其他返回 None：不缓存，等待者各自请求"""
+    if hasattr(response, 'render') and not getattr(response, 'is_rendered', True):
+        # DRF Response 需要先渲染
+        response.render()
+    try:
+        payload = json.loads(response.content)
+    except (AttributeError, ValueError):
+        return None
+    if response.status_code != 200 or not isinstance(payload, dict) or payload.get('code') != 200:
+        return None
+    return payload
+
+
+def _serve(request, base_view, get_scope):
+    def call_base():
+        # 原接口为编译模块，用到时再导入
+        return import_string(base_view)(request)
+
+    try:
+        data = json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        return call_base()
+    if not isinstance(data, dict) or data.get('action') not in odrea_cache.ENDPOINTS:
+        return call_base()
+    wxid = _param(data, 'wxid')
+    scope = get_scope(request, data) if wxid else None
+    if scope is None:
+        return call_base()
+
+    action = data['action']
+    appid = _param(data, 'appid')
+    responses = []
+
+    def load():
+        response = call_base()
+        responses.append(response)
+        return _success_payload(response)
+
+    payload, cache_status = odrea_cache.call(action, wxid, appid, load, extra=_cache_key_extra(data), scope=scope)
+    if responses:
+        # 本请求执行了原接口（未命中 / 不缓存），原接口已记录 APIRequest
+        return responses[0]
+
+    request_data = {key: value for key, value in data.items() if key != 'password'}
+    log_api_request(request, action, wxid=wxid, appid=appid, request_data=request_data,
+                    response_data=payload, success=True, cache_status=cache_status)
+    return JsonResponse(payload)
+
+
+@csrf_exempt
+@require_http_methods(['POST'])
+def odrea_system(request):
+    return _serve(request, PROTOCOL_VIEW, _password_scope)
+
+
+@csrf_exempt
+@require_http_methods(['POST'])
+def api_odrea_system(request):
+    # 已登录的判断包含 SessionAuthentication 的 CSRF 校验，未通过时交给原接口返回错误
+    return _serve(request, API_VIEW, _api_user_scope)
@@ -0,0 +1,90 @@
+"""
+文章阅读量查询缓存（GetAppMsgExt）
+
+同一篇文章经常在几秒内被多个 WXID 重复查询 read_num。这里按规范化的文章地址
+（__biz / mid / idx / sn）缓存查询结果几秒，并合并并发的相同查询：
+
+- 缓存有容量上限（LRU），只缓存成功取到的阅读量
+- 合并的请求失败或返回空时，等待者用自己的账号再查一次
+- bypass=True 跳过缓存（需要最新值时），结果写回缓存
+
+只用于展示类查询（handle_read_article 等）。阅读量检测（read_check.engine）需要
+每个账号真实请求一次，不经过这里。
+
+用法::
+
+    from protocol_api.read_count_cache import get_read_count
+
+    read_num = get_read_count(link, lambda: fetch_read_num(wxid, link))
+    fresh = get_read_count(link, lambda: fetch_read_num(wxid, link), bypass=True)
+
+配置（API_CONFIG）：
+- READ_COUNT_CACHE_ENABLED   是否启用，默认 True
+- READ_COUNT_CACHE_TTL       缓存时间（秒），默认 5
+- READ_COUNT_CACHE_SIZE      最多缓存的文章数，默认 2048
+"""
+import html
+from urllib.parse import parse_qs, urlsplit
+
+from config import API_CONFIG
+from utils.coalescing import CoalescingCache
+
+CACHE_ENABLED = API_CONFIG.get('READ_COUNT_CACHE_ENABLED', True)
+CACHE_TTL = API_CONFIG.get('READ_COUNT_CACHE_TTL', 5)
+CACHE_SIZE = API_CONFIG.get('READ_COUNT_CACHE_SIZE', 2048)
+
+# 文章地址中用于定位文章的参数，其余（chksm、scene、分享参数等）不影响阅读量
+_ARTICLE_PARAMS = (
+    ('biz', ('__biz',)),
+    ('mid', ('mid', 'appmsgid')),
+    ('idx', ('idx', 'itemidx')),
+    ('sn', ('sn', 'sign')),
+)
+
+read_count_cache = CoalescingCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL)
+
+
+def normalize_article_url(url):
+    """文章地址 -> 缓存键
+
+    mp.weixin.qq.com/s?__biz=..&mid=..&idx=..&sn=.. 取 biz/mid/idx/sn；
+    短链接 mp.weixin.qq.com/s/<id> 取 id；其他地址去掉片段后原样使用。
+    """
+    url = html.unescape((url or '').strip())
+    parts = urlsplit(url)
+    host = parts.netloc.lower()
+    path = parts.path.rstrip('/')
+
+    if host.endswith('mp.weixin.qq.com'):
+        query = parse_qs(parts.query)
+        values = {}
+        for name, aliases in _ARTICLE_PARAMS:
+            for alias in aliases:
+                if query.get(alias):
+                    values[name] = query[alias][0].strip()
+                    break
+        if values.get('biz') and values.get('mid'):
+            return 'article:{biz}:{mid}:{idx}:{sn}'.format(
+                biz=values['biz'], mid=values['mid'], idx=values.get('idx', '1'), sn=values.get('sn', ''))
+        if path.startswith('/s/'):
+            return f'short:{path[3:]}'
+
+    query = f'?{parts.query}' if parts.query else ''
+    return f'url:{host}{path}{query}'
+
+
+def get_read_count(url, loader, bypass=False):
+    """获取文章阅读量，loader 为实际查询函数（返回 read_num，失败抛出异常）"""
+    if not CACHE_ENABLED:
+        return loader()
+    return read_count_cache.get_or_load(normalize_article_url(url), loader, bypass=bypass)
+
+
+def invalidate(url):
+    read_count_cache.invalidate(normalize_article_url(url))
+
+
+def stats():
+    data = read_count_cache.stats()
+    data['enabled'] = CACHE_ENABLED
+    return data
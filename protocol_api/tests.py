@@ -0,0 +1,136 @@
+import json
+import sys
+import types
+from unittest import mock
+
+from django.http import JsonResponse
+from django.test import RequestFactory, TestCase
+from rest_framework.authtoken.models import Token
+
+from accounts.models import User
+from protocol_config.models import DailyStat, ProtocolConfig
+
+from . import audit, odrea_cache, odrea_views
+from .models import APIRequest
+
+
+class OdreaCacheScopeTests(TestCase):
+    """api/protocol/odrea_system/ 与 api/v1/protocol/odrea-system/ 的缓存按入口、用户隔离"""
+
+    def setUp(self):
+        odrea_cache.clear()
+        self.addCleanup(odrea_cache.clear)
+        config = ProtocolConfig.get_config()
+        config.service_password = 'pw'
+        config.save()
+        self.factory = RequestFactory()
+        self.calls = []
+        patcher = mock.patch.object(odrea_views, 'import_string', return_value=self._base_view)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.audit = mock.patch.object(odrea_views, 'log_api_request').start()
+        self.addCleanup(mock.patch.stopall)
+
+    def _base_view(self, request):
+        data = json.loads(request.body)
+        user = getattr(request, 'auth_user', None)
+        self.calls.append(user)
+        return JsonResponse({'code': 200, 'msg': 'ok', 'data': {'openid': f'o-{user}-{data["to_wxid"]}'}})
+
+    def _post(self, view, user=None, **data):
+        body = dict({'action': 'get_openid', 'wxid': 'w', 'appid': 'a', 'to_wxid': 't'}, **data)
+        headers = {}
+        if user is not None:
+            headers['HTTP_AUTHORIZATION'] = f'Token {Token.objects.get_or_create(user=user)[0].key}'
+        request = self.factory.post('/', json.dumps(body), content_type='application/json', **headers)
+        request.auth_user = user.username if user else None
+        return json.loads(view(request).content)
+
+    def test_protocol_route_serves_repeat_from_cache(self):
+        first = self._post(odrea_views.odrea_system, password='pw')
+        second = self._post(odrea_views.odrea_system, password='pw')
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.audit.call_args.kwargs['cache_status'], 'hit')
+
+    def test_api_route_does_not_share_between_users(self):
+        alice = User.objects.create_user('alice', password='x')
+        bob = User.objects.create_user('bob', password='x')
+        self._post(odrea_views.api_odrea_system, user=alice)
+        self._post(odrea_views.api_odrea_system, user=alice)
+        result = self._post(odrea_views.api_odrea_system, user=bob)
+        self.assertEqual(self.calls, ['alice', 'bob'])
+        self.assertEqual(result['data']['openid'], 'o-bob-t')
+
+    def test_routes_do_not_share(self):
+        alice = User.objects.create_user('alice', password='x')
+        self._post(odrea_views.odrea_system, password='pw')
+        self._post(odrea_views.api_odrea_system, user=alice)
+        self.assertEqual(self.calls, [None, 'alice'])
+
+    def test_unauthenticated_requests_go_to_original_view(self):
+        self._post(odrea_views.odrea_system, password='wrong')
+        self._post(odrea_views.odrea_system, password='wrong')
+        self._post(odrea_views.api_odrea_system)
+        self.assertEqual(len(self.calls), 3)
+        self.assertEqual(odrea_cache.stats()['get_openid']['size'], 0)
+
+
+class AuditWriterTests(TestCase):
+    """审计日志在当前线程 flush（不启动写入线程，测试事务内可见）"""
+
+    def setUp(self):
+        patcher = mock.patch.object(audit.AuditLogWriter, '_ensure_started')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.request = RequestFactory().post('/', REMOTE_ADDR='10.0.0.1', HTTP_USER_AGENT='ua')
+
+    def _record(self, success=True):
+        return audit.build_api_request(self.request, 'get_code', wxid='w', success=success)
+
+    def test_batches_are_written_with_daily_stats(self):
+        writer = audit.AuditLogWriter(batch_size=2)
+        for success in (True, True, False):
+            self.assertTrue(writer.submit(self._record(success)))
+        self.assertFalse(APIRequest.objects.exists())
+
+        writer.flush()
+        self.assertEqual(APIRequest.objects.count(), 3)
+        self.assertEqual(APIRequest.objects.filter(ip_address='10.0.0.1').count(), 3)
+        stat = DailyStat.objects.get(source='api_request')
+        self.assertEqual((stat.total, stat.success, stat.failed), (3, 2, 1))
+        self.assertEqual(writer.stats()['flushes'], 2)
+
+    def test_sampling_keeps_failures(self):
+        writer = audit.AuditLogWriter(success_sample_rate=0)
+        self.assertFalse(writer.submit(self._record(True)))
+        self.assertTrue(writer.submit(self._record(False)))
+        writer.flush()
+        self.assertEqual(list(APIRequest.objects.values_list('success', flat=True)), [False])
+        self.assertEqual(writer.stats()['sampled_out'], 1)
+
+    def test_overflow_policies(self):
+        newest = audit.AuditLogWriter(queue_size=1, overflow_policy='drop_newest')
+        first, second = self._record(), self._record()
+        self.assertTrue(newest.submit(first))
+        self.assertFalse(newest.submit(second))
+        self.assertIs(newest._queue.get_nowait(), first)
+
+        oldest = audit.AuditLogWriter(queue_size=1, overflow_policy='drop_oldest')
+        oldest.submit(first)
+        self.assertTrue(oldest.submit(second))
+        self.assertIs(oldest._queue.get_nowait(), second)
+        self.assertEqual(oldest.stats()['dropped'], 1)
+
+    def test_compiled_views_log_through_writer(self):
+        views = types.ModuleType(audit.COMPILED_VIEWS)
+        views.log_api_request = mock.Mock(name='APIRequest.objects.create')
+        with mock.patch.dict(sys.modules, {audit.COMPILED_VIEWS: views}), \
+                mock.patch.object(audit, 'audit_writer') as writer:
+            self.assertTrue(audit.route_compiled_views())
+            # 原接口的调用方式：位置参数 request, request_type, wxid, appid, request_data, response_data, success
+            views.log_api_request(self.request, 'get_openid', 'w', 'a', {'x': 1}, {'code': 200}, True)
+
+        record = writer.submit.call_args.args[0]
+        self.assertEqual((record.request_type, record.wxid, record.appid), ('get_openid', 'w', 'a'))
+        self.assertFalse(APIRequest.objects.exists())
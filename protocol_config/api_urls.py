@@ -0,0 +1,40 @@
+"""
+新增接口路由（挂载在 dashboard/protocol-config/ 下）
+"""
+from django.urls import path
+
+from protocol_api import cache_views
+
+from . import job_views, queue_views, stats_views
+
+urlpatterns = [
+    path('api/jobs/', job_views.job_list, name='job_list'),
+    path('api/jobs/<str:name>/runs/', job_views.job_runs, name='job_runs'),
+    path('api/jobs/<str:name>/pause/', job_views.job_pause, name='job_pause'),
+    path('api/jobs/<str:name>/resume/', job_views.job_resume, name='job_resume'),
+    path('api/jobs/<str:name>/trigger/', job_views.job_trigger, name='job_trigger'),
+
+    # 后台任务队列
+    path('api/queue/jobs/', queue_views.queue_job_list, name='queue_job_list'),
+    path('api/queue/jobs/<int:job_id>/', queue_views.queue_job_detail, name='queue_job_detail'),
+    path('api/queue/jobs/<int:job_id>/cancel/', queue_views.queue_job_cancel, name='queue_job_cancel'),
+    path('api/queue/stats/', queue_views.queue_stats, name='queue_stats'),
+    path('api/queue/refresh-all/', queue_views.queue_refresh_all, name='queue_refresh_all'),
+    path('api/queue/refresh-auth-codes/', queue_views.queue_refresh_auth_codes, name='queue_refresh_auth_codes'),
+
+    # 手动刷新（替换原接口，使用并发刷新引擎）
+    path('api/refresh/manual/', queue_views.manual_refresh, name='api_manual_refresh'),
+
+    # 每日统计
+    path('api/stats/today/', stats_views.stats_today, name='stats_today'),
+    path('api/stats/daily/', stats_views.stats_daily, name='stats_daily'),
+    path('api/stats/dashboard/', stats_views.stats_dashboard, name='stats_dashboard'),
+    path('api/stats/caches/', stats_views.stats_caches, name='stats_caches'),
+
+    # odrea_system 接口缓存策略
+    path('api/odrea-cache/policies/', cache_views.policy_list, name='odrea_cache_policies'),
+    path('api/odrea-cache/policies/<int:policy_id>/delete/', cache_views.policy_delete,
+         name='odrea_cache_policy_delete'),
+    path('api/odrea-cache/clear/', cache_views.cache_clear, name='odrea_cache_clear'),
+    path('api/odrea-cache/report/', cache_views.cache_report, name='odrea_cache_report'),
+]
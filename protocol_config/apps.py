@@ -1,6 +1,29 @@
+import os
+import sys
+
 from django.apps import AppConfig
 
 
+# 服务器入口（asgi.py、start.py）在 django.setup() 之前设置为 1
+SERVER_PROCESS_ENV = 'PROTOCOL_SERVER_PROCESS'
+
+
+def _is_server_process():
+    """只有服务器进程启动后台任务
+
+    asgi.py（daphne）和 start.py 通过 PROTOCOL_SERVER_PROCESS 标记，另外允许 manage.py runserver。
+    其他入口（manage.py 的一次性命令、python -c、测试、start.py 生成的临时脚本）都不启动；
+    manage.py scheduler run / job_worker 自己启动对应的循环。
+    """
+    # 读取后清除，服务器进程启动的子进程不会继承
+    if os.environ.pop(SERVER_PROCESS_ENV, '') == '1':
+        return True
+    if os.path.basename(sys.argv[0]) != 'manage.py' or len(sys.argv) < 2 or sys.argv[1] != 'runserver':
+        return False
+    # runserver 自动重载时只在子进程中启动
+    return '--noreload' in sys.argv or os.environ.get('RUN_MAIN') == 'true'
+
+
 class ProtocolConfigConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'protocol_config'
@@ -8,25 +31,36 @@ class ProtocolConfigConfig(AppConfig):
     
     def ready(self):
         """应用启动时执行"""
-        # 启动自动任务
+        from django.db.models.signals import post_migrate
+
+        from . import dashboard, stats
+        stats.connect_signals()
+        dashboard.connect_signals()
+        # 升级后第一次 migrate 时用已有日志回填每日统计
+        post_migrate.connect(stats.backfill_after_migrate, sender=self,
+                             dispatch_uid='protocol_config_backfill_daily_stats')
+
+        if not _is_server_process():
+            return
+        # 多进程部署时只有一个 worker 运行后台任务（见 start.py --workers）
+        if os.environ.get('PROTOCOL_BACKGROUND_TASKS', '1') == '0':
+            return
+
+        # 启动定时任务调度器（多个进程同时启动时通过数据库租约选出一个执行任务）
         try:
-            from .models import ProtocolConfig
-            from .views import start_auto_refresh_task, start_auto_log_cleanup_task, start_auto_login_task
-            
-            config = ProtocolConfig.get_config()
-            
-            # 启动自动刷新任务
-            if config.auto_refresh_enabled:
-                start_auto_refresh_task()
-                print("  自动刷新任务已启动")
-            
-            # 启动自动登录任务
-            if config.auto_login_enabled:
-                start_auto_login_task()
-                print("  自动登录任务已启动")
-            
-            # 启动自动日志清理任务
-            start_auto_log_cleanup_task()
-            print("  自动日志清理任务已启动")
+            from .scheduler import start_scheduler
+
+            start_scheduler()
+            print("  定时任务调度器已启动")
         except Exception as e:
-            print(f"  启动自动任务失败: {str(e)}")
+            print(f"  启动定时任务调度器失败: {str(e)}")
+
+        # 进程内的后台任务 worker（单独运行 manage.py job_worker 时设置 PROTOCOL_JOB_WORKER=0）
+        if os.environ.get('PROTOCOL_JOB_WORKER', '1') != '0':
+            try:
+                from .job_queue import start_worker
+
+                start_worker()
+                print("  后台任务 worker 已启动")
+            except Exception as e:
+                print(f"  启动后台任务 worker 失败: {str(e)}")
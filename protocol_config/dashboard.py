@@ -0,0 +1,102 @@
+"""
+仪表盘统计（带缓存）
+
+get_dashboard_counts(user) 返回仪表盘用到的计数，结果按用户缓存（utils.stats_cache），
+Connection / AuthCode / ReadCheckConfig / ReadCheckSession 保存或删除时使对应用户的缓存失效。
+"""
+from datetime import datetime
+
+from django.db.models import Count, Q
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from utils.stats_cache import stats_cache
+
+from . import stats
+
+
+def _today_start():
+    return timezone.make_aware(datetime.combine(timezone.localdate(), datetime.min.time()))
+
+
+def compute_dashboard_counts(user_id=None):
+    """计算仪表盘计数，user_id 为 None 时统计全部用户"""
+    from connections.models import Connection, AuthCode
+    from read_check.models import ReadCheckConfig, ReadCheckSession
+
+    connections = Connection.objects.all()
+    auth_codes = AuthCode.objects.all()
+    configs = ReadCheckConfig.objects.all()
+    sessions = ReadCheckSession.objects.all()
+    if user_id is not None:
+        connections = connections.filter(user_id=user_id)
+        auth_codes = auth_codes.filter(connection__user_id=user_id)
+        configs = configs.filter(user_id=user_id)
+        sessions = sessions.filter(user_id=user_id)
+
+    connection_counts = connections.aggregate(
+        total=Count('id'), active=Count('id', filter=Q(is_active=True)))
+    auth_code_counts = auth_codes.aggregate(
+        total=Count('id'), online=Count('id', filter=Q(is_online=True)))
+    config_counts = configs.aggregate(
+        total=Count('id'), active=Count('id', filter=Q(is_active=True)))
+    today_sessions = sessions.filter(started_at__gte=_today_start()).aggregate(
+        total=Count('id'), running=Count('id', filter=Q(status='running')))
+
+    return {
+        'total_connections': connection_counts['total'],
+        'active_connections': connection_counts['active'],
+        'total_auth_codes': auth_code_counts['total'],
+        'online_count': auth_code_counts['online'],
+        'offline_count': auth_code_counts['total'] - auth_code_counts['online'],
+        'read_check_configs': config_counts['active'],
+        'total_read_check_configs': config_counts['total'],
+        'today_read_checks': today_sessions['total'],
+        'running_read_checks': today_sessions['running'],
+        'today_api_requests': stats.get_today_summary('api_request', user_id=user_id),
+        'updated_at': timezone.now().isoformat(),
+    }
+
+
+def get_dashboard_counts(user=None, all_users=False):
+    """带缓存的仪表盘计数（管理员 all_users=True 时统计全部用户）"""
+    user_id = None if all_users or user is None else user.id
+    return stats_cache.get_or_compute('dashboard', lambda: compute_dashboard_counts(user_id), user_id=user_id)
+
+
+# ==================== 缓存失效 ====================
+
+def _owner_id(instance):
+    """模型实例所属用户"""
+    if hasattr(instance, 'user_id'):
+        return instance.user_id
+    connection_id = getattr(instance, 'connection_id', None)
+    if connection_id is None:
+        return None
+    from connections.models import Connection
+    return Connection.objects.filter(pk=connection_id).values_list('user_id', flat=True).first()
+
+
+def invalidate_for_instance(sender, instance, **kwargs):
+    stats_cache.invalidate_user(_owner_id(instance))
+
+
+def invalidate_for_connections(connection_ids):
+    """批量更新授权码状态后（不触发信号）使相关用户缓存失效"""
+    from connections.models import Connection
+
+    user_ids = set(Connection.objects.filter(pk__in=connection_ids).values_list('user_id', flat=True))
+    for user_id in user_ids:
+        stats_cache.invalidate_user(user_id)
+    if not user_ids:
+        stats_cache.invalidate_all()
+
+
+def connect_signals():
+    from connections.models import Connection, AuthCode
+    from read_check.models import ReadCheckConfig, ReadCheckSession
+
+    for model in (Connection, AuthCode, ReadCheckConfig, ReadCheckSession):
+        uid = f'dashboard_cache_{model._meta.label_lower}'
+        post_save.connect(invalidate_for_instance, sender=model, dispatch_uid=f'{uid}_save')
+        post_delete.connect(invalidate_for_instance, sender=model, dispatch_uid=f'{uid}_delete')
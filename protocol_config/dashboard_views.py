@@ -0,0 +1,85 @@
+"""
+仪表盘页面和接口（读取 DailyStat 汇总表与缓存的仪表盘计数）
+
+在 runtime_urls 中替换原有的三个入口，响应格式不变：
+
+- dashboard/                 仪表盘页面（dashboard/index.html）
+- dashboard/chart-data/      阅读过检最近 7 天图表数据
+- api/v1/dashboard/stats/    仪表盘统计（DRF 接口，原 api.views.dashboard_stats）
+
+计数来自 protocol_config.dashboard.get_dashboard_counts（按用户缓存），
+每日检测次数来自 protocol_config.stats，不再扫描 ReadCheckLog。
+"""
+import json
+from datetime import date
+
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import render
+from django.views.decorators.http import require_GET
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+from . import stats
+from .dashboard import get_dashboard_counts
+
+CHART_DAYS = 7
+RECENT_LOGS = 10
+
+
+def _chart_series(user_id, days=CHART_DAYS):
+    """图表格式：[{date: 'MM-DD', total, success, failed, success_rate}]"""
+    return [{
+        'date': date.fromisoformat(row['date']).strftime('%m-%d'),
+        'total': row['total'],
+        'success': row['success'],
+        'failed': row['failed'],
+        'success_rate': row['success_rate'],
+    } for row in stats.get_daily_series('read_check', days, user_id=user_id)]
+
+
+@login_required
+def dashboard_page(request):
+    """仪表盘首页"""
+    from connections.models import Connection, ConnectionLog
+
+    counts = get_dashboard_counts(request.user)
+    today = stats.get_today_summary('read_check', user_id=request.user.id)
+    daily_stats = _chart_series(request.user.id)
+    recent_logs = ConnectionLog.objects.filter(connection__user=request.user) \
+        .select_related('connection').order_by('-created_at')[:RECENT_LOGS]
+
+    return render(request, 'dashboard/index.html', {
+        'connections': Connection.objects.filter(user=request.user),
+        'recent_logs': recent_logs,
+        'connections_count': counts['total_connections'],
+        'auth_codes_count': counts['total_auth_codes'],
+        'read_configs_count': counts['total_read_check_configs'],
+        'today_checks': today['total'],
+        'today_success': today['success'],
+        'today_failed': today['failed'],
+        'daily_stats': json.dumps(daily_stats),
+        'daily_stats_raw': daily_stats,
+    })
+
+
+@login_required
+@require_GET
+def chart_data(request):
+    """阅读过检最近 7 天每日统计"""
+    return JsonResponse({'code': 200, 'msg': 'success', 'data': _chart_series(request.user.id)})
+
+
+@api_view(['GET'])
+def api_dashboard_stats(request):
+    """仪表盘统计（当前用户）"""
+    counts = get_dashboard_counts(request.user)
+    return Response({
+        'total_connections': counts['total_connections'],
+        'active_connections': counts['active_connections'],
+        'total_auth_codes': counts['total_auth_codes'],
+        'online_auth_codes': counts['online_count'],
+        'total_read_configs': counts['total_read_check_configs'],
+        'active_read_configs': counts['read_check_configs'],
+        'today_read_checks': stats.get_today_summary('read_check', user_id=request.user.id)['total'],
+    })
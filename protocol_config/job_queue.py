@@ -0,0 +1,459 @@
+"""
+后台任务队列（数据库存储）
+
+阅读检测、批量刷新等耗时操作原来在 HTTP 请求线程或临时线程中执行，
+会占住 Daphne / runserver 的 worker 几十秒。现在接口只入队并返回任务 ID，
+由 worker 领取执行：
+
+- 任务持久化在 BackgroundJob 表，进程重启不丢失
+- 按任务类型限制并发（同一类型同时执行的任务数，跨所有 worker；统计与领取在
+  该类型的 JobTypeLock 行锁内进行）
+- 失败后按指数退避重试，超过 max_attempts 标记失败
+- 排队中的任务直接取消；执行中的任务设置取消标记，由任务在 ctx.set_progress /
+  ctx.check_cancelled 时结束（超过 timeout 同样在这里结束）
+- worker 定时写心跳，心跳超时（进程崩溃）的任务重新排队
+
+注册任务::
+
+    from protocol_config.job_queue import register_task
+
+    def refresh_all(ctx):
+        ctx.set_progress(10, '开始刷新')
+        ...
+        return {'success': 10}
+
+    register_task('refresh_all', refresh_all, concurrency=1, max_attempts=2)
+
+入队::
+
+    from protocol_config.job_queue import enqueue
+
+    job = enqueue('refresh_all', user=request.user)
+
+运行 worker：python manage.py job_worker --concurrency 4
+（服务进程默认也运行一个 worker，PROTOCOL_JOB_WORKER=0 关闭）
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from config import PROTOCOL_CONFIG
+from utils.db_retry import retry_on_locked
+
+logger = logging.getLogger(__name__)
+
+# 单个 worker 同时执行的任务数
+DEFAULT_CONCURRENCY = PROTOCOL_CONFIG.get('JOB_WORKER_CONCURRENCY', 4)
+# 没有任务时的轮询间隔（秒）
+POLL_INTERVAL = PROTOCOL_CONFIG.get('JOB_POLL_INTERVAL', 1.0)
+HEARTBEAT_INTERVAL = 10
+# 心跳超过该时间未更新的执行中任务视为 worker 已退出（秒）
+STALE_AFTER = 60
+
+FINISHED_STATUSES = ('succeeded', 'failed', 'cancelled')
+
+
+class JobCancelled(Exception):
+    """任务被取消"""
+
+
+class JobTimeout(Exception):
+    """任务执行超时"""
+
+
+class TaskDefinition:
+    """已注册的任务类型"""
+
+    def __init__(self, name, func, concurrency=1, max_attempts=1, retry_delay=30, timeout=600, description='',
+                 on_cancel=None):
+        self.name = name
+        self.func = func
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self.description = description
+        # 任务被取消（排队中或执行中）后调用 on_cancel(job)，用于清理关联数据
+        self.on_cancel = on_cancel
+
+    def get_retry_delay(self, attempts):
+        """第 N 次失败后的重试延迟（指数退避）"""
+        return self.retry_delay * (2 ** max(attempts - 1, 0))
+
+
+_registry = {}
+
+
+def register_task(name, func, concurrency=1, max_attempts=1, retry_delay=30, timeout=600, description='',
+                  on_cancel=None):
+    """注册任务类型"""
+    _registry[name] = TaskDefinition(name, func, concurrency, max_attempts, retry_delay, timeout, description,
+                                     on_cancel)
+    return _registry[name]
+
+
+def get_registered_tasks():
+    _ensure_default_tasks()
+    return dict(_registry)
+
+
+def _ensure_default_tasks():
+    from . import tasks
+    tasks.register_default_tasks()
+
+
+# ==================== 入队 / 查询 / 取消 ====================
+
+def enqueue(job_type, payload=None, user=None, max_attempts=None, delay=0):
+    """提交任务，返回 BackgroundJob"""
+    from .models import BackgroundJob
+
+    definition = get_registered_tasks().get(job_type)
+    if definition is None:
+        raise ValueError(f'未注册的任务类型: {job_type}')
+    return BackgroundJob.objects.create(
+        job_type=job_type,
+        payload=payload or {},
+        user=user if user is not None and user.is_authenticated else None,
+        max_attempts=max_attempts or definition.max_attempts,
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def cancel(job_id):
+    """取消任务：排队中的直接取消，执行中的设置取消标记，返回是否成功"""
+    from .models import BackgroundJob
+
+    now = timezone.now()
+    if BackgroundJob.objects.filter(pk=job_id, status='queued').update(
+            status='cancelled', cancel_requested=True, finished_at=now):
+        _call_on_cancel(BackgroundJob.objects.get(pk=job_id))
+        return True
+    return BackgroundJob.objects.filter(pk=job_id, status='running').update(cancel_requested=True) > 0
+
+
+def _call_on_cancel(job):
+    definition = get_registered_tasks().get(job.job_type)
+    if definition is None or definition.on_cancel is None:
+        return
+    try:
+        definition.on_cancel(job)
+    except Exception:
+        logger.exception('任务取消回调失败: %s#%s', job.job_type, job.pk)
+
+
+def serialize_job(job):
+    return {
+        'id': job.id,
+        'job_type': job.job_type,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'progress': job.progress,
+        'progress_message': job.progress_message,
+        'result': job.result,
+        'error': job.error,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'cancel_requested': job.cancel_requested,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+        'duration': job.duration,
+    }
+
+
+def queue_stats():
+    """各任务类型按状态统计"""
+    from .models import BackgroundJob
+
+    stats = {}
+    rows = BackgroundJob.objects.exclude(status__in=FINISHED_STATUSES).order_by() \
+        .values('job_type', 'status').annotate(count=Count('id'))
+    for row in rows:
+        stats.setdefault(row['job_type'], {})[row['status']] = row['count']
+    return stats
+
+
+# ==================== 执行 ====================
+
+class JobContext:
+    """传给任务函数的上下文"""
+
+    def __init__(self, job, definition):
+        self.job = job
+        self.payload = job.payload or {}
+        self.definition = definition
+        self._started = time.monotonic()
+
+    @property
+    def user_id(self):
+        return self.job.user_id
+
+    def check_cancelled(self):
+        """被取消或超时时抛出异常结束任务"""
+        from .models import BackgroundJob
+
+        if self.definition.timeout and time.monotonic() - self._started > self.definition.timeout:
+            raise JobTimeout(f'执行超过 {self.definition.timeout} 秒')
+        if BackgroundJob.objects.filter(pk=self.job.pk, cancel_requested=True).exists():
+            raise JobCancelled('任务已取消')
+
+    def set_progress(self, progress, message=''):
+        """更新进度（0~100），同时检查取消"""
+        from .models import BackgroundJob
+
+        BackgroundJob.objects.filter(pk=self.job.pk).update(
+            progress=max(0, min(int(progress), 100)),
+            progress_message=str(message)[:200],
+            heartbeat_at=timezone.now(),
+        )
+        self.check_cancelled()
+
+
+class Worker:
+    """任务 worker：领取并执行任务（每个进程可以有一个或多个）"""
+
+    def __init__(self, concurrency=None, job_types=None, poll_interval=None):
+        self.concurrency = concurrency or DEFAULT_CONCURRENCY
+        self.job_types = set(job_types) if job_types else None
+        self.poll_interval = poll_interval or POLL_INTERVAL
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stop_event = threading.Event()
+        self._wakeup = threading.Event()
+        self._executor = None
+        self._running = set()
+        self._running_lock = threading.Lock()
+        self._threads = []
+        self._last_heartbeat = 0
+
+    # ---- 领取 ----
+
+    def get_job_types(self):
+        types = set(get_registered_tasks())
+        if self.job_types is not None:
+            types &= self.job_types
+        return types
+
+    def _due_types(self, types, now):
+        """有到期排队任务的类型，最早到期的在前（不加锁，只用于决定尝试顺序）"""
+        from .models import BackgroundJob
+
+        rows = BackgroundJob.objects.filter(status='queued', job_type__in=types, run_after__lte=now) \
+            .order_by().values('job_type').annotate(first=Min('run_after')).order_by('first')
+        return [row['job_type'] for row in rows]
+
+    def claim(self):
+        """领取一个可执行的任务（遵守任务类型并发上限），没有时返回 None"""
+        types = self.get_job_types()
+        if not types:
+            return None
+        now = timezone.now()
+        for job_type in self._due_types(types, now):
+            job = self._claim_type(job_type, now)
+            if job is not None:
+                return job
+        return None
+
+    @retry_on_locked()
+    def _claim_type(self, job_type, now):
+        """在该类型的锁内统计执行数并领取一个任务
+
+        先锁住 JobTypeLock 行，同一类型的领取在所有 worker 之间串行：锁内的统计能看到
+        之前已提交的领取，不会有两个 worker 同时看到“还有空位”。SQLite 调优后端的事务以
+        BEGIN IMMEDIATE 开始，本身就是串行的。
+        """
+        from .models import BackgroundJob, JobTypeLock
+
+        limit = _registry[job_type].concurrency
+        with transaction.atomic():
+            # 锁必须是事务中的第一个查询（MySQL 可重复读的快照从之后的普通读开始）
+            if not JobTypeLock.objects.select_for_update().filter(pk=job_type).exists():
+                # 第一次领取该类型：创建锁行后再锁住（并发创建由 get_or_create 处理）
+                JobTypeLock.objects.get_or_create(pk=job_type)
+                JobTypeLock.objects.select_for_update().filter(pk=job_type).exists()
+            running = BackgroundJob.objects.filter(status='running', job_type=job_type).count()
+            if running >= limit:
+                return None
+            candidates = BackgroundJob.objects.filter(
+                status='queued', job_type=job_type, run_after__lte=now,
+            ).order_by('run_after', 'id')
+            if connection.features.has_select_for_update_skip_locked:
+                candidates = candidates.select_for_update(skip_locked=True)
+            for job in candidates[:20]:
+                claimed = BackgroundJob.objects.filter(pk=job.pk, status='queued').update(
+                    status='running', worker=self.worker_id, started_at=now, heartbeat_at=now,
+                    attempts=F('attempts') + 1, progress=0, progress_message='', error='',
+                )
+                if claimed:
+                    return BackgroundJob.objects.get(pk=job.pk)
+        return None
+
+    # ---- 执行 ----
+
+    def _finish(self, job, **fields):
+        """写入结果（任务已被其他 worker 重新领取时不覆盖）"""
+        from .models import BackgroundJob
+
+        return BackgroundJob.objects.filter(pk=job.pk, worker=self.worker_id, status='running').update(**fields)
+
+    def execute(self, job):
+        definition = _registry.get(job.job_type)
+        now = timezone.now
+        try:
+            if definition is None:
+                self._finish(job, status='failed', error=f'未注册的任务类型: {job.job_type}', finished_at=now())
+                return
+            ctx = JobContext(job, definition)
+            try:
+                ctx.check_cancelled()
+                result = definition.func(ctx)
+            except JobCancelled as e:
+                if self._finish(job, status='cancelled', error=str(e), finished_at=now()):
+                    _call_on_cancel(job)
+                return
+            except JobTimeout as e:
+                self._finish(job, status='failed', error=str(e), finished_at=now())
+                return
+            except Exception as e:
+                logger.exception('后台任务执行失败: %s#%s', job.job_type, job.pk)
+                error = f'{e.__class__.__name__}: {e}'[:2000]
+                if job.attempts < job.max_attempts:
+                    delay = definition.get_retry_delay(job.attempts)
+                    self._finish(job, status='queued', error=error, worker='',
+                                 run_after=now() + timedelta(seconds=delay),
+                                 progress_message=f'第 {job.attempts} 次执行失败，{delay} 秒后重试')
+                else:
+                    self._finish(job, status='failed', error=error, finished_at=now())
+                return
+            if result is not None and not isinstance(result, dict):
+                result = {'value': result}
+            self._finish(job, status='succeeded', result=result, progress=100, finished_at=now())
+        finally:
+            with self._running_lock:
+                self._running.discard(job.pk)
+            close_old_connections()
+            self._wakeup.set()
+
+    # ---- 维护 ----
+
+    def heartbeat(self):
+        from .models import BackgroundJob
+
+        with self._running_lock:
+            running = list(self._running)
+        if running:
+            BackgroundJob.objects.filter(pk__in=running, worker=self.worker_id, status='running') \
+                .update(heartbeat_at=timezone.now())
+
+    def recover_stale(self):
+        """心跳超时的任务：还有重试次数的重新排队，否则标记失败"""
+        from .models import BackgroundJob
+
+        cutoff = timezone.now() - timedelta(seconds=STALE_AFTER)
+        stale = BackgroundJob.objects.filter(status='running', heartbeat_at__lt=cutoff)
+        now = timezone.now()
+        requeued = stale.filter(attempts__lt=F('max_attempts')).update(
+            status='queued', worker='', run_after=now, progress_message='执行进程失去响应，重新排队')
+        failed = stale.update(status='failed', error='执行进程失去响应', finished_at=now)
+        if requeued or failed:
+            logger.warning('回收失去响应的后台任务: 重新排队 %d，失败 %d', requeued, failed)
+        return requeued, failed
+
+    # ---- 循环 ----
+
+    def run_once(self):
+        """领取任务直到没有空闲槽位或没有任务，返回本轮领取数"""
+        claimed = 0
+        while True:
+            with self._running_lock:
+                if len(self._running) >= self.concurrency:
+                    break
+            job = self.claim()
+            if job is None:
+                break
+            with self._running_lock:
+                self._running.add(job.pk)
+            self._executor.submit(self.execute, job)
+            claimed += 1
+        return claimed
+
+    def _maintain(self):
+        if time.monotonic() - self._last_heartbeat < HEARTBEAT_INTERVAL:
+            return
+        self._last_heartbeat = time.monotonic()
+        self.heartbeat()
+        self.recover_stale()
+
+    def run_forever(self):
+        """前台运行直到 stop()"""
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='job')
+        logger.info('后台任务 worker 已启动: %s（并发 %d）', self.worker_id, self.concurrency)
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    close_old_connections()
+                    self._maintain()
+                    self.run_once()
+                except Exception:
+                    # 数据库尚未迁移等情况，下一轮重试
+                    logger.exception('后台任务循环异常')
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+        finally:
+            self._executor.shutdown(wait=True)
+            close_old_connections()
+
+    def drain(self):
+        """执行当前可领取的任务直到队列为空，返回执行数"""
+        total = 0
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='job')
+        try:
+            while True:
+                # 执行时间较长的任务同样需要心跳，否则会被其他 worker 当作失去响应回收
+                self._maintain()
+                claimed = self.run_once()
+                total += claimed
+                with self._running_lock:
+                    idle = not self._running
+                if not claimed and idle:
+                    break
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+        finally:
+            self._executor.shutdown(wait=True)
+        return total
+
+    def start(self):
+        thread = threading.Thread(target=self.run_forever, name='job-worker', daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        return thread
+
+    def stop(self, timeout=10):
+        self._stop_event.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def start_worker(concurrency=None):
+    """在当前进程启动 worker（服务进程内使用）"""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = Worker(concurrency=concurrency)
+            _worker.start()
+        return _worker
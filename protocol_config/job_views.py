@@ -0,0 +1,66 @@
+"""
+定时任务管理接口
+"""
+from functools import wraps
+
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET, require_POST
+
+from . import scheduler
+
+
+def admin_required(view_func):
+    """仅管理员可访问"""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not getattr(request.user, 'is_admin', False):
+            return JsonResponse({'code': 403, 'msg': '权限不足'}, status=403)
+        return view_func(request, *args, **kwargs)
+    return login_required(wrapper)
+
+
+def _not_found(name):
+    return JsonResponse({'code': 404, 'msg': f'任务不存在: {name}'}, status=404)
+
+
+@admin_required
+@require_GET
+def job_list(request):
+    """任务列表"""
+    return JsonResponse({'code': 200, 'msg': 'success', 'data': scheduler.list_jobs()})
+
+
+@admin_required
+@require_GET
+def job_runs(request, name):
+    """任务执行记录"""
+    try:
+        limit = min(int(request.GET.get('limit', 20)), 200)
+    except ValueError:
+        limit = 20
+    return JsonResponse({'code': 200, 'msg': 'success', 'data': scheduler.get_job_runs(name, limit)})
+
+
+@admin_required
+@require_POST
+def job_pause(request, name):
+    if not scheduler.pause_job(name):
+        return _not_found(name)
+    return JsonResponse({'code': 200, 'msg': '任务已暂停'})
+
+
+@admin_required
+@require_POST
+def job_resume(request, name):
+    if not scheduler.resume_job(name):
+        return _not_found(name)
+    return JsonResponse({'code': 200, 'msg': '任务已恢复'})
+
+
+@admin_required
+@require_POST
+def job_trigger(request, name):
+    if not scheduler.trigger_job(name):
+        return _not_found(name)
+    return JsonResponse({'code': 200, 'msg': '已请求立即执行'})
@@ -0,0 +1,107 @@
+"""
+内置定时任务
+
+- auto_refresh   自动刷新连接状态（间隔取 ProtocolConfig.refresh_interval）
+- log_cleanup    每天删除超过 log_retention_days 的日志
+- chat_archive   每天把超过 CHAT_ARCHIVE_DAYS 的聊天消息压缩归档（见 connections.archive）
+
+自动登录仍使用 views 中原有的后台线程，调度器成为主节点时启动（每个进程只启动一次），
+失去租约时停止，保证多进程部署时只有一个进程执行。
+"""
+import logging
+import threading
+
+from .scheduler import register_job, JobSkipped
+
+logger = logging.getLogger(__name__)
+
+_auto_login_lock = threading.Lock()
+_auto_login_started = False
+
+
+def _refresh_interval():
+    from .models import ProtocolConfig
+    return ProtocolConfig.get_config().refresh_interval * 60
+
+
+def auto_refresh_job():
+    """自动刷新连接状态"""
+    from .models import ProtocolConfig
+    from .refresh_engine import RefreshInProgress, run_refresh_pass
+
+    if not ProtocolConfig.get_config().auto_refresh_enabled:
+        raise JobSkipped('自动刷新未启用')
+    try:
+        log = run_refresh_pass('auto')
+    except RefreshInProgress:
+        raise JobSkipped('已有刷新在执行')
+    return f'刷新 {log.connection_count} 个，成功 {log.success_count}，失败 {log.failed_count}'
+
+
+def log_cleanup_job():
+    """删除过期日志（按主键范围分批删除，见 retention）"""
+    from .models import ProtocolConfig
+    from .retention import purge_expired_logs
+
+    days = ProtocolConfig.get_config().log_retention_days
+    results = [r for r in purge_expired_logs(days) if r['deleted']]
+    if not results:
+        return f'保留 {days} 天，没有过期日志'
+    return f'保留 {days} 天，删除 ' + '，'.join(f"{r['table']}: {r['deleted']}" for r in results)
+
+
+def chat_archive_job():
+    """归档旧聊天消息"""
+    from connections.archive import ARCHIVE_DAYS, archive_messages
+
+    if ARCHIVE_DAYS <= 0:
+        raise JobSkipped('聊天消息归档未启用')
+    result = archive_messages(ARCHIVE_DAYS)
+    if not result['archived']:
+        return f'保留 {ARCHIVE_DAYS} 天，没有需要归档的消息'
+    return f"保留 {ARCHIVE_DAYS} 天，归档 {result['archived']} 条（{result['segments']} 段）"
+
+
+def register_default_jobs():
+    register_job('auto_refresh', auto_refresh_job, _refresh_interval,
+                 description='自动刷新微信连接状态', jitter=30, misfire_grace=300)
+    register_job('log_cleanup', log_cleanup_job, 24 * 3600,
+                 description='清理过期日志', jitter=600, misfire_grace=3600)
+    register_job('chat_archive', chat_archive_job, 24 * 3600,
+                 description='归档旧聊天消息', jitter=600, misfire_grace=3600)
+
+
+def start_leader_only_tasks():
+    """成为主节点时启动的旧版后台任务（已启动时跳过）"""
+    global _auto_login_started
+
+    with _auto_login_lock:
+        if _auto_login_started:
+            return
+        try:
+            from .models import ProtocolConfig
+            from .views import start_auto_login_task
+
+            if ProtocolConfig.get_config().auto_login_enabled:
+                start_auto_login_task()
+                _auto_login_started = True
+                logger.info('自动登录任务已启动')
+        except Exception as e:
+            logger.warning('启动自动登录任务失败: %s', e)
+
+
+def stop_leader_only_tasks():
+    """失去主节点租约时停止自动登录任务，重新成为主节点时再启动"""
+    global _auto_login_started
+
+    with _auto_login_lock:
+        if not _auto_login_started:
+            return
+        try:
+            from .views import stop_auto_login_task
+
+            stop_auto_login_task()
+            _auto_login_started = False
+            logger.info('自动登录任务已停止')
+        except Exception as e:
+            logger.warning('停止自动登录任务失败: %s', e)
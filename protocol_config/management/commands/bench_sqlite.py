@@ -0,0 +1,148 @@
+"""
+SQLite 并发写入基准
+
+python manage.py bench_sqlite --workers 8 --seconds 5
+python manage.py bench_sqlite --profile tuned --readers 4
+
+在临时数据库上比较两种配置：
+- default  Django 默认：回滚日志、timeout=5、每次操作新建连接、BEGIN DEFERRED
+- tuned    protocol_core.sqlite_backend：WAL、synchronous=NORMAL、连接复用、BEGIN IMMEDIATE
+
+每个写线程循环执行 “先查询再插入” 的事务（与 get_or_create / 日志写入类似），
+读线程持续执行聚合查询。
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from protocol_core.sqlite_backend.base import DEFAULT_PRAGMAS, apply_pragmas
+
+PROFILES = {
+    'default': {'pragmas': {}, 'timeout': 5, 'begin': 'BEGIN', 'reuse': False},
+    'tuned': {'pragmas': dict(DEFAULT_PRAGMAS), 'timeout': 30, 'begin': 'BEGIN IMMEDIATE', 'reuse': True},
+}
+
+
+def _connect(path, profile):
+    conn = sqlite3.connect(path, timeout=profile['timeout'], isolation_level=None, check_same_thread=False)
+    apply_pragmas(conn, profile['pragmas'])
+    return conn
+
+
+def _percentile(values, percent):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def run_profile(name, workers, readers, seconds, payload):
+    profile = PROFILES[name]
+    directory = tempfile.mkdtemp(prefix='bench_sqlite_')
+    path = os.path.join(directory, 'bench.db')
+    setup = _connect(path, profile)
+    setup.execute('CREATE TABLE log (id INTEGER PRIMARY KEY, worker INTEGER, seq INTEGER, body TEXT)')
+    setup.execute('CREATE INDEX log_worker_seq ON log (worker, seq)')
+    setup.close()
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    stats = {'writes': 0, 'reads': 0, 'locked': 0, 'latencies': []}
+
+    def writer(worker):
+        conn = _connect(path, profile) if profile['reuse'] else None
+        seq = 0
+        latencies = []
+        writes = locked = 0
+        while not stop.is_set():
+            current = conn or _connect(path, profile)
+            started = time.perf_counter()
+            try:
+                current.execute(profile['begin'])
+                current.execute('SELECT id FROM log WHERE worker = ? AND seq = ?', (worker, seq)).fetchone()
+                current.execute('INSERT INTO log (worker, seq, body) VALUES (?, ?, ?)', (worker, seq, payload))
+                current.execute('COMMIT')
+                writes += 1
+                seq += 1
+                latencies.append(time.perf_counter() - started)
+            except sqlite3.OperationalError:
+                locked += 1
+                if current.in_transaction:
+                    current.execute('ROLLBACK')
+            finally:
+                if conn is None:
+                    current.close()
+        if conn is not None:
+            conn.close()
+        with lock:
+            stats['writes'] += writes
+            stats['locked'] += locked
+            stats['latencies'].extend(latencies)
+
+    def reader():
+        conn = _connect(path, profile)
+        reads = 0
+        while not stop.is_set():
+            try:
+                conn.execute('SELECT worker, COUNT(*) FROM log GROUP BY worker').fetchall()
+                reads += 1
+            except sqlite3.OperationalError:
+                pass
+        conn.close()
+        with lock:
+            stats['reads'] += reads
+
+    threads = [threading.Thread(target=writer, args=(index,)) for index in range(workers)]
+    threads += [threading.Thread(target=reader) for _ in range(readers)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    for suffix in ('', '-wal', '-shm', '-journal'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    os.rmdir(directory)
+
+    stats['elapsed'] = elapsed
+    return stats
+
+
+class Command(BaseCommand):
+    help = '比较默认 SQLite 配置与调优配置的并发写入吞吐'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', choices=['both'] + list(PROFILES), default='both')
+        parser.add_argument('--workers', type=int, default=8, help='写线程数')
+        parser.add_argument('--readers', type=int, default=2, help='读线程数')
+        parser.add_argument('--seconds', type=float, default=5, help='每种配置运行时长')
+        parser.add_argument('--payload', type=int, default=200, help='每行数据大小（字节）')
+
+    def handle(self, *args, **options):
+        names = list(PROFILES) if options['profile'] == 'both' else [options['profile']]
+        payload = 'x' * options['payload']
+        results = {}
+        for name in names:
+            self.stdout.write(f'运行 {name} ...')
+            results[name] = stats = run_profile(name, options['workers'], options['readers'],
+                                                options['seconds'], payload)
+            latencies = stats['latencies']
+            self.stdout.write(self.style.SUCCESS(
+                f"{name:<8} 写入 {stats['writes'] / stats['elapsed']:.0f} 次/秒  "
+                f"读取 {stats['reads'] / stats['elapsed']:.0f} 次/秒  "
+                f"锁冲突 {stats['locked']}  "
+                f"p50 {_percentile(latencies, 50) * 1000:.1f}ms  p95 {_percentile(latencies, 95) * 1000:.1f}ms"
+            ))
+
+        if len(results) == 2 and results['default']['writes']:
+            speedup = (results['tuned']['writes'] / results['tuned']['elapsed']) / \
+                      (results['default']['writes'] / results['default']['elapsed'])
+            self.stdout.write(f'写入吞吐提升: {speedup:.1f}x')
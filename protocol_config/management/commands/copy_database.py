@@ -0,0 +1,165 @@
+"""
+把 SQLite 数据复制到当前数据库（DATABASE_URL）
+
+    DATABASE_URL=postgres://... python manage.py migrate
+    DATABASE_URL=postgres://... python manage.py copy_database --source sqlite:///protocol_core.db
+
+- 按外键依赖顺序逐表复制，每表按主键分批读取、每批一个事务写入，内存占用与表大小无关
+- 保留原主键，复制完成后重置 PostgreSQL 序列
+- 目标库必须已执行 migrate 且为空（contenttypes / 权限会被源数据替换），或使用 --flush 清空
+- 没有服务器数据库时，可以用 --target sqlite:///copy.db 在本地验证
+"""
+import time
+
+from django.apps import apps
+from django.core import serializers
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connections, transaction
+
+from utils.database_url import parse_database_url, redact_url
+
+SOURCE_ALIAS = 'copy_source'
+TARGET_ALIAS = 'copy_target'
+
+# migrate 时自动生成的数据，复制前先清空，使用源库中的主键
+REGENERATED_MODELS = ('contenttypes.ContentType', 'auth.Permission')
+
+
+def get_models_in_order():
+    """按外键依赖排序的模型列表（含多对多中间表）"""
+    app_list = [(app_config, None) for app_config in apps.get_app_configs()]
+    models = serializers.sort_dependencies(app_list, allow_cycles=True)
+    ordered = []
+    for model in models:
+        if not model._meta.managed or model._meta.proxy:
+            continue
+        ordered.append(model)
+        for field in model._meta.local_many_to_many:
+            through = field.remote_field.through
+            if through._meta.auto_created and through not in ordered:
+                ordered.append(through)
+    return ordered
+
+
+def register_database(alias, url):
+    """临时注册一个数据库连接"""
+    from django.conf import settings
+
+    config = parse_database_url(url, base_dir=getattr(settings, 'BASE_DIR', None))
+    connections.settings[alias] = config
+    connections.configure_settings(connections.settings)
+    return alias
+
+
+class Command(BaseCommand):
+    help = '分批复制 SQLite 数据到当前配置的数据库'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default='sqlite:///protocol_core.db', help='源数据库 URL')
+        parser.add_argument('--target', default='', help='目标数据库 URL，默认为 DATABASES["default"]')
+        parser.add_argument('--batch-size', type=int, default=2000, help='每批行数')
+        parser.add_argument('--migrate', action='store_true', help='复制前在目标库执行 migrate')
+        parser.add_argument('--flush', action='store_true', help='复制前清空目标库中的数据')
+        parser.add_argument('--exclude', nargs='*', default=[], help='跳过的模型，如 protocol_api.APIRequest')
+
+    def handle(self, *args, **options):
+        source = register_database(SOURCE_ALIAS, options['source'])
+        target = register_database(TARGET_ALIAS, options['target']) if options['target'] else 'default'
+        batch_size = options['batch_size']
+
+        self.stdout.write(f"源数据库: {redact_url(options['source'])}")
+        self.stdout.write(f"目标数据库: {connections[target].settings_dict['ENGINE']} "
+                          f"{connections[target].settings_dict['NAME']}")
+        if str(connections[source].settings_dict['NAME']) == str(connections[target].settings_dict['NAME']):
+            raise CommandError('源数据库和目标数据库相同')
+
+        if options['migrate']:
+            call_command('migrate', database=target, interactive=False, run_syncdb=True, verbosity=0)
+
+        excluded = {label.lower() for label in options['exclude']}
+        models = [m for m in get_models_in_order() if m._meta.label_lower not in excluded]
+        self.prepare_target(models, target, options['flush'])
+
+        started = time.monotonic()
+        total = 0
+        for model in models:
+            copied = self.copy_model(model, source, target, batch_size)
+            total += copied
+        self.reset_sequences(models, target)
+
+        mismatched = self.verify(models, source, target)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f'复制完成: {total} 行，{len(models)} 张表，耗时 {elapsed:.1f}s'))
+        if mismatched:
+            raise CommandError('行数不一致: ' + '，'.join(mismatched))
+
+    def prepare_target(self, models, target, flush):
+        non_empty = []
+        for model in models:
+            if model._meta.label in REGENERATED_MODELS:
+                continue
+            if model._base_manager.using(target).exists():
+                non_empty.append(model._meta.label)
+        if non_empty and not flush:
+            raise CommandError('目标库已有数据（' + '，'.join(non_empty[:5]) + '），使用 --flush 清空后再复制')
+
+        # 倒序删除，先删引用方
+        with transaction.atomic(using=target):
+            for model in reversed(models):
+                if flush or model._meta.label in REGENERATED_MODELS:
+                    model._base_manager.using(target).all()._raw_delete(target)
+
+    def copy_model(self, model, source, target, batch_size):
+        """按主键分批复制一张表"""
+        meta = model._meta
+        fields = meta.concrete_fields
+        connection = connections[target]
+        quote = connection.ops.quote_name
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            quote(meta.db_table),
+            ', '.join(quote(field.column) for field in fields),
+            ', '.join(['%s'] * len(fields)),
+        )
+
+        queryset = model._base_manager.using(source).order_by('pk')
+        copied = 0
+        last_pk = None
+        started = time.monotonic()
+        while True:
+            batch = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            objs = list(batch[:batch_size])
+            if not objs:
+                break
+            # 直接写入原始值，不经过 auto_now 等 pre_save 逻辑
+            rows = [
+                [field.get_db_prep_save(getattr(obj, field.attname), connection) for field in fields]
+                for obj in objs
+            ]
+            with transaction.atomic(using=target), connection.cursor() as cursor:
+                cursor.executemany(sql, rows)
+            copied += len(objs)
+            last_pk = objs[-1].pk
+
+        if copied:
+            elapsed = time.monotonic() - started or 1e-9
+            self.stdout.write(f'  {meta.label:<40} {copied:>9} 行  {copied / elapsed:,.0f} 行/秒')
+        return copied
+
+    def reset_sequences(self, models, target):
+        connection = connections[target]
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        if statements:
+            with transaction.atomic(using=target), connection.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
+
+    def verify(self, models, source, target):
+        mismatched = []
+        for model in models:
+            expected = model._base_manager.using(source).count()
+            actual = model._base_manager.using(target).count()
+            if expected != actual:
+                mismatched.append(f'{model._meta.label} {actual}/{expected}')
+        return mismatched
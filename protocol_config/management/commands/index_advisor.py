@@ -0,0 +1,158 @@
+"""
+索引检查
+
+python manage.py index_advisor                       # 检查常用查询 + 主要页面
+python manage.py index_advisor --url /logs/ --url /dashboard/
+python manage.py index_advisor --no-views            # 只检查内置的常用查询
+
+- 内置查询：日志列表、仪表盘统计等常见查询形状
+- 页面：用测试客户端以管理员身份请求页面（事务内执行并回滚），
+  用 CaptureQueriesContext 捕获其中的 SELECT
+对每条查询执行 EXPLAIN（SQLite 为 EXPLAIN QUERY PLAN），报告全表扫描和临时排序。
+"""
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+DEFAULT_URLS = [
+    '/dashboard/',
+    '/logs/',
+    '/connections/',
+    '/accounts/login-logs/',
+    '/dashboard/protocol-config/api/refresh/logs/',
+    '/read-check/sessions/',
+    '/read-check/api/sessions/',
+]
+
+
+def get_hot_queries():
+    """常用查询形状（名称, QuerySet）"""
+    from connections.models import ConnectionLog
+    from protocol_api.models import APIRequest
+    from protocol_config.models import RefreshLog, AutoLoginLog
+    from read_check.models import ReadCheckLog, ReadCheckSession, ReadCheckProcessLog
+    from wechat_login.models import LoginRecord, QRCodeSession
+
+    now = timezone.now()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    week_ago = now - timedelta(days=7)
+    return [
+        ('连接日志列表', ConnectionLog.objects.filter(connection_id=1).order_by('-created_at')[:50]),
+        ('连接日志按类型', ConnectionLog.objects.filter(log_type='error', created_at__gte=week_ago)),
+        ('刷新日志列表', RefreshLog.objects.order_by('-created_at')[:20]),
+        ('自动刷新日志', RefreshLog.objects.filter(refresh_type='auto', created_at__gte=week_ago)),
+        ('自动登录日志', AutoLoginLog.objects.filter(wxid='wxid').order_by('-created_at')[:20]),
+        ('今日 API 调用（范围）', APIRequest.objects.filter(user_id=1, created_at__gte=today)),
+        ('今日 API 调用（__date）', APIRequest.objects.filter(user_id=1, created_at__date=today.date())),
+        ('API 调用按类型统计', APIRequest.objects.filter(created_at__gte=week_ago)
+         .values('request_type').annotate(total=Count('id')).order_by()),
+        ('用户 API 调用按类型', APIRequest.objects.filter(user_id=1, request_type='get_code', created_at__gte=today)),
+        ('阅读过检日志', ReadCheckLog.objects.filter(config_id=1).order_by('-created_at')[:50]),
+        ('检测会话列表', ReadCheckSession.objects.filter(user_id=1).order_by('-started_at')[:20]),
+        ('运行中的检测会话', ReadCheckSession.objects.filter(status='running', started_at__lt=now)),
+        ('检测流程日志', ReadCheckProcessLog.objects.filter(session_id=1).order_by('created_at')),
+        ('微信登录记录', LoginRecord.objects.filter(connection_id=1).order_by('-created_at')[:20]),
+        ('二维码会话', QRCodeSession.objects.filter(user_id=1).order_by('-created_at')[:20]),
+        ('过期二维码会话', QRCodeSession.objects.filter(status='waiting', expires_at__lt=now).order_by()),
+    ]
+
+
+def explain(sql, params=()):
+    """返回 (计划文本列表, 问题列表)"""
+    vendor = connection.vendor
+    with connection.cursor() as cursor:
+        if vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            lines = [row[-1] for row in cursor.fetchall()]
+            problems = [line for line in lines
+                        if (line.startswith('SCAN') and 'INDEX' not in line and 'PRIMARY KEY' not in line)
+                        or 'TEMP B-TREE' in line]
+        elif vendor == 'postgresql':
+            cursor.execute('EXPLAIN ' + sql, params)
+            lines = [row[0] for row in cursor.fetchall()]
+            problems = [line.strip() for line in lines if 'Seq Scan' in line]
+        elif vendor == 'mysql':
+            cursor.execute('EXPLAIN ' + sql, params)
+            columns = [column[0] for column in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            lines = [f"{row.get('table')}: type={row.get('type')} key={row.get('key')} {row.get('Extra') or ''}"
+                     for row in rows]
+            problems = [line for line, row in zip(lines, rows)
+                        if row.get('type') == 'ALL' or 'filesort' in str(row.get('Extra') or '')]
+        else:
+            return [], []
+    return lines, problems
+
+
+class Command(BaseCommand):
+    help = '用 EXPLAIN 检查常用查询和主要页面的查询是否走索引'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', action='append', dest='urls', help='要检查的页面，可多次指定')
+        parser.add_argument('--username', help='请求页面时使用的用户，默认第一个超级用户')
+        parser.add_argument('--no-views', action='store_true', help='不请求页面')
+        parser.add_argument('--verbose-plan', action='store_true', help='输出所有查询的执行计划')
+
+    def handle(self, *args, **options):
+        self.verbose_plan = options['verbose_plan']
+        flagged = 0
+
+        self.stdout.write(self.style.MIGRATE_HEADING('常用查询'))
+        for name, queryset in get_hot_queries():
+            sql, params = queryset.query.sql_with_params()
+            flagged += self.report(name, sql, params)
+
+        if not options['no_views']:
+            for url in options['urls'] or DEFAULT_URLS:
+                self.stdout.write(self.style.MIGRATE_HEADING(f'页面 {url}'))
+                seen = set()
+                for sql in self.capture_view_queries(url, options['username']):
+                    if sql in seen or not sql.lstrip().upper().startswith('SELECT'):
+                        continue
+                    seen.add(sql)
+                    flagged += self.report(sql[:100], sql)
+
+        style = self.style.WARNING if flagged else self.style.SUCCESS
+        self.stdout.write(style(f'共 {flagged} 条查询存在全表扫描或临时排序'))
+
+    def report(self, name, sql, params=()):
+        try:
+            lines, problems = explain(sql, params)
+        except Exception as e:
+            self.stdout.write(f'  ? {name}: 无法 EXPLAIN（{e}）')
+            return 0
+        if problems:
+            self.stdout.write(self.style.WARNING(f'  ✗ {name}'))
+            for line in problems:
+                self.stdout.write(f'      {line}')
+            if 'django_datetime_cast_date' in sql or '::date' in sql:
+                self.stdout.write('      提示: created_at__date 无法使用索引，改用 created_at__gte/__lt 范围查询')
+        else:
+            self.stdout.write(f'  ✓ {name}')
+        if self.verbose_plan:
+            for line in lines:
+                self.stdout.write(f'      {line}')
+        return 1 if problems else 0
+
+    def capture_view_queries(self, url, username=None):
+        User = get_user_model()
+        users = User.objects.filter(username=username) if username else User.objects.filter(is_superuser=True)
+        user = users.order_by('pk').first()
+
+        client = Client(raise_request_exception=False)
+        with transaction.atomic():
+            if user is not None:
+                client.force_login(user)
+            with CaptureQueriesContext(connection) as captured:
+                response = client.get(url)
+            transaction.set_rollback(True)
+
+        if response.status_code >= 400:
+            self.stdout.write(f'  页面返回 {response.status_code}')
+        return [query['sql'] for query in captured.captured_queries]
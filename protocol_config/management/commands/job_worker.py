@@ -0,0 +1,66 @@
+"""
+后台任务 worker
+
+python manage.py job_worker                         # 前台运行，执行所有类型
+python manage.py job_worker --concurrency 8
+python manage.py job_worker --types read_check      # 只执行指定类型
+python manage.py job_worker --once                  # 执行完当前可领取的任务后退出
+python manage.py job_worker --stats                 # 查看排队 / 执行中数量
+
+单独运行 worker 进程时，服务进程设置 PROTOCOL_JOB_WORKER=0 关闭进程内 worker。
+"""
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from protocol_config import job_queue
+
+
+class Command(BaseCommand):
+    help = '运行后台任务 worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=None, help='同时执行的任务数')
+        parser.add_argument('--types', nargs='+', help='只执行这些任务类型')
+        parser.add_argument('--poll-interval', type=float, default=None, help='没有任务时的轮询间隔（秒）')
+        parser.add_argument('--once', action='store_true', help='执行完当前可领取的任务后退出')
+        parser.add_argument('--stats', action='store_true', help='显示队列统计后退出')
+
+    def handle(self, *args, **options):
+        registered = job_queue.get_registered_tasks()
+        if options['stats']:
+            self.show_stats(registered)
+            return
+
+        unknown = set(options['types'] or []) - set(registered)
+        if unknown:
+            raise CommandError(f"未注册的任务类型: {', '.join(sorted(unknown))}")
+
+        worker = job_queue.Worker(concurrency=options['concurrency'], job_types=options['types'],
+                                  poll_interval=options['poll_interval'])
+        if options['once']:
+            total = worker.drain()
+            self.stdout.write(self.style.SUCCESS(f'执行了 {total} 个任务'))
+            return
+
+        def shutdown(signum, frame):
+            self.stdout.write('正在停止，等待执行中的任务结束...')
+            worker.stop(timeout=0)
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+        self.stdout.write(self.style.SUCCESS(
+            f'worker 已启动: {worker.worker_id}（并发 {worker.concurrency}，'
+            f"类型 {', '.join(sorted(worker.get_job_types()))}）"
+        ))
+        worker.run_forever()
+        self.stdout.write('worker 已停止')
+
+    def show_stats(self, registered):
+        stats = job_queue.queue_stats()
+        for name, definition in sorted(registered.items()):
+            counts = stats.get(name, {})
+            self.stdout.write(
+                f"{name:<20} 并发上限 {definition.concurrency}  "
+                f"排队 {counts.get('queued', 0)}  执行中 {counts.get('running', 0)}  {definition.description}"
+            )
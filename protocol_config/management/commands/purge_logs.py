@@ -0,0 +1,34 @@
+"""
+分批清理过期日志
+
+python manage.py purge_logs                 # 使用协议配置中的日志保留天数
+python manage.py purge_logs --days 7
+python manage.py purge_logs --dry-run       # 只统计待删除行数
+"""
+from django.core.management.base import BaseCommand
+
+from protocol_config.models import ProtocolConfig
+from protocol_config.retention import purge_expired_logs, DEFAULT_CHUNK_SIZE, DEFAULT_PAUSE
+
+
+class Command(BaseCommand):
+    help = '按主键范围分批删除超过保留天数的日志'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='保留天数，默认使用协议配置')
+        parser.add_argument('--dry-run', action='store_true', help='只统计，不删除')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='每批删除行数')
+        parser.add_argument('--pause', type=float, default=DEFAULT_PAUSE, help='批次之间休眠（秒）')
+
+    def handle(self, *args, **options):
+        days = options['days'] or ProtocolConfig.get_config().log_retention_days
+        dry_run = options['dry_run']
+        results = purge_expired_logs(days, dry_run=dry_run, chunk_size=options['chunk_size'], pause=options['pause'])
+
+        key = 'expired' if dry_run else 'deleted'
+        label = '待删除' if dry_run else '已删除'
+        self.stdout.write(f'保留 {days} 天')
+        for result in results:
+            self.stdout.write(f"  {result['table']:<28} {label} {result[key]:>9} 条  {result['duration']:.2f}s")
+        total = sum(result[key] for result in results)
+        self.stdout.write(self.style.SUCCESS(f'合计{label} {total} 条'))
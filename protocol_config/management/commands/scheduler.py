@@ -0,0 +1,72 @@
+"""
+定时任务管理
+
+python manage.py scheduler list
+python manage.py scheduler runs auto_refresh
+python manage.py scheduler pause log_cleanup
+python manage.py scheduler resume log_cleanup
+python manage.py scheduler trigger auto_refresh
+python manage.py scheduler run          # 前台运行调度器（单独的调度进程）
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from protocol_config import scheduler
+
+
+class Command(BaseCommand):
+    help = '查看和管理定时任务'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['list', 'runs', 'pause', 'resume', 'trigger', 'run'])
+        parser.add_argument('name', nargs='?', help='任务名称')
+        parser.add_argument('--limit', type=int, default=20, help='runs 显示的记录数')
+
+    def handle(self, *args, **options):
+        action = options['action']
+        name = options['name']
+
+        if action == 'list':
+            self.list_jobs()
+        elif action == 'run':
+            self.run_forever()
+        else:
+            if not name:
+                raise CommandError(f'{action} 需要指定任务名称')
+            if action == 'runs':
+                self.list_runs(name, options['limit'])
+                return
+            handler = {'pause': scheduler.pause_job, 'resume': scheduler.resume_job,
+                       'trigger': scheduler.trigger_job}[action]
+            if not handler(name):
+                raise CommandError(f'任务不存在: {name}')
+            self.stdout.write(self.style.SUCCESS(f'{name}: {action} 完成'))
+
+    def list_jobs(self):
+        jobs = scheduler.list_jobs()
+        if not jobs:
+            self.stdout.write('暂无任务（调度器启动后自动创建）')
+            return
+        for job in jobs:
+            state = '暂停' if job['is_paused'] else '启用'
+            duration = f"{job['last_duration']:.2f}s" if job['last_duration'] is not None else '-'
+            self.stdout.write(
+                f"{job['name']:<16} {state}  间隔 {job['interval_seconds']}s  "
+                f"下次 {job['next_run_at'] or '-'}  上次 {job['last_status'] or '-'} ({duration})"
+            )
+
+    def list_runs(self, name, limit):
+        for run in scheduler.get_job_runs(name, limit):
+            duration = f"{run['duration']:.2f}s" if run['duration'] is not None else '-'
+            self.stdout.write(f"{run['started_at']}  {run['status']:<8} {run['trigger']:<8} {duration:>8}  {run['message']}")
+
+    def run_forever(self):
+        instance = scheduler.start_scheduler()
+        self.stdout.write(self.style.SUCCESS(f'调度器已启动: {instance.owner}'))
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            instance.stop()
+            self.stdout.write('调度器已停止')
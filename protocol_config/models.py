@@ -1,8 +1,10 @@
 """
 协议配置模型
 """
+from django.conf import settings
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
 from config import PROTOCOL_CONFIG
 
 
@@ -150,7 +152,20 @@ class RefreshLog(models.Model):
         blank=True,
         verbose_name='错误信息'
     )
-    
+
+    duration = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='执行时长(秒)'
+    )
+
+    phase_timings = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='各阶段耗时',
+        help_text='load/fetch/write/total，单位：秒'
+    )
+
     created_at = models.DateTimeField(
         auto_now_add=True,
         verbose_name='刷新时间'
@@ -161,6 +176,10 @@ class RefreshLog(models.Model):
         verbose_name_plural = '刷新日志'
         db_table = 'protocol_refresh_log'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['refresh_type', 'created_at']),
+        ]
     
     def __str__(self):
         return f"{self.get_refresh_type_display()} - {self.success_count}/{self.connection_count}"
@@ -230,6 +249,430 @@ class AutoLoginLog(models.Model):
         verbose_name_plural = '自动登录日志'
         db_table = 'protocol_auto_login_log'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['wxid', '-created_at']),
+            models.Index(fields=['result', 'created_at']),
+        ]
     
     def __str__(self):
         return f"{self.wxid} - {self.get_result_display()}"
+
+
+class ScheduledJob(models.Model):
+    """定时任务"""
+
+    STATUS_CHOICES = [
+        ('success', '成功'),
+        ('failed', '失败'),
+        ('skipped', '跳过'),
+        ('misfire', '错过执行'),
+    ]
+
+    name = models.CharField(
+        max_length=50,
+        unique=True,
+        verbose_name='任务名称'
+    )
+
+    description = models.CharField(
+        max_length=200,
+        blank=True,
+        verbose_name='任务说明'
+    )
+
+    interval_seconds = models.IntegerField(
+        default=3600,
+        verbose_name='执行间隔(秒)'
+    )
+
+    jitter_seconds = models.IntegerField(
+        default=0,
+        verbose_name='随机抖动(秒)',
+        help_text='下次执行时间额外增加 0~N 秒的随机延迟，避免多个任务同时执行'
+    )
+
+    misfire_grace_seconds = models.IntegerField(
+        default=300,
+        verbose_name='错过执行宽限(秒)',
+        help_text='超过计划时间太久（如停机期间）的执行只补一次'
+    )
+
+    is_paused = models.BooleanField(
+        default=False,
+        verbose_name='是否暂停'
+    )
+
+    run_requested = models.BooleanField(
+        default=False,
+        verbose_name='请求立即执行'
+    )
+
+    next_run_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='下次执行时间'
+    )
+
+    last_run_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='上次执行时间'
+    )
+
+    last_status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        blank=True,
+        verbose_name='上次执行结果'
+    )
+
+    last_duration = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='上次执行时长(秒)'
+    )
+
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='创建时间'
+    )
+
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='更新时间'
+    )
+
+    class Meta:
+        verbose_name = '定时任务'
+        verbose_name_plural = '定时任务'
+        db_table = 'protocol_scheduled_job'
+        ordering = ['name']
+
+    def __str__(self):
+        status = '已暂停' if self.is_paused else '运行中'
+        return f"{self.name} - {status}"
+
+
+class JobRun(models.Model):
+    """定时任务执行记录"""
+
+    job = models.ForeignKey(
+        ScheduledJob,
+        on_delete=models.CASCADE,
+        related_name='runs',
+        verbose_name='任务'
+    )
+
+    status = models.CharField(
+        max_length=10,
+        choices=ScheduledJob.STATUS_CHOICES,
+        verbose_name='执行结果'
+    )
+
+    trigger = models.CharField(
+        max_length=10,
+        default='schedule',
+        choices=[('schedule', '定时'), ('manual', '手动')],
+        verbose_name='触发方式'
+    )
+
+    message = models.TextField(
+        blank=True,
+        verbose_name='详细信息'
+    )
+
+    owner = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name='执行进程'
+    )
+
+    started_at = models.DateTimeField(
+        verbose_name='开始时间'
+    )
+
+    duration = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='执行时长(秒)'
+    )
+
+    class Meta:
+        verbose_name = '任务执行记录'
+        verbose_name_plural = '任务执行记录'
+        db_table = 'protocol_job_run'
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['started_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.job.name} - {self.get_status_display()}"
+
+
+class SchedulerLease(models.Model):
+    """调度器主节点租约，同一时间只有持有租约的进程执行定时任务"""
+
+    name = models.CharField(
+        max_length=50,
+        primary_key=True,
+        verbose_name='租约名称'
+    )
+
+    owner = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name='持有者'
+    )
+
+    expires_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='过期时间'
+    )
+
+    class Meta:
+        verbose_name = '调度器租约'
+        verbose_name_plural = '调度器租约'
+        db_table = 'protocol_scheduler_lease'
+
+    def __str__(self):
+        return f"{self.name} - {self.owner}"
+
+
+class DailyStat(models.Model):
+    """每日统计汇总（按 日期 × 用户 × 连接 × 来源 × 类型）
+
+    由日志写入时增量更新（见 protocol_config.stats），仪表盘和图表直接读取本表，
+    不再扫描原始日志。user_id / connection_id 为 0 表示没有对应维度。
+    """
+
+    day = models.DateField(
+        verbose_name='日期'
+    )
+
+    user_id = models.IntegerField(
+        default=0,
+        verbose_name='用户ID'
+    )
+
+    connection_id = models.IntegerField(
+        default=0,
+        verbose_name='连接ID'
+    )
+
+    source = models.CharField(
+        max_length=30,
+        verbose_name='来源',
+        help_text='connection_log / api_request / refresh / auto_login / read_check / wechat_login'
+    )
+
+    log_type = models.CharField(
+        max_length=30,
+        blank=True,
+        verbose_name='类型'
+    )
+
+    total = models.IntegerField(
+        default=0,
+        verbose_name='总数'
+    )
+
+    success = models.IntegerField(
+        default=0,
+        verbose_name='成功数'
+    )
+
+    failed = models.IntegerField(
+        default=0,
+        verbose_name='失败数'
+    )
+
+    duration = models.FloatField(
+        default=0,
+        verbose_name='总耗时(秒)'
+    )
+
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='更新时间'
+    )
+
+    class Meta:
+        verbose_name = '每日统计'
+        verbose_name_plural = '每日统计'
+        db_table = 'protocol_daily_stat'
+        ordering = ['-day']
+        unique_together = ['day', 'user_id', 'connection_id', 'source', 'log_type']
+        indexes = [
+            models.Index(fields=['source', 'day']),
+            models.Index(fields=['user_id', 'source', 'day']),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.source}/{self.log_type} - {self.success}/{self.total}"
+
+    @property
+    def success_rate(self):
+        return round(self.success / self.total * 100, 2) if self.total else 0
+
+
+class BackgroundJob(models.Model):
+    """后台任务队列（见 protocol_config.job_queue）
+
+    耗时操作（阅读检测、批量刷新等）由接口入队后立即返回任务 ID，
+    由 worker 进程（manage.py job_worker 或服务进程内的 worker）领取执行。
+    """
+
+    STATUS_CHOICES = [
+        ('queued', '排队中'),
+        ('running', '执行中'),
+        ('succeeded', '成功'),
+        ('failed', '失败'),
+        ('cancelled', '已取消'),
+    ]
+
+    job_type = models.CharField(
+        max_length=50,
+        verbose_name='任务类型'
+    )
+
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default='queued',
+        verbose_name='状态'
+    )
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='background_jobs',
+        verbose_name='提交用户'
+    )
+
+    payload = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='任务参数'
+    )
+
+    result = models.JSONField(
+        null=True,
+        blank=True,
+        verbose_name='执行结果'
+    )
+
+    error = models.TextField(
+        blank=True,
+        verbose_name='错误信息'
+    )
+
+    progress = models.IntegerField(
+        default=0,
+        verbose_name='进度(%)'
+    )
+
+    progress_message = models.CharField(
+        max_length=200,
+        blank=True,
+        verbose_name='进度说明'
+    )
+
+    attempts = models.IntegerField(
+        default=0,
+        verbose_name='已执行次数'
+    )
+
+    max_attempts = models.IntegerField(
+        default=1,
+        verbose_name='最多执行次数'
+    )
+
+    cancel_requested = models.BooleanField(
+        default=False,
+        verbose_name='请求取消'
+    )
+
+    run_after = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='最早执行时间',
+        help_text='失败重试时推迟到退避时间之后'
+    )
+
+    worker = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name='执行进程'
+    )
+
+    heartbeat_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='心跳时间'
+    )
+
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='创建时间'
+    )
+
+    started_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='开始时间'
+    )
+
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='结束时间'
+    )
+
+    class Meta:
+        verbose_name = '后台任务'
+        verbose_name_plural = '后台任务'
+        db_table = 'protocol_background_job'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+            models.Index(fields=['job_type', 'status']),
+            models.Index(fields=['user', '-created_at']),
+            models.Index(fields=['finished_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.job_type}#{self.pk} - {self.get_status_display()}"
+
+    @property
+    def is_finished(self):
+        return self.status in ('succeeded', 'failed', 'cancelled')
+
+    @property
+    def duration(self):
+        """执行时长（秒）"""
+        if self.started_at and self.finished_at:
+            return round((self.finished_at - self.started_at).total_seconds(), 3)
+        return None
+
+
+class JobTypeLock(models.Model):
+    """后台任务领取锁：同一任务类型的“统计执行数 + 领取”在这一行的行锁内串行执行，
+    多个 worker 之间也不会超过并发上限（见 job_queue.Worker.claim）"""
+
+    job_type = models.CharField(
+        max_length=50,
+        primary_key=True,
+        verbose_name='任务类型'
+    )
+
+    class Meta:
+        verbose_name = '后台任务领取锁'
+        verbose_name_plural = '后台任务领取锁'
+        db_table = 'protocol_job_type_lock'
+
+    def __str__(self):
+        return self.job_type
@@ -0,0 +1,116 @@
+"""
+后台任务队列接口
+
+另外替换原有的手动刷新接口 api/refresh/manual/：提交 refresh_all 任务后立即返回任务 ID，
+不在请求线程中刷新。
+"""
+import json
+
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET, require_POST
+
+from . import job_queue
+from .job_views import admin_required
+from .models import BackgroundJob
+
+def _user_jobs(user):
+    """普通用户只能查看自己提交的任务"""
+    queryset = BackgroundJob.objects.all()
+    if not getattr(user, 'is_admin', False):
+        queryset = queryset.filter(user_id=user.id)
+    return queryset
+
+
+def _not_found(job_id):
+    return JsonResponse({'code': 404, 'msg': f'任务不存在: {job_id}'}, status=404)
+
+
+def _queued(job, msg='任务已提交', **extra):
+    data = {'job_id': job.id, 'status': job.status}
+    data.update(extra)
+    return JsonResponse({'code': 202, 'msg': msg, 'data': data}, status=202)
+
+
+@login_required
+@require_GET
+def queue_job_list(request):
+    """任务列表，支持 ?status= / ?type= 过滤"""
+    queryset = _user_jobs(request.user)
+    if request.GET.get('status'):
+        queryset = queryset.filter(status=request.GET['status'])
+    if request.GET.get('type'):
+        queryset = queryset.filter(job_type=request.GET['type'])
+    try:
+        limit = min(int(request.GET.get('limit', 50)), 200)
+    except ValueError:
+        limit = 50
+    data = [job_queue.serialize_job(job) for job in queryset[:limit]]
+    return JsonResponse({'code': 200, 'msg': 'success', 'data': data})
+
+
+@login_required
+@require_GET
+def queue_job_detail(request, job_id):
+    """任务状态和进度"""
+    job = _user_jobs(request.user).filter(pk=job_id).first()
+    if job is None:
+        return _not_found(job_id)
+    return JsonResponse({'code': 200, 'msg': 'success', 'data': job_queue.serialize_job(job)})
+
+
+@login_required
+@require_POST
+def queue_job_cancel(request, job_id):
+    """取消任务"""
+    if not _user_jobs(request.user).filter(pk=job_id).exists():
+        return _not_found(job_id)
+    if not job_queue.cancel(job_id):
+        return JsonResponse({'code': 400, 'msg': '任务已结束，无法取消'}, status=400)
+    return JsonResponse({'code': 200, 'msg': '已请求取消'})
+
+
+@admin_required
+@require_GET
+def queue_stats(request):
+    """各任务类型排队 / 执行中数量"""
+    return JsonResponse({'code': 200, 'msg': 'success', 'data': job_queue.queue_stats()})
+
+
+@admin_required
+@require_POST
+def queue_refresh_all(request):
+    """提交全部授权码刷新任务（同一时间只保留一个）"""
+    job = BackgroundJob.objects.filter(job_type='refresh_all', status__in=['queued', 'running']).first()
+    if job is not None:
+        return _queued(job, msg='已有刷新任务在执行')
+    return _queued(job_queue.enqueue('refresh_all', user=request.user))
+
+
+@admin_required
+@require_POST
+def manual_refresh(request):
+    """立即刷新全部授权码：提交 refresh_all 任务，前端按任务 ID 查询进度和结果
+
+    自动刷新或其他刷新任务正在执行时拒绝，不排队重复刷新。
+    """
+    from .refresh_engine import is_refresh_running
+
+    running = BackgroundJob.objects.filter(job_type='refresh_all', status__in=['queued', 'running']).exists()
+    if running or is_refresh_running():
+        return JsonResponse({'code': 400, 'msg': '已有刷新任务在执行'}, status=400)
+    return _queued(job_queue.enqueue('refresh_all', user=request.user), msg='刷新任务已提交')
+
+
+@login_required
+@require_POST
+def queue_refresh_auth_codes(request):
+    """提交指定授权码刷新任务，body: {"auth_code_ids": [...]}"""
+    try:
+        data = json.loads(request.body or b'{}')
+        ids = [int(pk) for pk in data.get('auth_code_ids') or []]
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({'code': 400, 'msg': '请求数据格式错误'}, status=400)
+    if not ids:
+        return JsonResponse({'code': 400, 'msg': '请选择要刷新的授权码'}, status=400)
+    return _queued(job_queue.enqueue('refresh_auth_codes', {'auth_code_ids': ids}, user=request.user))
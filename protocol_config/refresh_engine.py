@@ -0,0 +1,285 @@
+"""
+自动刷新并发引擎
+
+按连接限流、全局限并发地查询所有授权码的在线状态和资料，
+再通过 connections.status_writer 批量写回数据库。
+
+同一时间只执行一轮完整刷新（自动刷新、手动刷新和 refresh_all 任务共用一个数据库租约，
+跨进程生效），已有一轮在执行时 run_refresh_pass 抛出 RefreshInProgress。
+"""
+import threading
+import time
+import uuid
+from datetime import timedelta
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+from django.utils import timezone
+
+from config import PROTOCOL_CONFIG
+from utils.protocol_client import get_client_for_connection
+
+
+# 全局并发上限（同时在途的协议请求数）
+DEFAULT_MAX_WORKERS = PROTOCOL_CONFIG.get('REFRESH_MAX_WORKERS', 32)
+# 单个连接（协议服务器）的并发上限
+DEFAULT_PER_CONNECTION_LIMIT = PROTOCOL_CONFIG.get('REFRESH_PER_CONNECTION_LIMIT', 8)
+# 单次查询超时（秒）
+DEFAULT_QUERY_TIMEOUT = PROTOCOL_CONFIG.get('REFRESH_QUERY_TIMEOUT', 10)
+# 查询过程中回调 on_progress 的间隔（秒）
+PROGRESS_INTERVAL = 1.0
+# 完整刷新的租约（SchedulerLease 中的名称）和最长持有时间（秒），进程崩溃后到期自动释放
+REFRESH_LEASE_NAME = 'refresh_pass'
+REFRESH_LEASE_TTL = 1800
+
+WECHATX_TYPES = ['wechatx', 'wechatx-861']
+
+
+def _text(value):
+    """协议返回的字符串字段可能是 {"string": "..."} 形式"""
+    if isinstance(value, dict):
+        return value.get('string') or ''
+    return value or ''
+
+
+def query_account_status(auth_code, timeout=DEFAULT_QUERY_TIMEOUT):
+    """查询单个授权码的在线状态和资料
+
+    返回 dict: success, is_online, nickname, avatar_url, error
+    """
+    connection = auth_code.connection
+    client = get_client_for_connection(connection)
+    result = {'success': False, 'is_online': False, 'nickname': None, 'avatar_url': None, 'error': ''}
+
+    try:
+        if connection.connection_type in WECHATX_TYPES:
+            response = client.post(
+                '/api/User/GetContractProfile',
+                headers={"accept": "application/json", "Content-Type": "application/json"},
+                json={"Wxid": auth_code.code},
+                timeout=timeout,
+            )
+            data = response.json()
+            if data.get('Success'):
+                profile = data.get('Data') or {}
+                user_info = profile.get('userInfo') or {}
+                user_info_ext = profile.get('userInfoExt') or {}
+                result['nickname'] = _text(user_info.get('NickName'))
+                result['avatar_url'] = (user_info_ext.get('BigHeadImgUrl')
+                                        or user_info_ext.get('SmallHeadImgUrl') or '')
+                result['success'] = True
+                result['is_online'] = True
+            else:
+                result['error'] = data.get('Message') or '查询失败'
+        else:
+            response = client.get(
+                '/user/GetProfile',
+                params={'key': auth_code.code},
+                timeout=timeout,
+            )
+            data = response.json()
+            if data.get('Code') == 200:
+                user_info = (data.get('Data') or {}).get('userInfo') or {}
+                user_info_ext = (data.get('Data') or {}).get('userInfoExt') or {}
+                result['nickname'] = _text(user_info.get('nickName'))
+                result['avatar_url'] = (user_info_ext.get('bigHeadImgUrl')
+                                        or user_info_ext.get('smallHeadImgUrl') or '')
+                result['success'] = True
+                result['is_online'] = True
+            else:
+                result['error'] = data.get('Text') or '查询失败'
+    except requests.exceptions.RequestException as e:
+        result['error'] = f'请求失败: {str(e)}'
+    except ValueError:
+        result['error'] = '响应不是有效的JSON'
+
+    return result
+
+
+class RefreshEngine:
+    """有界并发刷新引擎
+
+    - 全局最多 max_workers 个在途请求
+    - 同一连接最多 per_connection_limit 个在途请求
+    - 工作线程只做网络请求，不访问数据库
+    """
+
+    def __init__(self, query_func=None, max_workers=None, per_connection_limit=None):
+        self.query_func = query_func or query_account_status
+        self.max_workers = max_workers or DEFAULT_MAX_WORKERS
+        self.per_connection_limit = per_connection_limit or DEFAULT_PER_CONNECTION_LIMIT
+        self._semaphores = defaultdict(lambda: threading.BoundedSemaphore(self.per_connection_limit))
+        self._semaphores_lock = threading.Lock()
+
+    def _get_semaphore(self, connection_id):
+        with self._semaphores_lock:
+            return self._semaphores[connection_id]
+
+    def _query_one(self, auth_code):
+        semaphore = self._get_semaphore(auth_code.connection_id)
+        with semaphore:
+            try:
+                return self.query_func(auth_code)
+            except Exception as e:
+                return {'success': False, 'is_online': False, 'error': str(e)}
+
+    def fetch(self, auth_codes, on_progress=None):
+        """并发查询，返回 [(auth_code, result), ...]
+
+        on_progress(done, total) 在查询过程中定时调用，抛出异常时取消未开始的查询并向上抛出
+        （后台任务借此响应取消和超时）。
+        """
+        if not auth_codes:
+            return []
+
+        # 按连接交错排列，避免前面的任务全部堆在同一个协议服务器上
+        by_connection = defaultdict(list)
+        for auth_code in auth_codes:
+            by_connection[auth_code.connection_id].append(auth_code)
+        ordered = []
+        queues = list(by_connection.values())
+        while queues:
+            for queue in list(queues):
+                ordered.append(queue.pop(0))
+                if not queue:
+                    queues.remove(queue)
+
+        workers = min(self.max_workers, len(ordered))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='refresh') as executor:
+            futures = [executor.submit(self._query_one, auth_code) for auth_code in ordered]
+            if on_progress is not None:
+                pending = set(futures)
+                while pending:
+                    _, pending = wait(pending, timeout=PROGRESS_INTERVAL)
+                    try:
+                        on_progress(len(futures) - len(pending), len(futures))
+                    except Exception:
+                        for future in futures:
+                            future.cancel()
+                        raise
+            results = [future.result() for future in futures]
+        return list(zip(ordered, results))
+
+    def write_back(self, pairs):
+        """批量写回查询结果"""
+        from connections.status_writer import AuthCodeStatusWriter
+
+        now = timezone.now()
+        with AuthCodeStatusWriter() as writer:
+            for auth_code, result in pairs:
+                writer.record_result(
+                    auth_code,
+                    success=result.get('success'),
+                    is_online=result.get('is_online'),
+                    nickname=result.get('nickname'),
+                    avatar_url=result.get('avatar_url'),
+                    now=now,
+                )
+
+    def run(self, auth_codes, on_progress=None):
+        """执行 查询 -> 写回，返回统计信息"""
+        timings = {}
+
+        started = time.monotonic()
+        pairs = self.fetch(auth_codes, on_progress)
+        timings['fetch'] = round(time.monotonic() - started, 3)
+
+        started = time.monotonic()
+        self.write_back(pairs)
+        timings['write'] = round(time.monotonic() - started, 3)
+
+        errors = [f"{auth_code.code}: {result.get('error')}"
+                  for auth_code, result in pairs if not result.get('success')]
+        return {
+            'total': len(pairs),
+            'success': len(pairs) - len(errors),
+            'failed': len(errors),
+            'errors': errors,
+            'timings': timings,
+        }
+
+
+def get_refresh_queryset(config=None):
+    """需要刷新的授权码（与自动刷新的筛选条件一致）"""
+    from connections.models import AuthCode
+    from .models import ProtocolConfig
+
+    config = config or ProtocolConfig.get_config()
+    queryset = AuthCode.objects.filter(connection__is_active=True).select_related('connection')
+    if config.refresh_wechatx_only:
+        queryset = queryset.filter(connection__connection_type__in=WECHATX_TYPES)
+    return queryset
+
+
+class RefreshInProgress(Exception):
+    """已有一轮完整刷新在执行"""
+
+
+def _acquire_refresh_lease(owner):
+    from django.db.models import Q
+    from .models import SchedulerLease
+
+    now = timezone.now()
+    SchedulerLease.objects.get_or_create(name=REFRESH_LEASE_NAME)
+    return SchedulerLease.objects.filter(name=REFRESH_LEASE_NAME).filter(
+        Q(owner='') | Q(expires_at__isnull=True) | Q(expires_at__lt=now)
+    ).update(owner=owner, expires_at=now + timedelta(seconds=REFRESH_LEASE_TTL)) == 1
+
+
+def _release_refresh_lease(owner):
+    from .models import SchedulerLease
+    SchedulerLease.objects.filter(name=REFRESH_LEASE_NAME, owner=owner).update(owner='', expires_at=None)
+
+
+def is_refresh_running():
+    """是否有一轮完整刷新在执行（任意进程）"""
+    from .models import SchedulerLease
+    return SchedulerLease.objects.filter(name=REFRESH_LEASE_NAME, expires_at__gte=timezone.now()) \
+        .exclude(owner='').exists()
+
+
+def run_refresh_pass(refresh_type='auto', engine=None, on_progress=None):
+    """执行一轮完整刷新并记录 RefreshLog
+
+    auto_refresh 定时任务 / refresh_all 后台任务共用此入口。on_progress 见 RefreshEngine.fetch，
+    查询阶段被中止时不写回结果、不记录 RefreshLog。已有一轮在执行时抛出 RefreshInProgress。
+    """
+    owner = uuid.uuid4().hex
+    if not _acquire_refresh_lease(owner):
+        raise RefreshInProgress('已有刷新在执行')
+    try:
+        return _run_refresh_pass(refresh_type, engine, on_progress)
+    finally:
+        _release_refresh_lease(owner)
+
+
+def _run_refresh_pass(refresh_type, engine, on_progress):
+    from .models import ProtocolConfig, RefreshLog
+
+    total_started = time.monotonic()
+    config = ProtocolConfig.get_config()
+
+    started = time.monotonic()
+    auth_codes = list(get_refresh_queryset(config))
+    load_time = round(time.monotonic() - started, 3)
+
+    engine = engine or RefreshEngine()
+    stats = engine.run(auth_codes, on_progress)
+
+    timings = {'load': load_time}
+    timings.update(stats['timings'])
+    timings['total'] = round(time.monotonic() - total_started, 3)
+
+    config.last_refresh_time = timezone.now()
+    config.save(update_fields=['last_refresh_time', 'updated_at'])
+
+    return RefreshLog.objects.create(
+        refresh_type=refresh_type,
+        connection_count=stats['total'],
+        success_count=stats['success'],
+        failed_count=stats['failed'],
+        error_message='\n'.join(stats['errors'][:50]),
+        duration=timings['total'],
+        phase_timings=timings,
+    )
@@ -0,0 +1,114 @@
+"""
+日志保留清理
+
+按主键范围分批删除过期日志：
+
+- 每批先用 created_at 索引找出最旧的 N 条的主键范围，再执行一条
+  DELETE ... WHERE id BETWEEN lo AND hi AND created_at < cutoff
+- 不经过 Django 的删除收集器（日志表没有被其他表引用，也没有 delete 信号）
+- 每批单独提交，批次之间短暂休眠，写锁只持有一批的时间
+- dry-run 只用索引统计待删除行数
+
+用法::
+
+    from protocol_config.retention import purge_expired_logs
+
+    results = purge_expired_logs(days=14)
+    results = purge_expired_logs(days=14, dry_run=True)
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from utils.db_retry import retry_on_locked
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 5000
+DEFAULT_PAUSE = 0.05    # 批次之间的休眠（秒），让其他写入有机会获得锁
+
+
+def get_retention_models():
+    """参与保留清理的日志模型及其时间字段"""
+    from connections.models import ConnectionLog
+    from protocol_api.models import APIRequest
+    from read_check.models import ReadCheckLog, ReadCheckProcessLog
+    from wechat_login.models import LoginRecord
+    from .models import RefreshLog, AutoLoginLog, JobRun, BackgroundJob
+
+    return [
+        (ConnectionLog, 'created_at'),
+        (RefreshLog, 'created_at'),
+        (AutoLoginLog, 'created_at'),
+        (ReadCheckLog, 'created_at'),
+        (ReadCheckProcessLog, 'created_at'),
+        (APIRequest, 'created_at'),
+        (LoginRecord, 'created_at'),
+        (JobRun, 'started_at'),
+        # 只有已结束的任务有 finished_at
+        (BackgroundJob, 'finished_at'),
+    ]
+
+
+def estimate_expired(model, field, cutoff):
+    """待删除行数（走时间字段索引）"""
+    return model._base_manager.filter(**{f'{field}__lt': cutoff}).order_by().count()
+
+
+@retry_on_locked()
+def _delete_range(model, field, cutoff, low, high):
+    using = router.db_for_write(model)
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    meta = model._meta
+    sql = 'DELETE FROM {table} WHERE {pk} >= %s AND {pk} <= %s AND {field} < %s'.format(
+        table=quote(meta.db_table),
+        pk=quote(meta.pk.column),
+        field=quote(meta.get_field(field).column),
+    )
+    params = [low, high, meta.get_field(field).get_db_prep_value(cutoff, connection)]
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def purge_model(model, field, cutoff, chunk_size=DEFAULT_CHUNK_SIZE, pause=DEFAULT_PAUSE, max_chunks=None):
+    """分批删除一张表的过期行，返回删除行数"""
+    expired = model._base_manager.filter(**{f'{field}__lt': cutoff}).order_by('pk')
+    deleted = 0
+    chunks = 0
+    while max_chunks is None or chunks < max_chunks:
+        pks = list(expired.values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            break
+        deleted += _delete_range(model, field, cutoff, pks[0], pks[-1])
+        chunks += 1
+        if len(pks) < chunk_size:
+            break
+        if pause:
+            time.sleep(pause)
+    return deleted
+
+
+def purge_expired_logs(days, dry_run=False, chunk_size=DEFAULT_CHUNK_SIZE, pause=DEFAULT_PAUSE, models=None):
+    """清理所有日志表中超过保留天数的记录
+
+    返回 [{'table', 'expired'/'deleted', 'duration'}]。
+    """
+    cutoff = timezone.now() - timedelta(days=days)
+    results = []
+    for model, field in models or get_retention_models():
+        started = time.monotonic()
+        if dry_run:
+            result = {'table': model._meta.db_table, 'expired': estimate_expired(model, field, cutoff)}
+        else:
+            result = {'table': model._meta.db_table,
+                      'deleted': purge_model(model, field, cutoff, chunk_size, pause)}
+            if result['deleted']:
+                logger.info('清理过期日志 %s: %d 条', result['table'], result['deleted'])
+        result['duration'] = round(time.monotonic() - started, 3)
+        results.append(result)
+    return results
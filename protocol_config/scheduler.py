@@ -0,0 +1,391 @@
+"""
+定时任务调度器
+
+替代每个进程各自启动的 自动刷新 / 自动登录 / 日志清理 线程：
+
+- 数据库租约选主：多个进程（多 worker、manage.py 命令）中只有持有租约的进程执行任务
+- 下次执行时间持久化在 ScheduledJob 中，重启后不会立即重复执行
+- 支持随机抖动、错过执行合并（misfire）、暂停、立即触发
+- 每次执行记录到 JobRun（含耗时）
+"""
+import atexit
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+LEASE_NAME = 'default'
+LEASE_TTL = 60          # 租约有效期（秒）
+TICK_INTERVAL = 5       # 调度循环间隔（秒）
+SYNC_INTERVAL = 60      # 检查任务间隔是否被修改的周期（秒）
+
+
+class JobSkipped(Exception):
+    """任务本次无需执行（例如功能未启用）"""
+
+
+class JobDefinition:
+    """已注册的任务"""
+
+    def __init__(self, name, func, interval, description='', jitter=0, misfire_grace=300):
+        self.name = name
+        self.func = func
+        # interval 可以是秒数，也可以是返回秒数的函数（如读取 ProtocolConfig）
+        self.interval = interval
+        self.description = description
+        self.jitter = jitter
+        self.misfire_grace = misfire_grace
+
+    def get_interval(self):
+        return int(self.interval() if callable(self.interval) else self.interval)
+
+
+_registry = {}
+
+
+def register_job(name, func, interval, description='', jitter=0, misfire_grace=300):
+    """注册任务"""
+    _registry[name] = JobDefinition(name, func, interval, description, jitter, misfire_grace)
+    return _registry[name]
+
+
+def get_registered_jobs():
+    return dict(_registry)
+
+
+def compute_next_run(job, now=None):
+    """下次执行时间 = 现在 + 间隔 + 随机抖动"""
+    now = now or timezone.now()
+    jitter = random.uniform(0, job.jitter_seconds) if job.jitter_seconds else 0
+    return now + timedelta(seconds=job.interval_seconds + jitter)
+
+
+def sync_jobs(synced=None):
+    """把注册的任务同步到数据库，已存在的任务保留下次执行时间
+
+    synced 为上次同步时的 {任务名: 间隔}，间隔都没有变化时不访问 ScheduledJob。
+    返回本次的 {任务名: 间隔}。
+    """
+    from .models import ScheduledJob
+
+    intervals = {name: definition.get_interval() for name, definition in _registry.items()}
+    if synced == intervals:
+        return intervals
+
+    now = timezone.now()
+    for definition in _registry.values():
+        interval = intervals[definition.name]
+        job, created = ScheduledJob.objects.get_or_create(
+            name=definition.name,
+            defaults={
+                'description': definition.description,
+                'interval_seconds': interval,
+                'jitter_seconds': definition.jitter,
+                'misfire_grace_seconds': definition.misfire_grace,
+            }
+        )
+        if created:
+            job.next_run_at = compute_next_run(job, now)
+            job.save(update_fields=['next_run_at'])
+        elif job.interval_seconds != interval:
+            # 间隔被修改：如果新间隔更短，提前下次执行时间
+            job.interval_seconds = interval
+            latest = now + timedelta(seconds=interval + job.jitter_seconds)
+            if job.next_run_at is None or job.next_run_at > latest:
+                job.next_run_at = compute_next_run(job, now)
+            job.save(update_fields=['interval_seconds', 'next_run_at', 'updated_at'])
+    return intervals
+
+
+class Scheduler:
+    """调度器（每个进程一个实例，只有租约持有者执行任务）"""
+
+    def __init__(self, tick=TICK_INTERVAL, lease_ttl=LEASE_TTL):
+        self.tick = tick
+        self.lease_ttl = lease_ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._running = set()
+        self._running_lock = threading.Lock()
+        self._leader_callbacks = []
+        self._lost_callbacks = []
+        # 上次同步的任务间隔，None 表示需要完整同步（刚成为主节点）
+        self._synced_intervals = None
+        self._next_sync = 0.0
+
+    # ---- 租约 ----
+
+    def acquire_lease(self):
+        """获取或续约主节点租约"""
+        from .models import SchedulerLease
+
+        now = timezone.now()
+        SchedulerLease.objects.get_or_create(name=LEASE_NAME)
+        updated = SchedulerLease.objects.filter(name=LEASE_NAME).filter(
+            Q(owner=self.owner) | Q(owner='') | Q(expires_at__isnull=True) | Q(expires_at__lt=now)
+        ).update(owner=self.owner, expires_at=now + timedelta(seconds=self.lease_ttl))
+
+        was_leader = self.is_leader
+        self.is_leader = updated == 1
+        if self.is_leader and not was_leader:
+            logger.info('调度器成为主节点: %s', self.owner)
+            self._synced_intervals = None
+            self._run_callbacks(self._leader_callbacks)
+        elif was_leader and not self.is_leader:
+            logger.warning('调度器失去主节点租约: %s', self.owner)
+            self._run_callbacks(self._lost_callbacks)
+        return self.is_leader
+
+    def release_lease(self):
+        from .models import SchedulerLease
+        SchedulerLease.objects.filter(name=LEASE_NAME, owner=self.owner).update(owner='', expires_at=None)
+        was_leader = self.is_leader
+        self.is_leader = False
+        if was_leader:
+            self._run_callbacks(self._lost_callbacks)
+
+    def _run_callbacks(self, callbacks):
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                logger.exception('主节点回调执行失败')
+
+    def on_become_leader(self, callback):
+        """注册成为主节点时执行一次的回调"""
+        self._leader_callbacks.append(callback)
+
+    def on_lose_leader(self, callback):
+        """注册失去主节点租约（或停止时释放租约）时执行的回调"""
+        self._lost_callbacks.append(callback)
+
+    # ---- 任务同步 ----
+
+    def request_sync(self):
+        """下一轮循环检查任务间隔（ProtocolConfig 保存后调用）"""
+        self._next_sync = 0.0
+
+    def sync_if_needed(self):
+        """成为主节点时完整同步一次，之后每 SYNC_INTERVAL 秒（或配置保存后）只在间隔变化时写入"""
+        now = time.monotonic()
+        if self._synced_intervals is not None and now < self._next_sync:
+            return
+        self._synced_intervals = sync_jobs(self._synced_intervals)
+        self._next_sync = now + SYNC_INTERVAL
+
+    # ---- 执行 ----
+
+    def run_due_jobs(self):
+        """启动所有到期或被请求执行的任务"""
+        from .models import ScheduledJob
+
+        now = timezone.now()
+        due = ScheduledJob.objects.filter(
+            Q(run_requested=True) | Q(is_paused=False, next_run_at__lte=now)
+        )
+        for job in due:
+            if job.name not in _registry:
+                continue
+            with self._running_lock:
+                if job.name in self._running:
+                    continue
+                self._running.add(job.name)
+            thread = threading.Thread(target=self._execute_in_thread, args=(job.pk,),
+                                      name=f'job-{job.name}', daemon=True)
+            thread.start()
+
+    def _execute_in_thread(self, job_id):
+        try:
+            self.execute(job_id)
+        finally:
+            close_old_connections()
+
+    def execute(self, job_id):
+        """执行一次任务并记录结果"""
+        from .models import ScheduledJob, JobRun
+
+        job = ScheduledJob.objects.get(pk=job_id)
+        definition = _registry[job.name]
+        try:
+            now = timezone.now()
+            trigger = 'manual' if job.run_requested else 'schedule'
+
+            # 先推进下次执行时间，避免其他进程或下一轮循环重复执行
+            claimed = ScheduledJob.objects.filter(pk=job.pk, next_run_at=job.next_run_at,
+                                                  run_requested=job.run_requested).update(
+                next_run_at=compute_next_run(job, now), run_requested=False
+            )
+            if not claimed:
+                return
+
+            if trigger == 'schedule' and job.next_run_at:
+                late = (now - job.next_run_at).total_seconds()
+                if late > job.misfire_grace_seconds:
+                    missed = int(late // max(job.interval_seconds, 1)) + 1
+                    JobRun.objects.create(
+                        job=job, status='misfire', trigger=trigger, owner=self.owner, started_at=now,
+                        message=f'延迟 {int(late)} 秒，错过 {missed} 次计划执行，合并为一次执行',
+                    )
+
+            started = time.monotonic()
+            try:
+                message = definition.func() or ''
+                status = 'success'
+            except JobSkipped as e:
+                message = str(e)
+                status = 'skipped'
+            except Exception as e:
+                logger.exception('定时任务执行失败: %s', job.name)
+                message = f'{e.__class__.__name__}: {e}'
+                status = 'failed'
+            duration = round(time.monotonic() - started, 3)
+
+            JobRun.objects.create(job=job, status=status, trigger=trigger, owner=self.owner,
+                                  started_at=now, duration=duration, message=str(message)[:2000])
+            ScheduledJob.objects.filter(pk=job.pk).update(
+                last_run_at=now, last_status=status, last_duration=duration, updated_at=timezone.now()
+            )
+        finally:
+            with self._running_lock:
+                self._running.discard(job.name)
+
+    # ---- 线程 ----
+
+    def run_once(self):
+        close_old_connections()
+        if self.acquire_lease():
+            self.sync_if_needed()
+            self.run_due_jobs()
+
+    def _loop(self):
+        while not self._stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                # 数据库尚未迁移等情况，下一轮重试
+                logger.exception('调度循环异常')
+            self._stop_event.wait(self.tick)
+        try:
+            if self.is_leader:
+                self.release_lease()
+        except Exception:
+            pass
+        close_old_connections()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name='protocol-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        # 循环线程未及时退出时同样释放租约，其他进程不必等待租约过期
+        if self.is_leader:
+            try:
+                self.release_lease()
+            except Exception:
+                logger.exception('释放主节点租约失败')
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler()
+        return _scheduler
+
+
+def _config_saved(sender, **kwargs):
+    get_scheduler().request_sync()
+
+
+def start_scheduler():
+    """注册内置任务并启动调度器（进程退出时停止并释放租约）"""
+    from django.db.models.signals import post_save
+
+    from . import jobs
+    from .models import ProtocolConfig
+
+    jobs.register_default_jobs()
+    scheduler = get_scheduler()
+    scheduler.on_become_leader(jobs.start_leader_only_tasks)
+    scheduler.on_lose_leader(jobs.stop_leader_only_tasks)
+    # 刷新间隔保存后尽快同步到 ScheduledJob（其他进程的修改由 SYNC_INTERVAL 周期检查）
+    post_save.connect(_config_saved, sender=ProtocolConfig, dispatch_uid='scheduler_sync_jobs')
+    scheduler.start()
+    atexit.register(scheduler.stop)
+    return scheduler
+
+
+# ==================== 管理接口 ====================
+
+def list_jobs():
+    """任务列表"""
+    from .models import ScheduledJob
+    return [{
+        'name': job.name,
+        'description': job.description,
+        'interval_seconds': job.interval_seconds,
+        'jitter_seconds': job.jitter_seconds,
+        'is_paused': job.is_paused,
+        'run_requested': job.run_requested,
+        'next_run_at': job.next_run_at,
+        'last_run_at': job.last_run_at,
+        'last_status': job.last_status,
+        'last_duration': job.last_duration,
+    } for job in ScheduledJob.objects.all()]
+
+
+def get_job_runs(name, limit=20):
+    """任务执行记录"""
+    from .models import JobRun
+    return [{
+        'status': run.status,
+        'trigger': run.trigger,
+        'message': run.message,
+        'owner': run.owner,
+        'started_at': run.started_at,
+        'duration': run.duration,
+    } for run in JobRun.objects.filter(job__name=name)[:limit]]
+
+
+def pause_job(name):
+    from .models import ScheduledJob
+    return ScheduledJob.objects.filter(name=name).update(is_paused=True, updated_at=timezone.now()) > 0
+
+
+def resume_job(name):
+    from .models import ScheduledJob
+    job = ScheduledJob.objects.filter(name=name).first()
+    if job is None:
+        return False
+    job.is_paused = False
+    job.next_run_at = compute_next_run(job)
+    job.save(update_fields=['is_paused', 'next_run_at', 'updated_at'])
+    return True
+
+
+def trigger_job(name):
+    """请求立即执行（由持有租约的进程在下一轮循环中执行）"""
+    from .models import ScheduledJob
+    return ScheduledJob.objects.filter(name=name).update(run_requested=True, updated_at=timezone.now()) > 0
@@ -0,0 +1,322 @@
+"""
+每日统计汇总
+
+日志写入时按 (日期, 用户, 连接, 来源, 类型) 增量累加到 DailyStat，
+仪表盘和图表从汇总表读取，查询成本与日志量无关。
+
+- 单条写入：post_save 信号触发 record()，一条 UPDATE ... SET total = total + 1
+- 批量写入（bulk_create 不触发信号）：调用 record_many()，同一键合并后再更新
+- 历史数据：migrate 之后自动回填还没有汇总行的来源（post_migrate，见 backfill_missing），
+  也可以手动执行 python manage.py backfill_daily_stats 重建
+
+查询::
+
+    from protocol_config.stats import get_today_summary, get_daily_series
+
+    get_today_summary('api_request', user_id=request.user.id)
+    get_daily_series('read_check', days=7, user_id=request.user.id)
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.apps import apps
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import Count, F, IntegerField, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class StatSource:
+    """一种日志到汇总维度的映射
+
+    user / connection / log_type 为 ORM 查找路径（None 表示没有该维度）；
+    计数模式下 success / failed 为 (字段, 取值)，求和模式下 sums 为 (总数, 成功, 失败) 字段。
+    """
+
+    def __init__(self, name, model, user=None, connection=None, log_type=None, success=None, failed=None,
+                 sums=None, duration=None, time_field='created_at'):
+        self.name = name
+        self.model_label = model
+        self.user = user
+        self.connection = connection
+        self.log_type = log_type
+        self.success = success
+        self.failed = failed
+        self.sums = sums
+        self.duration = duration
+        self.time_field = time_field
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    @staticmethod
+    def _resolve(instance, path):
+        value = instance
+        for part in path.split('__'):
+            value = getattr(value, part, None)
+            if value is None:
+                return None
+        return value
+
+    def _matches(self, instance, condition):
+        field, values = condition
+        return getattr(instance, field) in values
+
+    def key(self, instance):
+        """(日期, 用户, 连接, 类型)"""
+        created = getattr(instance, self.time_field) or timezone.now()
+        return (
+            timezone.localdate(created),
+            (self._resolve(instance, self.user) if self.user else None) or 0,
+            (self._resolve(instance, self.connection) if self.connection else None) or 0,
+            str(self._resolve(instance, self.log_type) or '') if self.log_type else '',
+        )
+
+    def measures(self, instance):
+        """(总数, 成功, 失败, 耗时)"""
+        duration = (getattr(instance, self.duration) or 0) if self.duration else 0
+        if self.sums:
+            return tuple(getattr(instance, field) or 0 for field in self.sums) + (duration,)
+        success = self._matches(instance, self.success)
+        failed = self._matches(instance, self.failed) if self.failed else not success
+        return 1, int(success), int(failed), duration
+
+    def _q(self, condition):
+        field, values = condition
+        return Q(**{f'{field}__in': values})
+
+    def aggregate(self, queryset):
+        """按汇总维度分组统计，用于回填"""
+        zero = Value(0, output_field=IntegerField())
+        group = {
+            'stat_day': TruncDate(self.time_field, tzinfo=timezone.get_current_timezone()),
+            'stat_user': Coalesce(F(self.user), zero) if self.user else zero,
+            'stat_connection': Coalesce(F(self.connection), zero) if self.connection else zero,
+            'stat_type': F(self.log_type) if self.log_type else Value(''),
+        }
+        if self.sums:
+            total, success, failed = self.sums
+            measures = {'stat_total': Sum(total), 'stat_success': Sum(success), 'stat_failed': Sum(failed)}
+        else:
+            measures = {
+                'stat_total': Count('pk'),
+                'stat_success': Count('pk', filter=self._q(self.success)),
+                'stat_failed': Count('pk', filter=self._q(self.failed) if self.failed else ~self._q(self.success)),
+            }
+        if self.duration:
+            measures['stat_duration'] = Sum(self.duration)
+        return queryset.order_by().values(**group).annotate(**measures)
+
+
+SOURCES = {source.name: source for source in [
+    StatSource('connection_log', 'connections.ConnectionLog', user='connection__user_id',
+               connection='connection_id', log_type='log_type', success=('success', (True,))),
+    StatSource('api_request', 'protocol_api.APIRequest', user='user_id', log_type='request_type',
+               success=('success', (True,))),
+    StatSource('refresh', 'protocol_config.RefreshLog', log_type='refresh_type',
+               sums=('connection_count', 'success_count', 'failed_count'), duration='duration'),
+    StatSource('auto_login', 'protocol_config.AutoLoginLog', log_type='login_type',
+               success=('result', ('success',)), failed=('result', ('failed', 'error')), duration='duration'),
+    StatSource('read_check', 'read_check.ReadCheckLog', user='config__user_id', success=('success', (True,))),
+    StatSource('wechat_login', 'wechat_login.LoginRecord', user='user_id', connection='connection_id',
+               log_type='login_type', success=('success', (True,))),
+]}
+
+
+def _apply(source_name, key, total, success, failed, duration):
+    from .models import DailyStat
+
+    day, user_id, connection_id, log_type = key
+    lookup = {'day': day, 'user_id': user_id, 'connection_id': connection_id,
+              'source': source_name, 'log_type': log_type}
+    changes = {'total': F('total') + total, 'success': F('success') + success,
+               'failed': F('failed') + failed, 'duration': F('duration') + duration,
+               'updated_at': timezone.now()}
+    if DailyStat.objects.filter(**lookup).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            DailyStat.objects.create(total=total, success=success, failed=failed, duration=duration, **lookup)
+    except IntegrityError:
+        # 并发创建了同一行
+        DailyStat.objects.filter(**lookup).update(**changes)
+
+
+def record(source_name, instance):
+    """累加一条日志"""
+    source = SOURCES[source_name]
+    _apply(source_name, source.key(instance), *source.measures(instance))
+
+
+def record_many(source_name, instances):
+    """累加一批日志（bulk_create 之后调用），同一键只更新一次"""
+    source = SOURCES[source_name]
+    totals = defaultdict(lambda: [0, 0, 0, 0.0])
+    for instance in instances:
+        row = totals[source.key(instance)]
+        for index, value in enumerate(source.measures(instance)):
+            row[index] += value
+    with transaction.atomic():
+        for key, values in totals.items():
+            _apply(source_name, key, *values)
+
+
+def _make_handler(source_name):
+    def handler(sender, instance, created, raw=False, **kwargs):
+        if not created or raw:
+            return
+        try:
+            with transaction.atomic():
+                record(source_name, instance)
+        except Exception:
+            # 统计失败不影响日志写入
+            logger.exception('更新每日统计失败: %s', source_name)
+    handler.__name__ = f'daily_stat_{source_name}'
+    return handler
+
+
+# 信号默认弱引用接收函数，保存闭包防止被回收
+_handlers = []
+
+
+def connect_signals():
+    for name, source in SOURCES.items():
+        handler = _make_handler(name)
+        _handlers.append(handler)
+        post_save.connect(handler, sender=source.model, dispatch_uid=f'daily_stat_{name}')
+
+
+def backfill(source_names=None, since=None):
+    """用原始日志重建汇总（覆盖范围内已有的汇总行），返回 {来源: 行数}"""
+    from .models import DailyStat
+
+    result = {}
+    for name in source_names or SOURCES:
+        source = SOURCES[name]
+        queryset = source.model._base_manager.all()
+        existing = DailyStat.objects.filter(source=name)
+        if since is not None:
+            queryset = queryset.filter(**{f'{source.time_field}__gte': since})
+            existing = existing.filter(day__gte=timezone.localdate(since))
+        rows = [
+            DailyStat(
+                day=row['stat_day'], user_id=row['stat_user'], connection_id=row['stat_connection'],
+                source=name, log_type=row['stat_type'] or '', total=row['stat_total'] or 0,
+                success=row['stat_success'] or 0, failed=row['stat_failed'] or 0,
+                duration=row.get('stat_duration') or 0,
+            )
+            for row in source.aggregate(queryset)
+        ]
+        with transaction.atomic():
+            existing.delete()
+            DailyStat.objects.bulk_create(rows, batch_size=1000)
+        result[name] = len(rows)
+    return result
+
+
+def backfill_missing():
+    """回填还没有任何汇总行、但已有原始日志的来源（升级后第一次 migrate 时执行），返回 {来源: 行数}
+
+    已有汇总行的来源不再处理，所以只会执行一次，之后由信号增量维护。
+    """
+    from .models import DailyStat
+
+    missing = []
+    for name, source in SOURCES.items():
+        try:
+            if not DailyStat.objects.filter(source=name).exists() and source.model._base_manager.exists():
+                missing.append(name)
+        except (LookupError, DatabaseError):
+            # 应用未安装或日志表尚未创建
+            logger.debug('跳过每日统计回填: %s', name, exc_info=True)
+    if not missing:
+        return {}
+    result = backfill(missing)
+    logger.info('已回填每日统计: %s', result)
+    return result
+
+
+def backfill_after_migrate(sender, using='default', **kwargs):
+    """post_migrate 信号处理：自动回填历史日志，仪表盘不必等手动执行 backfill_daily_stats"""
+    if using != 'default':
+        return
+    try:
+        backfill_missing()
+    except DatabaseError:
+        logger.exception('回填每日统计失败，可执行 python manage.py backfill_daily_stats 重试')
+
+
+# ==================== 查询 ====================
+
+def _summary(queryset):
+    data = queryset.aggregate(total=Sum('total'), success=Sum('success'), failed=Sum('failed'),
+                              duration=Sum('duration'))
+    data = {key: value or 0 for key, value in data.items()}
+    data['success_rate'] = round(data['success'] / data['total'] * 100, 2) if data['total'] else 0
+    return data
+
+
+def _filtered(source, user_id=None, connection_id=None, log_type=None):
+    from .models import DailyStat
+
+    queryset = DailyStat.objects.filter(source=source)
+    if user_id is not None:
+        queryset = queryset.filter(user_id=user_id)
+    if connection_id is not None:
+        queryset = queryset.filter(connection_id=connection_id)
+    if log_type is not None:
+        queryset = queryset.filter(log_type=log_type)
+    return queryset
+
+
+def get_today_summary(source, user_id=None, connection_id=None, log_type=None):
+    """今日汇总：total / success / failed / duration / success_rate"""
+    queryset = _filtered(source, user_id, connection_id, log_type).filter(day=timezone.localdate())
+    return _summary(queryset)
+
+
+def get_range_summary(source, days, user_id=None, connection_id=None, log_type=None):
+    """最近 N 天（含今天）汇总"""
+    since = timezone.localdate() - timedelta(days=days - 1)
+    return _summary(_filtered(source, user_id, connection_id, log_type).filter(day__gte=since))
+
+
+def get_daily_series(source, days=7, user_id=None, connection_id=None, log_type=None):
+    """最近 N 天每天的统计（没有数据的日期补 0），用于图表"""
+    today = timezone.localdate()
+    since = today - timedelta(days=days - 1)
+    rows = _filtered(source, user_id, connection_id, log_type).filter(day__gte=since) \
+        .values('day').annotate(total=Sum('total'), success=Sum('success'), failed=Sum('failed'),
+                                duration=Sum('duration')).order_by('day')
+    by_day = {row['day']: row for row in rows}
+
+    series = []
+    for offset in range(days):
+        day = since + timedelta(days=offset)
+        row = by_day.get(day, {})
+        total = row.get('total') or 0
+        success = row.get('success') or 0
+        series.append({
+            'date': day.isoformat(),
+            'total': total,
+            'success': success,
+            'failed': row.get('failed') or 0,
+            'duration': row.get('duration') or 0,
+            'success_rate': round(success / total * 100, 2) if total else 0,
+        })
+    return series
+
+
+def get_type_breakdown(source, days=1, user_id=None, connection_id=None):
+    """最近 N 天按类型汇总 {类型: {total, success, failed}}"""
+    since = timezone.localdate() - timedelta(days=days - 1)
+    rows = _filtered(source, user_id, connection_id).filter(day__gte=since) \
+        .values('log_type').annotate(total=Sum('total'), success=Sum('success'), failed=Sum('failed')) \
+        .order_by('log_type')
+    return {row['log_type']: {'total': row['total'], 'success': row['success'], 'failed': row['failed']}
+            for row in rows}
@@ -0,0 +1,85 @@
+"""
+统计接口（读取 DailyStat 汇总表）
+"""
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from . import stats
+from .dashboard import get_dashboard_counts
+from .job_views import admin_required
+
+
+def _params(request):
+    """解析通用参数，普通用户只能查看自己的数据"""
+    source = request.GET.get('source', 'api_request')
+    if source not in stats.SOURCES:
+        return None, JsonResponse({'code': 400, 'msg': f'不支持的统计来源: {source}'}, status=400)
+    try:
+        days = max(1, min(int(request.GET.get('days', 7)), 366))
+    except ValueError:
+        days = 7
+
+    user_id = request.user.id
+    if getattr(request.user, 'is_admin', False):
+        user_id = request.GET.get('user_id', '')
+        user_id = int(user_id) if user_id.isdigit() else None
+    connection_id = request.GET.get('connection_id') or None
+    return {
+        'source': source,
+        'days': days,
+        'user_id': user_id,
+        'connection_id': int(connection_id) if connection_id and connection_id.isdigit() else None,
+        'log_type': request.GET.get('log_type') or None,
+    }, None
+
+
+@login_required
+@require_GET
+def stats_today(request):
+    """今日汇总"""
+    params, error = _params(request)
+    if error:
+        return error
+    data = stats.get_today_summary(params['source'], params['user_id'], params['connection_id'], params['log_type'])
+    data['by_type'] = stats.get_type_breakdown(params['source'], 1, params['user_id'], params['connection_id'])
+    return JsonResponse({'code': 200, 'msg': 'success', 'data': data})
+
+
+@login_required
+@require_GET
+def stats_daily(request):
+    """最近 N 天每日统计（图表）"""
+    params, error = _params(request)
+    if error:
+        return error
+    series = stats.get_daily_series(params['source'], params['days'], params['user_id'],
+                                    params['connection_id'], params['log_type'])
+    return JsonResponse({'code': 200, 'msg': 'success', 'data': {
+        'dates': [row['date'] for row in series],
+        'series': series,
+        'summary': stats.get_range_summary(params['source'], params['days'], params['user_id'],
+                                           params['connection_id'], params['log_type']),
+    }})
+
+
+@login_required
+@require_GET
+def stats_dashboard(request):
+    """仪表盘计数（缓存）"""
+    all_users = getattr(request.user, 'is_admin', False) and request.GET.get('scope') == 'all'
+    return JsonResponse({'code': 200, 'msg': 'success', 'data': get_dashboard_counts(request.user, all_users)})
+
+
+@admin_required
+@require_GET
+def stats_caches(request):
+    """进程内缓存命中统计（阅读量缓存、odrea 接口缓存、统计缓存）"""
+    from protocol_api import odrea_cache, read_count_cache
+    from utils.stats_cache import stats_cache
+
+    return JsonResponse({'code': 200, 'msg': 'success', 'data': {
+        'read_count': read_count_cache.stats(),
+        'odrea': odrea_cache.stats(),
+        'stats': stats_cache.stats(),
+    }})
@@ -0,0 +1,94 @@
+"""
+内置后台任务（见 job_queue）
+
+- read_check          阅读量检测（会话在入队时创建，前端可立即订阅进度）
+- refresh_all         刷新全部授权码状态（同自动刷新，记录为手动刷新）
+- refresh_auth_codes  刷新指定授权码，按批执行并更新进度
+"""
+from .job_queue import register_task
+
+REFRESH_BATCH_SIZE = 50
+
+_registered = False
+
+
+def read_check_task(ctx):
+    """payload: session_id, url"""
+    from read_check.engine import run_read_check
+    from read_check.models import ReadCheckSession
+
+    session = ReadCheckSession.objects.select_related('user').get(pk=ctx.payload['session_id'])
+    if session.status != 'running':
+        return {'session_id': session.pk, 'skipped': '会话已结束'}
+    ctx.set_progress(5, '检测中')
+    session, result = run_read_check(
+        session.user, session.url, session=session,
+        on_progress=lambda done, total: ctx.set_progress(5 + done * 90 // max(total, 1), f'已检测 {done}/{total}'),
+    )
+    result['session_id'] = session.pk
+    return result
+
+
+def read_check_cancelled(job):
+    """取消后结束检测会话"""
+    from django.utils import timezone
+    from read_check.live import notify_done
+    from read_check.models import ReadCheckSession
+
+    session_id = job.payload.get('session_id')
+    if ReadCheckSession.objects.filter(pk=session_id, status='running').update(
+            status='failed', result='error', completed_at=timezone.now()):
+        notify_done(session_id)
+
+
+def refresh_all_task(ctx):
+    from .refresh_engine import run_refresh_pass
+
+    ctx.set_progress(5, '刷新中')
+    log = run_refresh_pass(
+        'manual',
+        on_progress=lambda done, total: ctx.set_progress(5 + done * 90 // max(total, 1), f'已刷新 {done}/{total}'),
+    )
+    return {
+        'refresh_log_id': log.pk,
+        'total': log.connection_count,
+        'success': log.success_count,
+        'failed': log.failed_count,
+        'duration': log.duration,
+    }
+
+
+def refresh_auth_codes_task(ctx):
+    """payload: auth_code_ids"""
+    from connections.models import AuthCode
+    from .refresh_engine import RefreshEngine
+
+    ids = ctx.payload.get('auth_code_ids') or []
+    queryset = AuthCode.objects.filter(pk__in=ids).select_related('connection')
+    if ctx.user_id is not None and not getattr(ctx.job.user, 'is_admin', False):
+        queryset = queryset.filter(connection__user_id=ctx.user_id)
+    auth_codes = list(queryset)
+
+    engine = RefreshEngine()
+    totals = {'total': 0, 'success': 0, 'failed': 0, 'errors': []}
+    for start in range(0, len(auth_codes), REFRESH_BATCH_SIZE):
+        ctx.set_progress(start * 100 // max(len(auth_codes), 1), f'已刷新 {start}/{len(auth_codes)}')
+        stats = engine.run(auth_codes[start:start + REFRESH_BATCH_SIZE])
+        for key in ('total', 'success', 'failed'):
+            totals[key] += stats[key]
+        totals['errors'].extend(stats['errors'])
+    totals['errors'] = totals['errors'][:50]
+    return totals
+
+
+def register_default_tasks():
+    global _registered
+    if _registered:
+        return
+    _registered = True
+    register_task('read_check', read_check_task, concurrency=2, timeout=900,
+                  description='阅读量检测', on_cancel=read_check_cancelled)
+    register_task('refresh_all', refresh_all_task, concurrency=1, max_attempts=2, retry_delay=60,
+                  description='刷新全部授权码状态')
+    register_task('refresh_auth_codes', refresh_auth_codes_task, concurrency=2, max_attempts=2,
+                  retry_delay=30, description='刷新指定授权码状态')
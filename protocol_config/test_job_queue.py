@@ -0,0 +1,153 @@
+import threading
+import unittest
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import job_queue
+from .models import BackgroundJob, JobTypeLock
+
+
+class QueueTestMixin:
+    def _patch_registry(self):
+        registry = {}
+        for patcher in (mock.patch.object(job_queue, '_registry', registry),
+                        mock.patch.object(job_queue, '_ensure_default_tasks')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.results = []
+
+    def _register(self, name, func=None, **options):
+        job_queue.register_task(name, func or (lambda ctx: self.results.append(ctx.payload)), **options)
+
+
+class ClaimTests(QueueTestMixin, TestCase):
+    def setUp(self):
+        self._patch_registry()
+        self._register('single', concurrency=1)
+        self._register('double', concurrency=2)
+
+    def test_respects_concurrency_per_type(self):
+        for _ in range(3):
+            job_queue.enqueue('single')
+            job_queue.enqueue('double')
+        worker = job_queue.Worker()
+        claimed = [worker.claim() for _ in range(4)]
+
+        self.assertEqual(sorted(job.job_type for job in claimed[:3]), ['double', 'double', 'single'])
+        self.assertIsNone(claimed[3])
+        self.assertEqual(BackgroundJob.objects.filter(status='running').count(), 3)
+
+    def test_running_count_is_read_under_type_lock(self):
+        job_queue.enqueue('single')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertIsNotNone(job_queue.Worker().claim())
+        sql = [query['sql'] for query in queries.captured_queries]
+        lock = next(i for i, q in enumerate(sql) if JobTypeLock._meta.db_table in q)
+        count = next(i for i, q in enumerate(sql) if 'COUNT(' in q.upper())
+        self.assertLess(lock, count)
+        self.assertTrue(JobTypeLock.objects.filter(pk='single').exists())
+
+    def test_delayed_jobs_are_not_claimed(self):
+        job_queue.enqueue('single', delay=60)
+        self.assertIsNone(job_queue.Worker().claim())
+
+    def test_worker_job_types_filter(self):
+        job_queue.enqueue('single')
+        self.assertIsNone(job_queue.Worker(job_types=['double']).claim())
+        self.assertEqual(job_queue.Worker(job_types=['single']).claim().job_type, 'single')
+
+
+class ExecuteTests(QueueTestMixin, TestCase):
+    def setUp(self):
+        self._patch_registry()
+
+    def _run(self, job_type, **enqueue_options):
+        job = job_queue.enqueue(job_type, payload={'n': 1}, **enqueue_options)
+        worker = job_queue.Worker()
+        worker.execute(worker.claim())
+        job.refresh_from_db()
+        return job
+
+    def test_success_records_result(self):
+        self._register('ok', lambda ctx: {'n': ctx.payload['n'] + 1})
+        job = self._run('ok')
+        self.assertEqual((job.status, job.result, job.progress), ('succeeded', {'n': 2}, 100))
+
+    def test_failure_is_retried_with_backoff_then_fails(self):
+        def failing(ctx):
+            raise RuntimeError('boom')
+
+        self._register('flaky', failing, max_attempts=2, retry_delay=30)
+        job = self._run('flaky')
+        self.assertEqual((job.status, job.worker), ('queued', ''))
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=20))
+
+        BackgroundJob.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        worker = job_queue.Worker()
+        worker.execute(worker.claim())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+        self.assertIn('RuntimeError: boom', job.error)
+
+    def test_cancel_queued_and_running(self):
+        cancelled = []
+        self._register('slow', lambda ctx: ctx.set_progress(50), on_cancel=cancelled.append)
+        queued = job_queue.enqueue('slow')
+        self.assertTrue(job_queue.cancel(queued.pk))
+        self.assertEqual(BackgroundJob.objects.get(pk=queued.pk).status, 'cancelled')
+
+        running = job_queue.enqueue('slow')
+        worker = job_queue.Worker()
+        claimed = worker.claim()
+        self.assertTrue(job_queue.cancel(running.pk))
+        worker.execute(claimed)
+        self.assertEqual(BackgroundJob.objects.get(pk=running.pk).status, 'cancelled')
+        self.assertEqual([job.pk for job in cancelled], [queued.pk, running.pk])
+
+    def test_stale_jobs_are_requeued_or_failed(self):
+        self._register('task', concurrency=2, max_attempts=2)
+        first = job_queue.enqueue('task')
+        second = job_queue.enqueue('task', max_attempts=1)
+        worker = job_queue.Worker()
+        worker.claim(), worker.claim()
+        BackgroundJob.objects.update(heartbeat_at=timezone.now() - timedelta(seconds=job_queue.STALE_AFTER + 1))
+
+        self.assertEqual(worker.recover_stale(), (1, 1))
+        self.assertEqual(BackgroundJob.objects.get(pk=first.pk).status, 'queued')
+        self.assertEqual(BackgroundJob.objects.get(pk=second.pk).status, 'failed')
+
+
+@unittest.skipUnless(connection.features.has_select_for_update_skip_locked, '需要支持 SKIP LOCKED 的数据库')
+class ConcurrentClaimTests(QueueTestMixin, TransactionTestCase):
+    """多个 worker 同时领取，同一类型执行数不超过并发上限"""
+
+    def setUp(self):
+        self._patch_registry()
+        self._register('single', concurrency=1)
+
+    def test_concurrent_claims_respect_limit(self):
+        for _ in range(5):
+            job_queue.enqueue('single')
+        barrier = threading.Barrier(6)
+        claimed = []
+
+        def claim():
+            try:
+                barrier.wait(5)
+                claimed.append(job_queue.Worker().claim())
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=claim) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+
+        self.assertEqual(len([job for job in claimed if job is not None]), 1)
+        self.assertEqual(BackgroundJob.objects.filter(status='running').count(), 1)
@@ -0,0 +1,144 @@
+import json
+import threading
+from datetime import timedelta
+from unittest import mock
+
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+from accounts.models import User
+from connections.models import AuthCode, Connection
+
+from . import job_queue, jobs, queue_views, refresh_engine
+from .models import BackgroundJob, ProtocolConfig, RefreshLog, SchedulerLease
+from .refresh_engine import REFRESH_LEASE_NAME, RefreshEngine, RefreshInProgress, run_refresh_pass
+from .scheduler import JobSkipped
+
+
+def _online(auth_code):
+    return {'success': True, 'is_online': True, 'nickname': f'n-{auth_code.code}', 'avatar_url': None, 'error': ''}
+
+
+class RefreshEngineTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('owner', password='x')
+        self.connections = [Connection.objects.create(user=user, name=f'c{index}', url=f'http://p{index}')
+                            for index in range(2)]
+        for connection in self.connections:
+            for index in range(3):
+                AuthCode.objects.create(connection=connection, code=f'{connection.name}-{index}')
+
+    def test_per_connection_limit(self):
+        lock = threading.Lock()
+        in_flight = {}
+        peak = {}
+
+        def query(auth_code):
+            with lock:
+                in_flight[auth_code.connection_id] = in_flight.get(auth_code.connection_id, 0) + 1
+                peak[auth_code.connection_id] = max(peak.get(auth_code.connection_id, 0),
+                                                    in_flight[auth_code.connection_id])
+            threading.Event().wait(0.02)
+            with lock:
+                in_flight[auth_code.connection_id] -= 1
+            return _online(auth_code)
+
+        engine = RefreshEngine(query_func=query, max_workers=6, per_connection_limit=1)
+        pairs = engine.fetch(list(AuthCode.objects.select_related('connection')))
+
+        self.assertEqual(len(pairs), 6)
+        self.assertEqual(set(peak.values()), {1})
+
+    def test_results_are_written_back(self):
+        def query(auth_code):
+            if auth_code.code.endswith('-0'):
+                raise ValueError('protocol down')
+            return _online(auth_code)
+
+        stats = RefreshEngine(query_func=query).run(list(AuthCode.objects.select_related('connection')))
+
+        self.assertEqual((stats['total'], stats['success'], stats['failed']), (6, 4, 2))
+        self.assertIn('c0-0: protocol down', stats['errors'])
+        self.assertEqual(AuthCode.objects.filter(is_online=True).count(), 4)
+        self.assertEqual(AuthCode.objects.get(code='c1-1').nickname, 'n-c1-1')
+
+
+class RefreshPassTests(TestCase):
+    def _engine(self):
+        return RefreshEngine(query_func=_online)
+
+    def test_pass_records_log_and_releases_lease(self):
+        log = run_refresh_pass('manual', engine=self._engine())
+        self.assertEqual(RefreshLog.objects.get().pk, log.pk)
+        self.assertFalse(refresh_engine.is_refresh_running())
+
+    def test_only_one_pass_at_a_time(self):
+        inner = []
+
+        def nested(done, total):
+            with self.assertRaises(RefreshInProgress):
+                run_refresh_pass('auto')
+            inner.append(refresh_engine.is_refresh_running())
+
+        user = User.objects.create_user('owner', password='x')
+        connection = Connection.objects.create(user=user, name='c', url='http://p', connection_type='wechatx')
+        AuthCode.objects.create(connection=connection, code='a')
+        run_refresh_pass('manual', engine=self._engine(), on_progress=nested)
+        self.assertEqual(inner, [True])
+        self.assertFalse(refresh_engine.is_refresh_running())
+
+    def test_expired_lease_is_taken_over(self):
+        SchedulerLease.objects.create(name=REFRESH_LEASE_NAME, owner='crashed',
+                                      expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertFalse(refresh_engine.is_refresh_running())
+        run_refresh_pass('auto', engine=self._engine())
+        self.assertEqual(RefreshLog.objects.count(), 1)
+
+    def test_auto_refresh_skips_while_pass_running(self):
+        config = ProtocolConfig.get_config()
+        config.auto_refresh_enabled = True
+        config.save()
+        SchedulerLease.objects.create(name=REFRESH_LEASE_NAME, owner='other',
+                                      expires_at=timezone.now() + timedelta(seconds=60))
+        with self.assertRaises(JobSkipped):
+            jobs.auto_refresh_job()
+        self.assertFalse(RefreshLog.objects.exists())
+
+
+class ManualRefreshTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', password='x', user_type='admin')
+        self.factory = RequestFactory()
+
+    def _post(self):
+        request = self.factory.post('/')
+        request.user = self.admin
+        response = queue_views.manual_refresh(request)
+        return response.status_code, json.loads(response.content)
+
+    def test_enqueues_refresh_all_without_running_it(self):
+        with mock.patch.object(refresh_engine, 'run_refresh_pass') as run:
+            status, body = self._post()
+        run.assert_not_called()
+        self.assertEqual(status, 202)
+        job = BackgroundJob.objects.get(pk=body['data']['job_id'])
+        self.assertEqual((job.job_type, job.status), ('refresh_all', 'queued'))
+
+        # 任务未结束时不再重复提交
+        self.assertEqual(self._post()[0], 400)
+        self.assertEqual(BackgroundJob.objects.count(), 1)
+
+    def test_refused_while_auto_refresh_is_running(self):
+        SchedulerLease.objects.create(name=REFRESH_LEASE_NAME, owner='scheduler',
+                                      expires_at=timezone.now() + timedelta(seconds=60))
+        self.assertEqual(self._post()[0], 400)
+        self.assertFalse(BackgroundJob.objects.exists())
+
+    def test_job_runs_the_pass(self):
+        job_queue.enqueue('refresh_all', user=self.admin)
+        with mock.patch.object(refresh_engine, 'RefreshEngine', return_value=RefreshEngine(query_func=_online)):
+            worker = job_queue.Worker(job_types=['refresh_all'])
+            worker.execute(worker.claim())
+        job = BackgroundJob.objects.get()
+        self.assertEqual(job.status, 'succeeded', job.error)
+        self.assertEqual(job.result['refresh_log_id'], RefreshLog.objects.get().pk)
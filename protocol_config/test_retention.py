@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import User
+from connections.models import Connection, ConnectionLog
+
+from . import retention
+from .models import BackgroundJob
+
+
+class PurgeExpiredLogsTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('owner', password='x')
+        connection = Connection.objects.create(user=user, name='c', url='http://p')
+        now = timezone.now()
+        # 新旧日志交错，主键范围内夹着未过期的行
+        self.ages = [20, 1, 30, 20, 2, 40, 15]
+        for index, age in enumerate(self.ages):
+            log = ConnectionLog.objects.create(connection=connection, log_type='connect', message=str(index),
+                                               success=True)
+            ConnectionLog.objects.filter(pk=log.pk).update(created_at=now - timedelta(days=age))
+        self.models = [(ConnectionLog, 'created_at'), (BackgroundJob, 'finished_at')]
+
+    def test_deletes_only_expired_rows_in_chunks(self):
+        results = retention.purge_expired_logs(14, chunk_size=2, pause=0, models=self.models)
+
+        self.assertEqual(results[0]['deleted'], 5)
+        self.assertEqual(sorted(ConnectionLog.objects.values_list('message', flat=True)), ['1', '4'])
+
+    def test_dry_run_counts_without_deleting(self):
+        results = retention.purge_expired_logs(14, dry_run=True, models=self.models)
+
+        self.assertEqual(results[0]['expired'], 5)
+        self.assertEqual(ConnectionLog.objects.count(), len(self.ages))
+
+    def test_max_chunks_bounds_one_run(self):
+        cutoff = timezone.now() - timedelta(days=14)
+        self.assertEqual(retention.purge_model(ConnectionLog, 'created_at', cutoff, chunk_size=2, pause=0,
+                                               max_chunks=1), 2)
+        self.assertEqual(ConnectionLog.objects.count(), len(self.ages) - 2)
+
+    def test_unfinished_jobs_are_kept(self):
+        old = timezone.now() - timedelta(days=30)
+        queued = BackgroundJob.objects.create(job_type='refresh_all')
+        BackgroundJob.objects.filter(pk=queued.pk).update(created_at=old)
+        BackgroundJob.objects.create(job_type='refresh_all', status='succeeded', finished_at=old)
+
+        retention.purge_expired_logs(14, pause=0, models=self.models)
+
+        self.assertEqual(list(BackgroundJob.objects.values_list('pk', flat=True)), [queued.pk])
+
+    def test_default_models_cover_every_log_table(self):
+        tables = {model._meta.db_table for model, _ in retention.get_retention_models()}
+        self.assertIn(ConnectionLog._meta.db_table, tables)
+        self.assertIn(BackgroundJob._meta.db_table, tables)
+        self.assertEqual(len(retention.purge_expired_logs(14, pause=0)), len(tables))
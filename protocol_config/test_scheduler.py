@@ -0,0 +1,156 @@
+import os
+import sys
+import types
+from datetime import timedelta
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from . import jobs, scheduler as scheduler_module
+from .apps import SERVER_PROCESS_ENV, _is_server_process
+from .models import ProtocolConfig, ScheduledJob, SchedulerLease
+from .scheduler import LEASE_NAME, Scheduler
+
+
+class LeaseHandoffTests(TestCase):
+    def setUp(self):
+        self.events = []
+        self.first = self._scheduler('first')
+        self.second = self._scheduler('second')
+
+    def _scheduler(self, name):
+        scheduler = Scheduler(lease_ttl=60)
+        scheduler.on_become_leader(lambda: self.events.append((name, 'leader')))
+        scheduler.on_lose_leader(lambda: self.events.append((name, 'lost')))
+        return scheduler
+
+    def _expire_lease(self):
+        SchedulerLease.objects.filter(name=LEASE_NAME).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+    def test_only_one_leader_while_lease_is_valid(self):
+        self.assertTrue(self.first.acquire_lease())
+        self.assertFalse(self.second.acquire_lease())
+        # 续约不会再次触发回调
+        self.assertTrue(self.first.acquire_lease())
+        self.assertEqual(self.events, [('first', 'leader')])
+        self.assertEqual(SchedulerLease.objects.get(name=LEASE_NAME).owner, self.first.owner)
+
+    def test_expired_lease_is_taken_over(self):
+        self.first.acquire_lease()
+        self._expire_lease()
+
+        self.assertTrue(self.second.acquire_lease())
+        self.assertFalse(self.first.acquire_lease())
+        self.assertEqual(self.events, [('first', 'leader'), ('second', 'leader'), ('first', 'lost')])
+        self.assertEqual(SchedulerLease.objects.get(name=LEASE_NAME).owner, self.second.owner)
+
+    def test_released_lease_is_taken_over_immediately(self):
+        self.first.acquire_lease()
+        self.first.release_lease()
+
+        self.assertFalse(self.first.is_leader)
+        self.assertTrue(self.second.acquire_lease())
+        self.assertEqual(self.events, [('first', 'leader'), ('first', 'lost'), ('second', 'leader')])
+
+    def test_regaining_leadership_runs_callbacks_again(self):
+        self.first.acquire_lease()
+        self._expire_lease()
+        self.second.acquire_lease()
+        self.first.acquire_lease()
+        self.second.release_lease()
+
+        self.assertTrue(self.first.acquire_lease())
+        self.assertEqual([event for event in self.events if event[0] == 'first'],
+                         [('first', 'leader'), ('first', 'lost'), ('first', 'leader')])
+
+    def test_stop_releases_lease(self):
+        self.first.acquire_lease()
+        self.first.stop()
+
+        self.assertFalse(self.first.is_leader)
+        self.assertEqual(SchedulerLease.objects.get(name=LEASE_NAME).owner, '')
+        self.assertEqual(self.events, [('first', 'leader'), ('first', 'lost')])
+        self.assertTrue(self.second.acquire_lease())
+
+
+class JobSyncTests(TestCase):
+    def setUp(self):
+        registry = {}
+        patcher = mock.patch.object(scheduler_module, '_registry', registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.interval = 60
+        scheduler_module.register_job('sample', lambda: None, lambda: self.interval)
+        self.scheduler = Scheduler()
+
+    def _tick(self):
+        with mock.patch.object(scheduler_module, 'sync_jobs', wraps=scheduler_module.sync_jobs) as sync:
+            self.scheduler.run_once()
+        return sync.call_count
+
+    def test_syncs_on_becoming_leader_then_only_periodically(self):
+        self.assertEqual(self._tick(), 1)
+        self.assertEqual(ScheduledJob.objects.get(name='sample').interval_seconds, 60)
+        self.assertEqual(self._tick(), 0)
+
+    def test_changed_interval_is_written_after_sync_request(self):
+        self._tick()
+        self.interval = 120
+        self.assertEqual(self._tick(), 0)
+        self.scheduler.request_sync()
+        self.assertEqual(self._tick(), 1)
+        self.assertEqual(ScheduledJob.objects.get(name='sample').interval_seconds, 120)
+
+    def test_unchanged_intervals_skip_the_database(self):
+        synced = scheduler_module.sync_jobs()
+        with self.assertNumQueries(0):
+            scheduler_module.sync_jobs(synced)
+
+
+class LeaderOnlyTaskTests(TestCase):
+    def setUp(self):
+        self.calls = []
+        views = types.ModuleType('protocol_config.views')
+        views.start_auto_login_task = lambda: self.calls.append('start')
+        views.stop_auto_login_task = lambda: self.calls.append('stop')
+        patcher = mock.patch.dict(sys.modules, {'protocol_config.views': views})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        flag = mock.patch.object(jobs, '_auto_login_started', False)
+        flag.start()
+        self.addCleanup(flag.stop)
+        config = ProtocolConfig.get_config()
+        config.auto_login_enabled = True
+        config.save()
+
+    def test_auto_login_starts_once_and_stops_on_lease_loss(self):
+        jobs.start_leader_only_tasks()
+        jobs.start_leader_only_tasks()
+        self.assertEqual(self.calls, ['start'])
+
+        jobs.stop_leader_only_tasks()
+        jobs.stop_leader_only_tasks()
+        jobs.start_leader_only_tasks()
+        self.assertEqual(self.calls, ['start', 'stop', 'start'])
+
+
+class ServerProcessTests(SimpleTestCase):
+    def _check(self, argv, **env):
+        with mock.patch.object(sys, 'argv', argv), mock.patch.dict(os.environ, env):
+            for name in ('RUN_MAIN', SERVER_PROCESS_ENV):
+                if name not in env:
+                    os.environ.pop(name, None)
+            return _is_server_process(), os.environ.get(SERVER_PROCESS_ENV)
+
+    def test_other_entry_points_do_not_start_background_tasks(self):
+        for argv in (['-c'], ['temp_admin.py'], ['pytest'], ['manage.py', 'migrate'], ['manage.py', 'shell']):
+            self.assertEqual(self._check(argv), (False, None), argv)
+
+    def test_server_flag_is_consumed(self):
+        self.assertEqual(self._check(['-c'], **{SERVER_PROCESS_ENV: '1'}), (True, None))
+
+    def test_runserver_starts_only_in_reloader_child(self):
+        self.assertEqual(self._check(['manage.py', 'runserver']), (False, None))
+        self.assertEqual(self._check(['manage.py', 'runserver'], RUN_MAIN='true'), (True, None))
+        self.assertEqual(self._check(['manage.py', 'runserver', '--noreload']), (True, None))
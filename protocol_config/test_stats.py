@@ -0,0 +1,41 @@
+import json
+
+from django.core.management.sql import emit_post_migrate_signal
+from django.test import RequestFactory, TestCase
+
+from accounts.models import User
+from read_check.models import ReadCheckConfig, ReadCheckLog
+
+from . import dashboard_views, stats
+from .models import DailyStat
+
+
+class DailyStatBackfillTests(TestCase):
+    """升级前已有的日志在 migrate 之后自动进入每日统计"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner', password='x')
+        config = ReadCheckConfig.objects.create(user=self.user, protocol_url='http://p', wxids=['w'])
+        for success in (True, True, False):
+            ReadCheckLog.objects.create(config=config, url='http://a', wxid='w', success=success)
+        # 模拟升级前的数据：日志已存在，汇总表为空
+        DailyStat.objects.all().delete()
+
+    def _migrate(self):
+        emit_post_migrate_signal(0, False, 'default')
+
+    def _chart_today(self):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        return json.loads(dashboard_views.chart_data(request).content)['data'][-1]
+
+    def test_post_migrate_backfills_existing_logs(self):
+        self.assertEqual(self._chart_today()['total'], 0)
+        self._migrate()
+        today = self._chart_today()
+        self.assertEqual((today['total'], today['success'], today['failed']), (3, 2, 1))
+
+    def test_backfill_runs_once_per_source(self):
+        self.assertEqual(stats.backfill_missing(), {'read_check': 1})
+        self.assertEqual(stats.backfill_missing(), {})
+        self.assertEqual(stats.get_today_summary('read_check', user_id=self.user.id)['total'], 3)
@@ -11,6 +11,8 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'protocol_core.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'protocol_core.runtime_settings')
+# 服务器进程：django.setup() 时启动定时任务和后台任务 worker（见 protocol_config.apps）
+os.environ.setdefault('PROTOCOL_SERVER_PROCESS', '1')
 
 application = get_asgi_application()
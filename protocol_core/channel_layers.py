@@ -0,0 +1,39 @@
+"""
+Channel layer 配置
+
+CHANNEL_LAYER 环境变量选择后端：
+- memory        进程内存（默认），只能单进程运行
+- redis         channels_redis.core.RedisChannelLayer，需要真实 Redis
+- redis-pubsub  channels_redis.pubsub.RedisPubSubChannelLayer，
+                只依赖 PUBLISH/SUBSCRIBE，可用 utils.redis_stub 本地替身
+"""
+
+BACKENDS = {
+    'memory': 'channels.layers.InMemoryChannelLayer',
+    'redis': 'channels_redis.core.RedisChannelLayer',
+    'redis-pubsub': 'channels_redis.pubsub.RedisPubSubChannelLayer',
+}
+
+DEFAULT_REDIS_URL = 'redis://127.0.0.1:6379/0'
+
+
+def build_channel_layers(backend='memory', redis_url=DEFAULT_REDIS_URL, capacity=1000, expiry=60):
+    """生成 CHANNEL_LAYERS 配置"""
+    backend = (backend or 'memory').lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"不支持的 CHANNEL_LAYER: {backend}，可选: {', '.join(BACKENDS)}")
+
+    if backend == 'memory':
+        config = {'capacity': capacity, 'expiry': expiry}
+    elif backend == 'redis':
+        config = {'hosts': [redis_url], 'capacity': capacity, 'expiry': expiry}
+    else:
+        config = {'hosts': [redis_url]}
+
+    return {'default': {'BACKEND': BACKENDS[backend], 'CONFIG': config}}
+
+
+def is_multiprocess_capable(channel_layers):
+    """当前 channel layer 是否支持跨进程分发"""
+    backend = channel_layers.get('default', {}).get('BACKEND', '')
+    return backend != BACKENDS['memory']
@@ -0,0 +1,39 @@
+"""
+运行时路由
+
+在 protocol_core.urls 之前挂载新增的接口，其余请求交给原有路由。
+由 runtime_settings 设置为 ROOT_URLCONF。
+"""
+from django.conf import settings
+from django.urls import include, path
+
+from connections import chat_views
+from protocol_api import odrea_views
+from protocol_config import dashboard_views
+from read_check import check_views, live
+from utils.stats_cache import cached_view
+
+urlpatterns = [
+    # 仪表盘页面、图表和统计接口读取 DailyStat 汇总与缓存的计数
+    path('api/v1/dashboard/stats/', dashboard_views.api_dashboard_stats, name='dashboard-stats'),
+    path('dashboard/', dashboard_views.dashboard_page, name='dashboard'),
+    path('dashboard/chart-data/', dashboard_views.chart_data, name='api_get_chart_data'),
+    # 系统信息接口加缓存（被多个标签页轮询）
+    path('api/v1/system/info/', cached_view('api.views.system_info', 'api_system_info', per_user=False, ttl=10,
+                                            csrf_exempt=True),
+         name='system-info'),
+    # odrea_system 的 get_code / get_openid / get_mobile 合并并发请求并按策略缓存
+    path('api/protocol/odrea_system/', odrea_views.odrea_system, name='odrea_system'),
+    path('api/v1/protocol/odrea-system/', odrea_views.api_odrea_system, name='odrea-system'),
+    # 阅读量检测改用并发引擎
+    path('dashboard/check/', check_views.check_read, name='check_read'),
+    path('dashboard/sessions/<int:session_id>/events/', live.session_events, name='read_check_session_events'),
+    # 聊天记录改为 keyset 分页，同步消息批量入库，全文搜索
+    path('dashboard/api/connections/<int:pk>/chat/history/', chat_views.api_chat_history, name='api_chat_history'),
+    path('dashboard/api/connections/<int:pk>/chat/messages/', chat_views.api_chat_messages, name='api_chat_messages'),
+    path('dashboard/api/connections/<int:pk>/chat/sync/', chat_views.api_chat_sync_messages,
+         name='api_chat_sync_messages'),
+    path('dashboard/api/connections/<int:pk>/chat/search/', chat_views.api_chat_search, name='api_chat_search'),
+    path('dashboard/protocol-config/', include('protocol_config.api_urls')),
+    path('', include(settings.BASE_ROOT_URLCONF)),
+]
@@ -0,0 +1,70 @@
+"""
+调优的 SQLite 后端
+
+在 django.db.backends.sqlite3 的基础上：
+
+- 每个新连接执行 PRAGMA（WAL、synchronous=NORMAL、mmap_size、cache_size、busy_timeout）
+- 事务使用 BEGIN IMMEDIATE，写事务在开始时就等待写锁（受 busy_timeout 控制），
+  避免读事务升级为写事务时直接报 "database is locked"
+
+配置（runtime_settings 自动设置）::
+
+    DATABASES = {'default': {
+        'ENGINE': 'protocol_core.sqlite_backend',
+        'NAME': BASE_DIR / 'protocol_core.db',
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {
+            'timeout': 30,
+            'pragmas': {'journal_mode': 'WAL', 'synchronous': 'NORMAL'},
+            'transaction_mode': 'IMMEDIATE',
+        },
+    }}
+"""
+from django.db.backends.sqlite3 import base
+
+# 默认 PRAGMA，OPTIONS['pragmas'] 中的同名项会覆盖
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 30000,        # 毫秒
+    'cache_size': -64000,         # 负数表示 KiB，即 64MB
+    'mmap_size': 268435456,       # 256MB
+    'temp_store': 'MEMORY',
+}
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+def apply_pragmas(connection, pragmas):
+    """在 sqlite3 连接上执行 PRAGMA"""
+    for name, value in pragmas.items():
+        if value is None:
+            continue
+        connection.execute(f'PRAGMA {name} = {value}')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        options = self.settings_dict['OPTIONS']
+        self.pragmas = {**DEFAULT_PRAGMAS, **options.get('pragmas', {})}
+        self.transaction_mode = str(options.get('transaction_mode', 'IMMEDIATE')).upper()
+        if self.transaction_mode not in TRANSACTION_MODES:
+            self.transaction_mode = 'DEFERRED'
+
+        kwargs = super().get_connection_params()
+        kwargs.pop('pragmas', None)
+        kwargs.pop('transaction_mode', None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        pragmas = dict(self.pragmas)
+        if self.is_in_memory_db():
+            # 内存数据库不支持 WAL
+            pragmas.pop('journal_mode', None)
+        apply_pragmas(conn, pragmas)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
@@ -0,0 +1,70 @@
+"""
+阅读量检测接口（并发引擎）
+
+替换 read_check.views.check_read，请求和响应格式保持不变，
+检测过程见 read_check.engine。
+
+请求中带 "async": true 时只创建会话并提交后台任务（protocol_config.job_queue），
+立即返回 job_id 和 session_id，进度通过 /dashboard/sessions/<id>/events/ 订阅。
+"""
+import json
+import logging
+
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from .engine import run_read_check
+from .models import ReadCheckSession
+
+logger = logging.getLogger(__name__)
+
+
+def _get_user(request):
+    """未登录的调用使用匿名账户（与原接口一致）"""
+    if request.user.is_authenticated:
+        return request.user
+    user, _ = get_user_model().objects.get_or_create(
+        username='anonymous',
+        defaults={'email': 'anonymous@example.com'},
+    )
+    return user
+
+
+@csrf_exempt
+@require_http_methods(['POST'])
+def check_read(request):
+    """检查阅读量变化"""
+    try:
+        data = json.loads(request.body)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        logger.warning('[check_read] 请求数据格式错误')
+        return JsonResponse({'success': False, 'error': '请求数据格式错误'}, status=400)
+
+    url = (data.get('url') or '').strip() if isinstance(data, dict) else ''
+    if not url:
+        logger.warning('[check_read] 缺少url参数')
+        return JsonResponse({'success': False, 'error': '缺少url参数'}, status=400)
+
+    if data.get('async'):
+        return _enqueue_check(request, url)
+
+    try:
+        session, result = run_read_check(_get_user(request), url)
+    except Exception as e:
+        logger.exception('检查失败: %s', url)
+        return JsonResponse({'success': False, 'error': f'检查失败: {e}'}, status=500)
+
+    result['session_id'] = session.id
+    return JsonResponse(result)
+
+
+def _enqueue_check(request, url):
+    from protocol_config.job_queue import enqueue
+
+    user = _get_user(request)
+    session = ReadCheckSession.objects.create(user=user, url=url, status='running')
+    job = enqueue('read_check', {'session_id': session.id, 'url': url}, user=user)
+    return JsonResponse({'success': True, 'queued': True, 'job_id': job.id, 'session_id': session.id},
+                        status=202)
@@ -0,0 +1,80 @@
+"""
+检测会话进度 WebSocket
+
+连接 ws/read-check/sessions/<id>/?last_id=<最后收到的日志 id>，
+先补发 last_id 之后的日志，之后收到检测引擎的通知时只发送新日志。
+消息格式见 read_check.live。
+"""
+import logging
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from . import live
+
+logger = logging.getLogger(__name__)
+
+
+class ReadCheckSessionConsumer(AsyncJsonWebsocketConsumer):
+
+    async def connect(self):
+        user = self.scope.get('user')
+        self.session_id = int(self.scope['url_route']['kwargs']['session_id'])
+        self.group = live.group_name(self.session_id)
+        self.last_id = 0
+        self.finished = False
+
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+        session = await database_sync_to_async(live.get_session_for_user)(user, self.session_id)
+        if session is None:
+            await self.close(code=4404)
+            return
+
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        try:
+            self.last_id = max(int(query.get('last_id', ['0'])[0]), 0)
+        except ValueError:
+            self.last_id = 0
+
+        # 先加入组再补发，补发期间写入的日志会在之后的通知中读到
+        await self.channel_layer.group_add(self.group, self.channel_name)
+        await self.accept()
+        await self.send_new_logs()
+        if session.status != 'running':
+            await self.send_done()
+
+    async def disconnect(self, close_code):
+        if getattr(self, 'group', None):
+            await self.channel_layer.group_discard(self.group, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        if content.get('type') == 'ping':
+            await self.send_json({'type': 'pong'})
+
+    async def send_new_logs(self):
+        while True:
+            logs = await database_sync_to_async(live.get_logs_after)(self.session_id, self.last_id)
+            for log in logs:
+                self.last_id = log.id
+                await self.send_json({'type': 'log', 'log': live.serialize_log(log)})
+            if len(logs) < live.BATCH_SIZE:
+                return
+
+    async def send_done(self):
+        if self.finished:
+            return
+        self.finished = True
+        session = await database_sync_to_async(live.get_session_for_user)(self.scope['user'], self.session_id)
+        await self.send_json({'type': 'done', 'session': live.serialize_session(session) if session else None})
+
+    # ---- 组消息 ----
+
+    async def read_check_logs(self, event):
+        await self.send_new_logs()
+
+    async def read_check_done(self, event):
+        await self.send_new_logs()
+        await self.send_done()
@@ -0,0 +1,430 @@
+"""
+阅读量检测并发引擎
+
+原来的检测逐个账号请求 GetAppMsgExt，账号多时一次检测要几分钟。这里改为：
+
+- 全局最多 max_workers 个工作线程，同一协议地址最多 per_url_limit 个
+- 每个账号有独立的超时（排队等待不计入）
+- 与原来一样，每个账号先读一次、再读一次（同一账号的前后两次读数），第二次大于
+  第一次即说明该账号的阅读被计入；任一账号发现变化后立即结束检测，
+  未开始的账号不再请求
+- 同一篇文章的前后两次读数逐个账号进行（按文章加锁，同一进程内的其他检测会话
+  同样等待）：两次读数之间如果有其他账号的读取，阅读量的增加无法确定是谁带来的。
+  不同文章的检测之间仍然并发
+- 工作线程只做网络请求，流程日志先放在内存里，每 flush_interval 秒由主线程批量写入
+  并通知实时进度订阅方（read_check.live）；结束后在一个事务中写入剩余日志、
+  检测日志并更新会话、配置的统计
+
+每个账号都直接请求上游，不经 protocol_api.read_count_cache：检测的目的就是让
+每个账号真实阅读一次，按文章合并请求会让其他账号的阅读不发生。
+
+用法::
+
+    from read_check.engine import run_read_check
+
+    session, result = run_read_check(request.user, url)
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from config import PROTOCOL_CONFIG
+from utils.protocol_client import get_client
+
+from . import live
+
+logger = logging.getLogger(__name__)
+
+# 全局并发上限
+DEFAULT_MAX_WORKERS = PROTOCOL_CONFIG.get('READ_CHECK_MAX_WORKERS', 16)
+# 单个协议地址的并发上限
+DEFAULT_PER_URL_LIMIT = PROTOCOL_CONFIG.get('READ_CHECK_PER_URL_LIMIT', 4)
+# 单个账号的超时（秒）
+DEFAULT_ACCOUNT_TIMEOUT = PROTOCOL_CONFIG.get('READ_CHECK_ACCOUNT_TIMEOUT', 15)
+# 检测过程中流程日志的写入间隔（秒）
+DEFAULT_FLUSH_INTERVAL = PROTOCOL_CONFIG.get('READ_CHECK_LOG_FLUSH_INTERVAL', 0.5)
+
+# 按文章加锁（分段锁，不同文章偶尔共用一把锁只会多等待，不影响结果）
+_ARTICLE_LOCKS = [threading.Lock() for _ in range(64)]
+
+APP_MSG_EXT_PATH = '/api/OfficialAccounts/GetAppMsgExt'
+REQUEST_HEADERS = {
+    'Content-Type': 'application/json',
+    'User-Agent': ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                   '(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'),
+}
+
+
+def article_lock(url):
+    """同一篇文章的前后读数需要独占的锁"""
+    return _ARTICLE_LOCKS[hash(url) % len(_ARTICLE_LOCKS)]
+
+
+def fetch_read_count(protocol_url, wxid, url, timeout=DEFAULT_ACCOUNT_TIMEOUT):
+    """通过协议获取文章阅读量，返回 read_num（可能为 None），请求失败抛出异常"""
+    response = get_client(protocol_url).post(
+        APP_MSG_EXT_PATH,
+        headers=REQUEST_HEADERS,
+        json={'Wxid': wxid, 'Url': url},
+        timeout=timeout,
+    )
+    if response.status_code != 200:
+        raise requests.exceptions.HTTPError(f'HTTP {response.status_code}')
+    data = response.json().get('Data') or {}
+    return (data.get('appmsgstat') or {}).get('read_num')
+
+
+class Account:
+    """一个待检测账号"""
+
+    def __init__(self, config, wxid):
+        self.config = config
+        self.wxid = wxid
+        self.protocol_url = config.protocol_url
+        self.read_count = None
+        self.read_count_after = None
+        self.error = ''
+        # 检测结束前已完成（提前结束时未请求或仍在途的账号不计入统计）
+        self.finished = False
+
+    @property
+    def success(self):
+        return not self.error and self.read_count_after is not None
+
+    @property
+    def increased(self):
+        return self.success and self.read_count is not None and self.read_count_after > self.read_count
+
+
+class ReadCheckEngine:
+    """有界并发的阅读量检测
+
+    run() 返回 result dict（与 check_read 接口的响应一致），
+    流程日志、检测日志和统计在 save() 中一次写入。
+
+    on_progress(done, total) 在每次写入流程日志后调用，抛出异常时结束检测并向上抛出
+    （后台任务借此响应取消和超时）。
+    """
+
+    def __init__(self, session, url, fetch_func=None, max_workers=None, per_url_limit=None,
+                 account_timeout=None, flush_interval=None, on_progress=None):
+        self.session = session
+        self.url = url
+        self.fetch_func = fetch_func or fetch_read_count
+        self.max_workers = max_workers or DEFAULT_MAX_WORKERS
+        self.per_url_limit = per_url_limit or DEFAULT_PER_URL_LIMIT
+        self.account_timeout = account_timeout or DEFAULT_ACCOUNT_TIMEOUT
+        self.flush_interval = flush_interval or DEFAULT_FLUSH_INTERVAL
+        self.on_progress = on_progress
+        # on_progress 抛出异常而中止
+        self.aborted = False
+
+        self.accounts = []
+        self.process_logs = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._semaphores = {}
+        self._article_lock = article_lock(url)
+        self.increase = None       # (from, to, account)
+
+    # ---- 日志 ----
+
+    def log(self, log_type, message, account=None, read_count=None, previous_read_count=None):
+        from .models import ReadCheckProcessLog
+
+        entry = ReadCheckProcessLog(
+            session=self.session,
+            log_type=log_type,
+            message=message,
+            wxid=account.wxid if account else '',
+            protocol_url=account.protocol_url if account else '',
+            read_count=read_count,
+            previous_read_count=previous_read_count,
+            created_at=timezone.now(),
+        )
+        with self._lock:
+            self.process_logs.append(entry)
+
+    def _worker_log(self, *args, **kwargs):
+        """工作线程的流程日志，检测结束后迟到的不再记录"""
+        if not self._stop.is_set():
+            self.log(*args, **kwargs)
+
+    def _take_logs(self):
+        with self._lock:
+            pending, self.process_logs = self.process_logs, []
+        return pending
+
+    def flush_logs(self):
+        """写入已产生的流程日志（主线程调用）"""
+        from .models import ReadCheckProcessLog
+
+        pending = self._take_logs()
+        if pending:
+            ReadCheckProcessLog.objects.bulk_create(pending, batch_size=500)
+            live.notify_logs(self.session.pk)
+
+    # ---- 检测 ----
+
+    def _acquire(self, lock):
+        """等待协议地址的并发名额或文章锁，检测提前结束时返回 False"""
+        while not self._stop.is_set():
+            if lock.acquire(timeout=0.2):
+                return True
+        return False
+
+    def _read(self, account):
+        """用该账号查询一次阅读量"""
+        return self.fetch_func(account.protocol_url, account.wxid, self.url, timeout=self.account_timeout)
+
+    def _read_pair(self, account):
+        """同一账号前后读两次，结果写入 account（只在工作线程中调用）"""
+        try:
+            account.read_count = self._read(account)
+        except requests.exceptions.Timeout:
+            account.error = f'超时（{self.account_timeout}秒）'
+            self._worker_log('error', f'❌ 账号: {account.wxid} 第一次请求异常: {account.error}', account)
+            return
+        except Exception as e:
+            account.error = str(e)
+            self._worker_log('error', f'❌ 账号: {account.wxid} 第一次请求异常: {account.error}', account)
+            return
+        if account.read_count is None:
+            account.error = '第一次阅读量为None'
+            self._worker_log('warning', f'⚠️ 账号: {account.wxid} 第一次阅读量为None，跳过该账号', account)
+            return
+        self._worker_log('first_read', f'📊 账号: {account.wxid} 第一次阅读量: {account.read_count}',
+                 account, read_count=account.read_count)
+
+        if self._stop.is_set():
+            return
+        try:
+            account.read_count_after = self._read(account)
+        except requests.exceptions.Timeout:
+            account.error = f'第二次请求超时（{self.account_timeout}秒）'
+        except Exception as e:
+            account.error = f'第二次请求异常: {e}'
+        else:
+            if account.read_count_after is None:
+                account.error = '第二次阅读量为None'
+        if account.error:
+            self._worker_log('error', f'❌ 账号: {account.wxid} {account.error}', account)
+            return
+        self._worker_log('second_read', f'📊 账号: {account.wxid} 第二次阅读量: {account.read_count_after}', account,
+                 read_count=account.read_count_after, previous_read_count=account.read_count)
+
+    def _finish(self, account):
+        """检测结束前完成的账号计入结果，返回是否是第一个发现变化的账号"""
+        with self._lock:
+            if self._stop.is_set():
+                # 检测已结束，迟到的结果不计入
+                return False
+            account.finished = True
+            if self.increase is None and account.increased:
+                self.increase = (account.read_count, account.read_count_after, account)
+                return True
+        return False
+
+    def _check_one(self, account):
+        semaphore = self._semaphores[account.protocol_url]
+        if not self._acquire(semaphore):
+            return account
+        try:
+            # 前后两次读数期间不能有其他账号读取同一篇文章，否则增加的阅读量无法归属
+            if not self._acquire(self._article_lock):
+                return account
+            try:
+                if self._stop.is_set():
+                    return account
+                self.log('account', f'👤 检测账号: {account.wxid}', account)
+                self._read_pair(account)
+                # 在释放文章锁之前结算，发现变化时其余账号不会再开始读取
+                if self._finish(account):
+                    start, end, _ = self.increase
+                    self.log('read_change', f'🎉 账号: {account.wxid} 阅读量变化: {start} → {end}',
+                             account, read_count=end, previous_read_count=start)
+                    # 日志记录后再结束，保证主线程写入时包含这条日志
+                    self._stop.set()
+            finally:
+                self._article_lock.release()
+        finally:
+            semaphore.release()
+        return account
+
+    def _ordered(self, accounts):
+        """按协议地址交错排列，避免前面的任务全部堆在同一个协议服务器上"""
+        by_url = defaultdict(list)
+        for account in accounts:
+            by_url[account.protocol_url].append(account)
+        ordered = []
+        queues = list(by_url.values())
+        while queues:
+            for queue in list(queues):
+                ordered.append(queue.pop(0))
+                if not queue:
+                    queues.remove(queue)
+        return ordered
+
+    def run(self, configs):
+        self.log('start', '🚀 开始阅读量检测')
+        if not configs:
+            self.log('error', '❌ 检测失败: 没有找到活跃的阅读过检配置')
+            return {'success': False, 'error': '没有找到活跃的阅读过检配置'}
+        self.log('target_url', f'🔗 目标文章: {self.url}')
+        for config in configs:
+            self.log('protocol', f'📡 使用协议: {config.protocol_url}')
+            self.accounts.extend(Account(config, wxid) for wxid in (config.wxids or []))
+
+        if self.accounts:
+            for account in self.accounts:
+                if account.protocol_url not in self._semaphores:
+                    self._semaphores[account.protocol_url] = threading.BoundedSemaphore(self.per_url_limit)
+            ordered = self._ordered(self.accounts)
+            executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(ordered)),
+                                          thread_name_prefix='read-check')
+            futures = [executor.submit(self._check_one, account) for account in ordered]
+            try:
+                self.flush_logs()
+                pending = set(futures)
+                while pending and not self._stop.is_set():
+                    done, pending = wait(pending, timeout=self.flush_interval, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                    self.flush_logs()
+                    self._report_progress(len(futures) - len(pending), len(futures))
+            except Exception:
+                self._stop.set()
+                raise
+            finally:
+                # 提前结束时不等待仍在途的请求（工作线程不访问数据库，结果也不再计入）
+                executor.shutdown(wait=not self._stop.is_set(), cancel_futures=True)
+        return self._result()
+
+    def _report_progress(self, done, total):
+        if self.on_progress is None:
+            return
+        try:
+            self.on_progress(done, total)
+        except Exception:
+            self.aborted = True
+            raise
+
+    def _finished(self):
+        with self._lock:
+            return [account for account in self.accounts if account.finished]
+
+    def _result(self):
+        if self.increase is not None:
+            start, end, account = self.increase
+            self.log('complete', '✅ 检测完成，发现阅读量变化', account)
+            return {'success': True, 'increased': True, 'wxid': account.wxid,
+                    'wxapi_url': account.protocol_url, 'from': start, 'to': end}
+
+        successful = [account for account in self._finished() if account.success]
+        if not successful:
+            message = '没有可用的检测账号' if not self.accounts else '所有账号检测失败'
+            self.log('error', f'❌ 检测失败: {message}')
+            last = self.accounts[-1] if self.accounts else None
+            return {'success': False, 'error': message, 'wxid': last.wxid if last else None}
+
+        account = max(successful, key=lambda a: a.read_count_after)
+        self.log('complete', '✅ 检测完成，未发现阅读量变化', account)
+        return {'success': True, 'increased': False, 'wxid': account.wxid, 'wxapi_url': account.protocol_url,
+                'from': account.read_count, 'to': account.read_count_after}
+
+    # ---- 写入 ----
+
+    def save(self, result):
+        """一个事务内写入流程日志、检测日志并更新会话和配置统计"""
+        from protocol_config.stats import record_many
+        from .models import ReadCheckConfig, ReadCheckLog, ReadCheckProcessLog
+
+        # 只计入检测结束前完成的账号；提前结束后仍在途的线程可能还在修改其余账号
+        checked = self._finished()
+        check_logs = [
+            ReadCheckLog(
+                config=account.config,
+                url=self.url,
+                wxid=account.wxid,
+                read_count_before=account.read_count,
+                read_count_after=account.read_count_after,
+                increased=account.increased,
+                success=account.success,
+                error_message=account.error,
+            )
+            for account in checked
+        ]
+
+        counters = defaultdict(lambda: [0, 0])
+        for account in checked:
+            counters[account.config.pk][0 if account.success else 1] += 1
+
+        session = self.session
+        session.status = 'completed' if result.get('success') else 'failed'
+        session.result = ('increased' if result.get('increased')
+                          else 'no_change' if result.get('success') else 'error')
+        session.total_accounts = len(self.accounts)
+        session.successful_accounts = sum(1 for account in checked if account.success)
+        session.failed_accounts = sum(1 for account in checked if not account.success)
+        if result.get('success'):
+            session.initial_read_count = result['from']
+            session.final_read_count = result['to']
+            session.increased_count = result['to'] - result['from']
+        session.completed_at = timezone.now()
+
+        process_logs = self._take_logs()
+
+        with transaction.atomic():
+            ReadCheckProcessLog.objects.bulk_create(process_logs, batch_size=500)
+            ReadCheckLog.objects.bulk_create(check_logs, batch_size=500)
+            # bulk_create 不触发 post_save，同一事务内更新每日统计
+            record_many('read_check', check_logs)
+            for config_id, (success, failed) in counters.items():
+                ReadCheckConfig.objects.filter(pk=config_id).update(
+                    total_checks=F('total_checks') + success + failed,
+                    success_checks=F('success_checks') + success,
+                    failed_checks=F('failed_checks') + failed,
+                )
+            session.save(update_fields=[
+                'status', 'result', 'total_accounts', 'successful_accounts', 'failed_accounts',
+                'initial_read_count', 'final_read_count', 'increased_count', 'completed_at',
+            ])
+            transaction.on_commit(lambda: live.notify_done(session.pk))
+
+
+def run_read_check(user, url, session=None, engine_class=ReadCheckEngine, **engine_kwargs):
+    """执行一次阅读量检测，返回 (session, result)
+
+    session 为已创建的会话（后台任务入队时创建），为空时新建。
+    检测被 on_progress 中止时照常写入已完成的结果（会话标记失败），再抛出原异常。
+    """
+    from .models import ReadCheckConfig, ReadCheckSession
+
+    if session is None:
+        session = ReadCheckSession.objects.create(user=user, url=url, status='running')
+    configs = list(ReadCheckConfig.objects.filter(user=user, is_active=True))
+    engine = engine_class(session, url, **engine_kwargs)
+
+    started = time.monotonic()
+    try:
+        result = engine.run(configs)
+    except Exception as e:
+        if engine.aborted:
+            logger.warning('阅读量检测已中止: %s（%s）', url, e)
+            engine.log('error', f'❌ 检测已中止: {e}')
+            engine.save({'success': False, 'error': f'检测已中止: {e}'})
+            raise
+        logger.exception('阅读量检测失败: %s', url)
+        engine.log('error', f'❌ 检测失败: {e}')
+        result = {'success': False, 'error': f'检查失败: {e}'}
+    engine.save(result)
+    logger.info('阅读量检测完成: %s 账号 %d 个，耗时 %.2fs，结果 %s',
+                url, len(engine.accounts), time.monotonic() - started, session.result)
+    return session, result
@@ -0,0 +1,238 @@
+"""
+检测会话实时进度
+
+检测引擎每批写入流程日志后向会话组发一条通知，订阅方只读取上次之后的新日志，
+每条日志只传输一次（原来的详情接口每次轮询都返回全部日志）。
+
+两种订阅方式：
+
+- SSE：GET /dashboard/sessions/<id>/events/，断线重连时浏览器带上 Last-Event-ID，
+  从该日志之后继续（也可用 ?last_id=）。按日志 id 增量查询，不依赖 channel layer；
+  ASGI 下用异步生成器，WSGI / runserver 下用同步生成器并缩短单个连接的时长
+- WebSocket：ws/read-check/sessions/<id>/?last_id=，见 read_check.consumers
+
+事件格式（SSE 的 data / WebSocket 的 JSON）::
+
+    {"type": "log", "log": {...}}            # 一条流程日志，id 即 SSE 的事件 id
+    {"type": "done", "session": {...}}       # 检测结束
+"""
+import asyncio
+import json
+import logging
+import time
+
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from django.contrib.auth.decorators import login_required
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+logger = logging.getLogger(__name__)
+
+# SSE 查询新日志的间隔（秒）
+POLL_INTERVAL = 0.5
+# 没有新日志时发送心跳的间隔（秒），防止代理断开空闲连接
+HEARTBEAT_INTERVAL = 15
+# 单个 SSE 连接最长保持时间（秒），到期后浏览器自动重连并续传
+MAX_STREAM_SECONDS = 600
+# WSGI 下每个连接占用一个 worker 线程，保持时间短一些（秒）
+WSGI_MAX_STREAM_SECONDS = 30
+# 每次最多读取的日志条数
+BATCH_SIZE = 200
+
+
+def group_name(session_id):
+    """会话进度组名"""
+    return f'read_check_session_{session_id}'
+
+
+def serialize_log(log):
+    """推送给前端的流程日志格式（与会话详情接口一致）"""
+    return {
+        'id': log.id,
+        'log_type': log.log_type,
+        'log_type_display': log.get_log_type_display(),
+        'message': log.message,
+        'wxid': log.wxid,
+        'protocol_url': log.protocol_url,
+        'read_count': log.read_count,
+        'previous_read_count': log.previous_read_count,
+        'formatted_time': log.formatted_time,
+        'icon': log.icon,
+    }
+
+
+def serialize_session(session):
+    return {
+        'id': session.id,
+        'status': session.status,
+        'status_display': session.get_status_display(),
+        'result': session.result,
+        'result_display': session.get_result_display() if session.result else None,
+        'total_accounts': session.total_accounts,
+        'successful_accounts': session.successful_accounts,
+        'failed_accounts': session.failed_accounts,
+        'initial_read_count': session.initial_read_count,
+        'final_read_count': session.final_read_count,
+        'increased_count': session.increased_count,
+        'duration_seconds': session.duration_seconds,
+    }
+
+
+def get_session_for_user(user, session_id):
+    """当前用户可查看的会话，管理员可查看全部"""
+    from .models import ReadCheckSession
+
+    queryset = ReadCheckSession.objects.all()
+    if not getattr(user, 'is_admin', False):
+        queryset = queryset.filter(user_id=user.id)
+    return queryset.filter(pk=session_id).first()
+
+
+def get_logs_after(session_id, last_id=0, limit=BATCH_SIZE):
+    """last_id 之后的流程日志"""
+    from .models import ReadCheckProcessLog
+
+    return list(ReadCheckProcessLog.objects.filter(session_id=session_id, id__gt=last_id).order_by('id')[:limit])
+
+
+def get_status(session_id):
+    from .models import ReadCheckSession
+
+    return ReadCheckSession.objects.filter(pk=session_id).values_list('status', flat=True).first()
+
+
+# ==================== 推送 ====================
+
+def _group_send(session_id, message):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(group_name(session_id), message)
+    except Exception:
+        # 推送失败不影响检测，订阅方仍可按 id 增量读取
+        logger.debug('推送检测进度失败: %s', session_id, exc_info=True)
+
+
+def notify_logs(session_id):
+    """新日志已写入"""
+    _group_send(session_id, {'type': 'read_check.logs'})
+
+
+def notify_done(session_id):
+    """检测结束（会话统计已保存）"""
+    _group_send(session_id, {'type': 'read_check.done'})
+
+
+# ==================== SSE ====================
+
+def _sse(data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'data: {json.dumps(data, ensure_ascii=False)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def _poll(session_id, last_id):
+    """(新日志, 会话)，会话只在检测结束时返回"""
+    from .models import ReadCheckSession
+
+    logs = [serialize_log(log) for log in get_logs_after(session_id, last_id)]
+    session = None
+    if not logs:
+        session = ReadCheckSession.objects.filter(pk=session_id).exclude(status='running').first()
+        session = serialize_session(session) if session else None
+    return logs, session
+
+
+class _StreamState:
+    """一个 SSE 连接的发送进度（ASGI 与 WSGI 两种事件流共用）"""
+
+    def __init__(self, last_id, now):
+        self.last_id = last_id
+        self.last_sent = now
+
+    def events(self, logs, session, now):
+        """一次查询结果对应的事件，返回 (事件文本列表, 是否结束, 是否立即继续查询)"""
+        chunks = []
+        for log in logs:
+            self.last_id = log['id']
+            chunks.append(_sse({'type': 'log', 'log': log}, event_id=self.last_id))
+        if session is not None:
+            chunks.append(_sse({'type': 'done', 'session': session}, event_id=self.last_id))
+            return chunks, True, False
+        if logs:
+            self.last_sent = now
+            return chunks, False, len(logs) >= BATCH_SIZE
+        if now - self.last_sent >= HEARTBEAT_INTERVAL:
+            self.last_sent = now
+            chunks.append(': ping\n\n')
+        return chunks, False, False
+
+
+async def event_stream(session_id, last_id=0):
+    """SSE 事件流（ASGI）：新日志逐条发送，检测结束后发送 done 并关闭"""
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    state = _StreamState(last_id, started)
+    # 告诉浏览器断线后 3 秒重连
+    yield 'retry: 3000\n\n'
+    while loop.time() - started < MAX_STREAM_SECONDS:
+        logs, session = await sync_to_async(_poll)(session_id, state.last_id)
+        chunks, done, again = state.events(logs, session, loop.time())
+        for chunk in chunks:
+            yield chunk
+        if done:
+            return
+        if not again:
+            await asyncio.sleep(POLL_INTERVAL)
+
+
+def sync_event_stream(session_id, last_id=0, max_seconds=WSGI_MAX_STREAM_SECONDS):
+    """SSE 事件流（WSGI / runserver）
+
+    WSGI 下异步生成器会被整个读完再返回（事件全部积压到连接结束），而同步生成器
+    每次查询都占着一个 worker 线程，所以连接只保持 max_seconds，到期后浏览器按
+    Last-Event-ID 重连续传。
+    """
+    started = time.monotonic()
+    state = _StreamState(last_id, started)
+    yield 'retry: 3000\n\n'
+    while time.monotonic() - started < max_seconds:
+        logs, session = _poll(session_id, state.last_id)
+        chunks, done, again = state.events(logs, session, time.monotonic())
+        yield from chunks
+        if done:
+            return
+        if not again:
+            time.sleep(POLL_INTERVAL)
+
+
+def _last_event_id(request):
+    value = request.headers.get('Last-Event-ID') or request.GET.get('last_id') or '0'
+    try:
+        return max(int(value), 0)
+    except ValueError:
+        return 0
+
+
+@login_required
+@require_GET
+def session_events(request, session_id):
+    """检测会话进度（Server-Sent Events）"""
+    if get_session_for_user(request.user, session_id) is None:
+        raise Http404('检测会话不存在')
+
+    last_id = _last_event_id(request)
+    if isinstance(request, ASGIRequest):
+        stream = event_stream(session_id, last_id)
+    else:
+        stream = sync_event_stream(session_id, last_id)
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # 关闭 nginx 缓冲，事件立即送达
+    response['X-Accel-Buffering'] = 'no'
+    return response
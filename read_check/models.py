@@ -2,6 +2,7 @@
 阅读过检配置模型
 """
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -128,6 +129,11 @@ class ReadCheckLog(models.Model):
         verbose_name_plural = '阅读过检日志'
         db_table = 'read_check_log'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['config', '-created_at']),
+            models.Index(fields=['wxid', '-created_at']),
+        ]
     
     def __str__(self):
         status = '成功' if self.success else '失败'
@@ -172,6 +178,10 @@ class ReadCheckSession(models.Model):
         verbose_name_plural = "阅读检测会话"
         db_table = 'read_check_session'
         ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['user', '-started_at']),
+            models.Index(fields=['status', 'started_at']),
+        ]
     
     def __str__(self):
         return f"{self.url[:50]} - {self.get_status_display()} - {self.started_at.strftime('%Y-%m-%d %H:%M:%S')}"
@@ -217,13 +227,18 @@ class ReadCheckProcessLog(models.Model):
     read_count = models.IntegerField(null=True, blank=True, verbose_name="阅读量")
     previous_read_count = models.IntegerField(null=True, blank=True, verbose_name="之前阅读量")
     
-    created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
+    # 并发检测时日志在内存中生成、结束后批量写入，创建时间取日志产生的时间
+    created_at = models.DateTimeField(default=timezone.now, editable=False, verbose_name="创建时间")
     
     class Meta:
         verbose_name = "检测流程日志"
         verbose_name_plural = "检测流程日志"
         db_table = 'read_check_process_log'
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['session', 'created_at']),
+        ]
     
     def __str__(self):
         return f"{self.session.id} - {self.get_log_type_display()} - {self.created_at.strftime('%H:%M:%S')}"
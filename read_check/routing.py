@@ -0,0 +1,10 @@
+"""
+阅读过检 WebSocket 路由
+"""
+from django.urls import re_path
+
+from . import consumers
+
+websocket_urlpatterns = [
+    re_path(r'ws/read-check/sessions/(?P<session_id>\d+)/$', consumers.ReadCheckSessionConsumer.as_asgi()),
+]
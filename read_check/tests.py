@@ -0,0 +1,148 @@
+import threading
+import time
+from unittest import mock
+
+from django.test import AsyncRequestFactory, RequestFactory, TestCase
+
+from accounts.models import User
+
+from . import live
+from .engine import ReadCheckEngine, run_read_check
+from .models import ReadCheckConfig, ReadCheckLog, ReadCheckProcessLog, ReadCheckSession
+
+ARTICLE = 'https://mp.weixin.qq.com/s/article'
+
+
+class FakeArticle:
+    """模拟上游阅读量：counted 中的账号第一次读取后阅读量加一"""
+
+    def __init__(self, counted, read_num=100, delay=0.01):
+        self.counted = set(counted)
+        self.read_num = read_num
+        self.delay = delay
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._seen = set()
+        self._lock = threading.Lock()
+
+    def fetch(self, protocol_url, wxid, url, timeout=None):
+        with self._lock:
+            self.calls.append(wxid)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            value = self.read_num
+            if wxid in self.counted and wxid not in self._seen:
+                self.read_num += 1
+            self._seen.add(wxid)
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+        return value
+
+
+class ReadCheckEngineTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('checker', password='x')
+
+    def _config(self, url, wxids):
+        return ReadCheckConfig.objects.create(user=self.user, protocol_url=url, wxids=wxids)
+
+    def _run(self, article):
+        return run_read_check(self.user, ARTICLE, fetch_func=article.fetch, max_workers=8, flush_interval=0.05)
+
+    def test_increase_is_credited_to_the_account_that_caused_it(self):
+        self._config('http://p1', ['a1', 'a2', 'a3'])
+        self._config('http://p2', ['b1', 'counted', 'b3'])
+        article = FakeArticle(['counted'])
+
+        session, result = self._run(article)
+
+        self.assertEqual((result['increased'], result['wxid']), (True, 'counted'))
+        self.assertEqual((result['from'], result['to']), (100, 101))
+        self.assertEqual(list(ReadCheckLog.objects.filter(increased=True).values_list('wxid', flat=True)),
+                         ['counted'])
+        # 同一篇文章同一时间只有一个账号在读
+        self.assertEqual(article.max_in_flight, 1)
+        self.assertEqual(session.result, 'increased')
+
+    def test_each_pair_is_uninterrupted(self):
+        self._config('http://p1', [f'a{index}' for index in range(4)])
+        self._config('http://p2', [f'b{index}' for index in range(4)])
+        article = FakeArticle([])
+
+        _, result = self._run(article)
+
+        self.assertFalse(result['increased'])
+        pairs = [article.calls[index:index + 2] for index in range(0, len(article.calls), 2)]
+        self.assertTrue(all(first == second for first, second in pairs), article.calls)
+        self.assertEqual(ReadCheckLog.objects.filter(increased=False, success=True).count(), 8)
+
+    def test_stops_after_first_increase(self):
+        self._config('http://p1', [f'w{index}' for index in range(10)])
+        article = FakeArticle(['w0', 'w1', 'w2', 'w3', 'w4', 'w5', 'w6', 'w7', 'w8', 'w9'])
+
+        session, result = self._run(article)
+
+        # 第一个账号的两次读数之后不再有请求
+        self.assertEqual(len(article.calls), 2)
+        self.assertEqual(result['wxid'], article.calls[0])
+        self.assertEqual(ReadCheckLog.objects.count(), 1)
+        self.assertEqual(session.process_logs.filter(log_type='read_change').count(), 1)
+
+    def test_concurrent_sessions_on_same_article_do_not_interleave(self):
+        other = User.objects.create_user('other', password='x')
+        mine = [self._config('http://p1', ['a1', 'a2', 'a3', 'a4'])]
+        theirs = [ReadCheckConfig.objects.create(user=other, protocol_url='http://p2', wxids=['o1', 'o2', 'o3'])]
+        article = FakeArticle([], delay=0.005)
+
+        # 只运行检测（不写数据库），两个会话在不同线程中读取同一篇文章
+        thread = threading.Thread(target=self._engine_run, args=(other, theirs, article))
+        thread.start()
+        self._engine_run(self.user, mine, article)
+        thread.join(10)
+
+        self.assertEqual(article.max_in_flight, 1)
+        self.assertEqual(len(article.calls), 14)
+
+    @staticmethod
+    def _engine_run(user, configs, article):
+        engine = ReadCheckEngine(ReadCheckSession(user=user, url=ARTICLE), ARTICLE, fetch_func=article.fetch,
+                                 flush_interval=0.05)
+        engine.flush_logs = lambda: None
+        return engine.run(configs)
+
+
+class SessionEventsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('viewer', password='x')
+        self.session = ReadCheckSession.objects.create(user=self.user, url=ARTICLE, status='running')
+        self.logs = [ReadCheckProcessLog.objects.create(session=self.session, log_type='start', message=f'm{index}')
+                     for index in range(3)]
+
+    def _request(self, factory, **headers):
+        request = factory.get('/', **headers)
+        request.user = self.user
+        return request
+
+    def test_wsgi_request_streams_synchronously(self):
+        ReadCheckSession.objects.filter(pk=self.session.pk).update(status='completed', result='no_change')
+        response = live.session_events(self._request(RequestFactory(), HTTP_LAST_EVENT_ID=str(self.logs[0].id)),
+                                       self.session.pk)
+
+        self.assertFalse(response.is_async)
+        body = b''.join(response.streaming_content).decode()
+        self.assertNotIn('"m0"', body)
+        self.assertIn('"m1"', body)
+        self.assertIn(f'id: {self.logs[2].id}', body)
+        self.assertIn('"type": "done"', body)
+
+    def test_wsgi_stream_ends_after_max_seconds(self):
+        with mock.patch.object(live, 'POLL_INTERVAL', 0.01):
+            chunks = list(live.sync_event_stream(self.session.pk, max_seconds=0.05))
+        self.assertEqual(sum('"type": "log"' in chunk for chunk in chunks), 3)
+        self.assertFalse(any('"type": "done"' in chunk for chunk in chunks))
+
+    def test_asgi_request_streams_asynchronously(self):
+        response = live.session_events(self._request(AsyncRequestFactory()), self.session.pk)
+        self.assertTrue(response.is_async)
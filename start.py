@@ -3,6 +3,14 @@
 协议核心管理系统 - 一键启动脚本
 包含环境检查、依赖安装、数据库初始化、服务启动等功能
 支持原版和 Nuitka 加密版本
+
+启动方式：
+    python start.py                 开发模式（runserver / 单进程）
+    python start.py --workers 4     生产模式：4 个 daphne worker 共享同一端口
+    python start.py --restart       重启系统
+
+生产模式下向主进程发送 SIGHUP 可逐个平滑重启 worker；
+多个 worker 之间的WebSocket消息需要 CHANNEL_LAYER=redis 或 redis-pubsub。
 """
 import os
 import sys
@@ -366,7 +374,7 @@ def create_superuser():
         create_admin_script = '''
 import os
 import django
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "protocol_core.settings")
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "protocol_core.runtime_settings")
 django.setup()
 
 from django.contrib.auth import get_user_model
@@ -427,6 +435,7 @@ def start_asgi_server():
     print(f"🌐 访问地址：http://{host}:{port}")
     print(f"🔧 管理后台：http://{host}:{port}/admin")
     print(f"📡 WebSocket：ws://{host}:{port}/ws/chat/")
+    print(f"🔀 Channel layer：{os.environ.get('CHANNEL_LAYER', 'memory')}")
     print(f"🔥 RESTful API文档：http://{host}:{port}/api/swagger/")
     print(f"📚 ReDoc文档：http://{host}:{port}/api/redoc/")
     print(f"⚙️ 协议配置：http://{host}:{port}/dashboard/protocol-config/")
@@ -491,7 +500,9 @@ def start_encrypted_django_server():
 
         # 设置环境变量
         os.environ.setdefault('DJANGO_SETTINGS_MODULE',
-                              'protocol_core.settings')
+                              'protocol_core.runtime_settings')
+        # 本进程直接运行服务器，django.setup() 时启动后台任务
+        os.environ['PROTOCOL_SERVER_PROCESS'] = '1'
 
         # 导入 Django 并启动
         import django
@@ -608,6 +619,245 @@ def start_django_server():
         sys.exit(1)
 
 
+def parse_workers_arg(argv=None):
+    """解析 --workers N 参数，未指定时返回 0"""
+    argv = sys.argv[1:] if argv is None else argv
+    for index, arg in enumerate(argv):
+        value = None
+        if arg == '--workers' and index + 1 < len(argv):
+            value = argv[index + 1]
+        elif arg.startswith('--workers='):
+            value = arg.split('=', 1)[1]
+        if value is not None:
+            try:
+                return max(1, int(value))
+            except ValueError:
+                print(f"⚠️ 无效的 --workers 参数: {value}，使用单进程模式")
+                return 0
+    return 0
+
+
+class ASGIWorkerPool:
+    """ASGI 多进程 worker 池
+
+    - 主进程监听端口，daphne worker 通过 --fd 共享同一个 socket
+    - 每个 worker 额外监听 127.0.0.1 上的私有健康检查端口
+    - 后台任务（自动刷新/自动登录/日志清理）只在 0 号 worker 中运行
+    - 收到 SIGHUP 时逐个平滑重启 worker
+    """
+
+    HEALTH_CHECK_INTERVAL = 5       # 健康检查间隔（秒）
+    HEALTH_CHECK_FAILURES = 3       # 连续失败多少次后重启
+    STARTUP_GRACE = 20              # 启动后多久开始健康检查（秒）
+    STOP_TIMEOUT = 30               # 平滑停止等待时间（秒）
+
+    def __init__(self, workers, host, port, health_port_base=None):
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.health_port_base = health_port_base or int(os.environ.get('WORKER_HEALTH_PORT_BASE', port + 100))
+        self.sock = None
+        self.processes = {}         # worker_id -> Popen
+        self.generations = {}       # worker_id -> 重启次数，决定使用哪个健康检查端口
+        self.started_at = {}        # worker_id -> 启动时间
+        self.failures = {}          # worker_id -> 连续健康检查失败次数
+        self.restart_requested = False
+        self.stopping = False
+
+    def health_port(self, worker_id, generation=None):
+        # 每个 worker 两个端口交替使用，平滑重启时新旧进程可以同时在线
+        if generation is None:
+            generation = self.generations.get(worker_id, 0)
+        return self.health_port_base + worker_id * 2 + generation % 2
+
+    def bind(self):
+        import socket
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((self.host, self.port))
+        self.sock.listen(1024)
+        self.sock.set_inheritable(True)
+
+    def spawn(self, worker_id):
+        self.generations[worker_id] = self.generations.get(worker_id, -1) + 1
+        fd = self.sock.fileno()
+        env = os.environ.copy()
+        env['PROTOCOL_WORKER_ID'] = str(worker_id)
+        # 后台定时任务只允许在 0 号 worker 中启动
+        env['PROTOCOL_BACKGROUND_TASKS'] = '1' if worker_id == 0 else '0'
+        command = [
+            sys.executable, "-m", "daphne",
+            "--fd", str(fd),
+            "-e", f"tcp:port={self.health_port(worker_id)}:interface=127.0.0.1",
+            "--application-close-timeout", "10",
+            "asgi:application",
+        ]
+        process = subprocess.Popen(command, pass_fds=(fd,), env=env)
+        self.processes[worker_id] = process
+        self.started_at[worker_id] = time.time()
+        self.failures[worker_id] = 0
+        print(f"   ✅ worker {worker_id} 已启动 (PID {process.pid}, 健康检查端口 {self.health_port(worker_id)})")
+        return process
+
+    def stop_process(self, process):
+        if process.poll() is not None:
+            return
+        process.terminate()
+        try:
+            process.wait(timeout=self.STOP_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+    def is_healthy(self, worker_id):
+        import urllib.request
+        import urllib.error
+        url = f"http://127.0.0.1:{self.health_port(worker_id)}/"
+        try:
+            with urllib.request.urlopen(url, timeout=5) as response:
+                return response.status < 500
+        except urllib.error.HTTPError as e:
+            return e.code < 500
+        except Exception:
+            return False
+
+    def wait_healthy(self, worker_id, timeout=None):
+        deadline = time.time() + (timeout or self.STARTUP_GRACE)
+        while time.time() < deadline:
+            process = self.processes.get(worker_id)
+            if process is None or process.poll() is not None:
+                return False
+            if self.is_healthy(worker_id):
+                return True
+            time.sleep(1)
+        return False
+
+    def restart_worker(self, worker_id, graceful=True):
+        old = self.processes.get(worker_id)
+        if worker_id == 0 or not graceful or old is None:
+            # 0 号 worker 运行后台任务，先停旧进程，避免任务同时运行两份
+            if old is not None:
+                self.stop_process(old)
+            self.spawn(worker_id)
+            return
+        # 其他 worker 先启动新进程，健康后再停旧进程，共享 socket 保证服务不中断
+        self.spawn(worker_id)
+        if not self.wait_healthy(worker_id):
+            print(f"   ⚠️ worker {worker_id} 新进程健康检查未通过，仍然替换旧进程")
+        self.stop_process(old)
+
+    def rolling_restart(self):
+        print("🔄 收到重启信号，逐个平滑重启 worker...")
+        for worker_id in sorted(self.processes):
+            if self.stopping:
+                break
+            self.restart_worker(worker_id)
+        print("✅ 所有 worker 已重启")
+
+    def check_workers(self):
+        for worker_id, process in list(self.processes.items()):
+            if self.stopping:
+                return
+            if process.poll() is not None:
+                print(f"⚠️ worker {worker_id} 已退出 (退出码 {process.returncode})，正在重启...")
+                time.sleep(1)
+                self.spawn(worker_id)
+                continue
+            if time.time() - self.started_at[worker_id] < self.STARTUP_GRACE:
+                continue
+            if self.is_healthy(worker_id):
+                self.failures[worker_id] = 0
+                continue
+            self.failures[worker_id] += 1
+            print(f"⚠️ worker {worker_id} 健康检查失败 ({self.failures[worker_id]}/{self.HEALTH_CHECK_FAILURES})")
+            if self.failures[worker_id] >= self.HEALTH_CHECK_FAILURES:
+                print(f"🔄 重启无响应的 worker {worker_id}")
+                self.restart_worker(worker_id, graceful=False)
+
+    def stop_all(self):
+        self.stopping = True
+        print("\n🛑 正在停止所有 worker...")
+        for process in self.processes.values():
+            if process.poll() is None:
+                process.terminate()
+        for process in self.processes.values():
+            try:
+                process.wait(timeout=self.STOP_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if self.sock is not None:
+            self.sock.close()
+        print("👋 所有 worker 已停止")
+
+    def run(self):
+        self.bind()
+        for worker_id in range(self.workers):
+            self.spawn(worker_id)
+
+        def on_restart(signum, frame):
+            self.restart_requested = True
+
+        def on_stop(signum, frame):
+            raise KeyboardInterrupt
+
+        signal.signal(signal.SIGHUP, on_restart)
+        signal.signal(signal.SIGTERM, on_stop)
+
+        try:
+            while True:
+                time.sleep(self.HEALTH_CHECK_INTERVAL)
+                if self.restart_requested:
+                    self.restart_requested = False
+                    self.rolling_restart()
+                self.check_workers()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop_all()
+
+
+def start_asgi_worker_pool(workers):
+    """启动多进程ASGI服务器（生产模式）"""
+    host = SERVER_CONFIG['HOST']
+    port = SERVER_CONFIG['PORT']
+    server_name = SERVER_CONFIG['SERVER_NAME']
+
+    if os.name == 'nt':
+        print("⚠️  Windows 不支持多进程共享端口，使用单进程ASGI服务器")
+        return start_asgi_server()
+
+    channel_layer = os.environ.get('CHANNEL_LAYER', 'memory')
+
+    print("🚀 正在启动多进程ASGI服务器...")
+    print("=" * 60)
+    print(f"📡 {server_name} - 生产模式")
+    print("=" * 60)
+    print(f"🌐 访问地址：http://{host}:{port}")
+    print(f"👷 Worker数量：{workers}")
+    print(f"🔀 Channel layer：{channel_layer}")
+    print("⏱️ 后台任务仅在 worker 0 中运行")
+    print(f"🔄 平滑重启：kill -HUP {os.getpid()}")
+    print("=" * 60)
+    if workers > 1 and channel_layer == 'memory':
+        print("⚠️  CHANNEL_LAYER=memory 时各 worker 之间的WebSocket消息互不可见，")
+        print("   多进程部署请设置 CHANNEL_LAYER=redis 或 redis-pubsub")
+
+    if not check_port_available(host if host != '0.0.0.0' else '127.0.0.1', port):
+        print(f"❌ 端口 {port} 已被占用")
+        return False
+
+    pool = ASGIWorkerPool(workers, host, port)
+    try:
+        pool.run()
+    except FileNotFoundError:
+        print("❌ daphne未安装，请先安装: pip install daphne")
+        return False
+    except OSError as e:
+        print(f"❌ 启动失败: {e}")
+        return False
+    return True
+
+
 def is_docker_environment():
     """检查是否在Docker容器中运行"""
     return os.path.exists('/.dockerenv') or os.environ.get('DOCKER_CONTAINER') == 'true'
@@ -664,7 +914,11 @@ def docker_main():
     print("\n🚀 启动服务器...")
 
     # Docker环境中优先使用ASGI服务器
-    if websocket_support:
+    workers = parse_workers_arg() or int(os.environ.get('WEB_WORKERS', 0) or 0)
+    if websocket_support and workers:
+        print(f"📡 使用多进程ASGI服务器（{workers} 个worker）")
+        start_asgi_worker_pool(workers)
+    elif websocket_support:
         print("📡 使用ASGI服务器（支持WebSocket）")
         start_asgi_server()
     else:
@@ -843,7 +1097,11 @@ def main():
         print("\n✅ 数据库已存在，跳过初始化")
 
     # 根据版本类型启动相应的服务器
-    if encrypted_version:
+    workers = parse_workers_arg()
+    if workers:
+        # 生产模式：多进程ASGI
+        start_asgi_worker_pool(workers)
+    elif encrypted_version:
         # print("🔒 检测到加密版本，使用加密启动模式")
         start_encrypted_django_server()
     else:
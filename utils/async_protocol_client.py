@@ -0,0 +1,198 @@
+"""
+协议服务器异步HTTP客户端
+
+供 Channels consumer 和异步视图直接 await 使用，不占用线程池。
+底层优先使用 aiohttp，其次 httpx，接口保持一致::
+
+    from utils.async_protocol_client import get_async_client
+
+    client = get_async_client(connection.url)
+    response = await client.post('/api/Msg/Sync', json={...})
+    data = response.json()
+"""
+import asyncio
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+from utils.protocol_client import (
+    ClientMetrics, RETRY_COUNT, RETRY_INTERVAL, POOL_MAXSIZE,
+    resolve_timeout, _normalize_base_url,
+)
+
+# aiohttp / httpx 作为可选依赖
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+    aiohttp = None
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+    httpx = None
+
+
+class ProtocolRequestError(Exception):
+    """协议请求失败（连接失败、超时等）"""
+
+
+class AsyncResponse:
+    """与后端无关的响应对象"""
+
+    def __init__(self, status_code, content, headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class _AiohttpBackend:
+    def __init__(self, pool_size):
+        connector = aiohttp.TCPConnector(limit=pool_size, keepalive_timeout=60)
+        self.session = aiohttp.ClientSession(connector=connector)
+
+    async def request(self, method, url, timeout, **kwargs):
+        try:
+            async with self.session.request(method, url, timeout=aiohttp.ClientTimeout(total=timeout),
+                                            **kwargs) as response:
+                content = await response.read()
+                return AsyncResponse(response.status, content, dict(response.headers))
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            raise ProtocolRequestError(str(e) or e.__class__.__name__) from e
+
+    @staticmethod
+    def is_connect_error(exc):
+        return isinstance(exc.__cause__, aiohttp.ClientConnectorError)
+
+    async def close(self):
+        await self.session.close()
+
+
+class _HttpxBackend:
+    def __init__(self, pool_size):
+        limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self.client = httpx.AsyncClient(limits=limits)
+
+    async def request(self, method, url, timeout, **kwargs):
+        try:
+            response = await self.client.request(method, url, timeout=timeout, **kwargs)
+        except httpx.TransportError as e:
+            raise ProtocolRequestError(str(e) or e.__class__.__name__) from e
+        return AsyncResponse(response.status_code, response.content, dict(response.headers))
+
+    @staticmethod
+    def is_connect_error(exc):
+        return isinstance(exc.__cause__, httpx.ConnectError)
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def _create_backend(pool_size):
+    if AIOHTTP_AVAILABLE:
+        return _AiohttpBackend(pool_size)
+    if HTTPX_AVAILABLE:
+        return _HttpxBackend(pool_size)
+    raise RuntimeError('异步协议客户端需要安装 aiohttp 或 httpx')
+
+
+class AsyncProtocolClient:
+    """单个协议地址的异步客户端
+
+    会话绑定到创建它的事件循环，应通过 get_async_client 获取。
+    """
+
+    def __init__(self, base_url, pool_size=POOL_MAXSIZE, retry_count=RETRY_COUNT,
+                 retry_interval=RETRY_INTERVAL):
+        self.base_url = base_url.rstrip('/')
+        self.retry_count = retry_count
+        self.retry_interval = retry_interval
+        self.metrics = ClientMetrics()
+        self._backend = _create_backend(pool_size)
+
+    def url(self, path):
+        if path.startswith(('http://', 'https://')):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    async def request(self, method, path, timeout=None, **kwargs):
+        url = self.url(path)
+        if timeout is None:
+            timeout = resolve_timeout(urlsplit(url).path)
+        idempotent = method.upper() in ('GET', 'HEAD', 'OPTIONS')
+
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            try:
+                response = await self._backend.request(method, url, timeout, **kwargs)
+            except ProtocolRequestError as e:
+                self.metrics.observe(time.monotonic() - started, error=True)
+                # 连接失败时请求尚未发出，任何方法都可重试；其他错误只重试幂等方法
+                retryable = idempotent or self._backend.is_connect_error(e)
+                if attempt >= self.retry_count or not retryable:
+                    raise
+            else:
+                self.metrics.observe(time.monotonic() - started, error=response.status_code >= 500)
+                if not (idempotent and response.status_code in (502, 503, 504)) or attempt >= self.retry_count:
+                    return response
+            await asyncio.sleep(self.retry_interval * (2 ** attempt))
+            attempt += 1
+
+    async def get(self, path, **kwargs):
+        return await self.request('GET', path, **kwargs)
+
+    async def post(self, path, **kwargs):
+        return await self.request('POST', path, **kwargs)
+
+    def stats(self):
+        return self.metrics.snapshot()
+
+    async def close(self):
+        await self._backend.close()
+
+
+# 每个事件循环一组客户端：{loop: {base_url: client}}
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_async_client(base_url):
+    """获取当前事件循环中协议地址对应的共享异步客户端"""
+    loop = asyncio.get_running_loop()
+    key = _normalize_base_url(base_url)
+    with _clients_lock:
+        # 清理已关闭事件循环遗留的客户端
+        for stale in [item for item in _clients if item.is_closed()]:
+            del _clients[stale]
+        loop_clients = _clients.setdefault(loop, {})
+        client = loop_clients.get(key)
+        if client is None:
+            client = AsyncProtocolClient(key)
+            loop_clients[key] = client
+    return client
+
+
+def get_async_client_for_connection(connection):
+    """获取 Connection 对应的共享异步客户端"""
+    return get_async_client(connection.url)
+
+
+async def close_async_clients():
+    """关闭当前事件循环中的所有异步客户端"""
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        loop_clients = _clients.pop(loop, {})
+    for client in loop_clients.values():
+        await client.close()
@@ -0,0 +1,220 @@
+"""
+进程内短期缓存与请求合并
+
+- TTLCache：有容量上限的 LRU 缓存，条目带过期时间
+- SingleFlight：同一个键同时只执行一次加载，其他调用等待并共享结果
+- CoalescingCache：两者组合，get_or_load() 先查缓存，未命中时合并并发加载
+
+用法::
+
+    from utils.coalescing import CoalescingCache
+
+    cache = CoalescingCache(maxsize=1024, ttl=5)
+    value = cache.get_or_load(key, lambda: fetch(key))
+    fresh = cache.get_or_load(key, lambda: fetch(key), bypass=True)   # 跳过缓存，结果写回缓存
+    value, status = cache.fetch(key, lambda: fetch(key), ttl=60)      # status: hit / miss / coalesced / bypass
+"""
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """线程安全的 LRU + TTL 缓存"""
+
+    def __init__(self, maxsize=1024, ttl=5):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()      # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                return default
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_matching(self, predicate):
+        """删除 predicate(key) 为真的条目，返回删除数"""
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """合并同一个键的并发调用"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        """返回 (结果, 是否共享了其他线程的调用)，加载异常会抛给所有等待者"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+
+        try:
+            call.value = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+        return call.value, False
+
+
+class CoalescingCache:
+    """带请求合并的 TTL 缓存，记录命中统计"""
+
+    def __init__(self, maxsize=1024, ttl=5, cache_if=None):
+        self.cache = TTLCache(maxsize, ttl)
+        self.flight = SingleFlight()
+        # 只缓存满足条件的结果（例如不缓存 None）
+        self.cache_if = cache_if or (lambda value: value is not None)
+        self._stats_lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'bypassed': 0, 'errors': 0}
+
+    def _count(self, key):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def _store(self, key, value, ttl=None):
+        if ttl == 0 or not self.cache_if(value):
+            return
+        self.cache.set(key, value, ttl)
+
+    def get_or_load(self, key, loader, bypass=False, ttl=None):
+        """查缓存，未命中时加载；bypass=True 时直接加载（不与进行中的请求合并）并刷新缓存"""
+        return self.fetch(key, loader, bypass=bypass, ttl=ttl)[0]
+
+    def fetch(self, key, loader, bypass=False, ttl=None, coalesce=True):
+        """同 get_or_load，返回 (结果, 来源)，来源为 hit / miss / coalesced / bypass
+
+        ttl 覆盖默认缓存时间，ttl=0 时不缓存（只合并并发请求）；
+        coalesce=False 时未命中的请求各自加载。
+        """
+        if bypass:
+            self._count('bypassed')
+            value = self._load(loader)
+            self._store(key, value, ttl)
+            return value, 'bypass'
+
+        value = self.cache.get(key, _MISSING)
+        if value is not _MISSING:
+            self._count('hits')
+            return value, 'hit'
+
+        self._count('misses')
+        if not coalesce:
+            value = self._load(loader)
+            self._store(key, value, ttl)
+            return value, 'miss'
+
+        loaded = []
+
+        def load():
+            loaded.append(True)
+            value = self._load(loader)
+            self._store(key, value, ttl)
+            return value
+
+        try:
+            value, shared = self.flight.do(key, load)
+        except Exception:
+            if loaded:
+                raise
+            # 共享的请求失败时，等待者用自己的加载函数再试一次（可能使用不同的账号）
+            value = self._load(loader)
+            self._store(key, value, ttl)
+            return value, 'miss'
+        if shared and not self.cache_if(value):
+            # 共享到的结果不可用（如 None）时同样自己再加载一次
+            value = self._load(loader)
+            self._store(key, value, ttl)
+            return value, 'miss'
+        if shared:
+            self._count('coalesced')
+            return value, 'coalesced'
+        return value, 'miss'
+
+    def _load(self, loader):
+        try:
+            return loader()
+        except Exception:
+            self._count('errors')
+            raise
+
+    def invalidate(self, key):
+        self.cache.delete(key)
+
+    def invalidate_matching(self, predicate):
+        return self.cache.delete_matching(predicate)
+
+    def clear(self):
+        self.cache.clear()
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats.update({
+            'size': len(self.cache),
+            'maxsize': self.cache.maxsize,
+            'ttl': self.cache.ttl,
+            'evictions': self.cache.evictions,
+            'expirations': self.cache.expirations,
+            'hit_rate': round(stats['hits'] / lookups, 4) if lookups else 0,
+        })
+        return stats
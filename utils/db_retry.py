@@ -0,0 +1,51 @@
+"""
+SQLite 写锁冲突重试
+
+busy_timeout 已经让大部分写操作排队等待，但等待超时或极端并发时仍可能抛出
+OperationalError("database is locked")。对可以安全重复执行的写操作使用::
+
+    from utils.db_retry import retry_on_locked
+
+    @retry_on_locked()
+    def save_status(...):
+        with transaction.atomic():
+            ...
+
+注意：不要在外层已有 transaction.atomic() 的代码内部使用，
+锁冲突后外层事务已不可用，只能由最外层重试。
+"""
+import functools
+import logging
+import random
+import time
+
+from django.db import OperationalError, connection
+
+logger = logging.getLogger(__name__)
+
+LOCKED_MESSAGES = ('database is locked', 'database table is locked', 'database is busy')
+
+
+def is_locked_error(exc):
+    message = str(exc).lower()
+    return any(text in message for text in LOCKED_MESSAGES)
+
+
+def retry_on_locked(retries=5, delay=0.05, max_delay=1.0):
+    """遇到 SQLITE_BUSY 时按指数退避重试"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            attempt = 0
+            while True:
+                try:
+                    return func(*args, **kwargs)
+                except OperationalError as e:
+                    if not is_locked_error(e) or attempt >= retries or connection.in_atomic_block:
+                        raise
+                    wait = min(delay * (2 ** attempt), max_delay) * random.uniform(0.5, 1.5)
+                    attempt += 1
+                    logger.debug('数据库被锁定，%.3f 秒后第 %d 次重试: %s', wait, attempt, func.__name__)
+                    time.sleep(wait)
+        return wrapper
+    return decorator
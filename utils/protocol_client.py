@@ -0,0 +1,221 @@
+"""
+协议服务器HTTP客户端
+
+每个协议地址（Connection.url）复用一个带连接池的 requests.Session：
+- keep-alive，避免每次请求重新建立 TCP/TLS 连接
+- 按 API_CONFIG 的 RETRY_COUNT / RETRY_INTERVAL 做退避重试；健康检查等探测请求传
+  retry=False，走不重试的会话，失败立即返回
+- 按接口路径设置超时
+- 统计请求数、连接复用率和延迟分布
+
+用法::
+
+    from utils.protocol_client import get_client
+
+    client = get_client(connection.url)
+    response = client.post('/api/Msg/Sync', json={...})
+"""
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import API_CONFIG
+
+
+RETRY_COUNT = API_CONFIG.get('RETRY_COUNT', 3)
+RETRY_INTERVAL = API_CONFIG.get('RETRY_INTERVAL', 1)
+DEFAULT_TIMEOUT = API_CONFIG.get('TIMEOUT', 30)
+
+# 每个协议地址的连接池大小
+POOL_CONNECTIONS = API_CONFIG.get('POOL_CONNECTIONS', 4)
+POOL_MAXSIZE = API_CONFIG.get('POOL_MAXSIZE', 32)
+
+# 接口超时（秒），按路径前缀匹配，最长前缀优先
+ENDPOINT_TIMEOUTS = {
+    '/health': 5,
+    '/api/Login/GetQR': 5,
+    '/api/Login/CheckQR': 10,
+    '/api/Msg/Sync': 15,
+    '/api/Msg/SendTxt': 15,
+    '/api/User/GetContractProfile': 10,
+    '/user/GetProfile': 10,
+}
+ENDPOINT_TIMEOUTS.update(API_CONFIG.get('ENDPOINT_TIMEOUTS', {}))
+
+# 延迟直方图分桶上限（秒）
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf'))
+
+
+def resolve_timeout(path):
+    """根据路径获取超时时间"""
+    matched = None
+    for prefix in ENDPOINT_TIMEOUTS:
+        if path.startswith(prefix) and (matched is None or len(prefix) > len(matched)):
+            matched = prefix
+    return ENDPOINT_TIMEOUTS[matched] if matched else DEFAULT_TIMEOUT
+
+
+class ClientMetrics:
+    """单个协议地址的请求统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+
+    def observe(self, latency, error=False):
+        with self._lock:
+            self.requests += 1
+            if error:
+                self.errors += 1
+            self.total_latency += latency
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if latency <= bound:
+                    self.buckets[index] += 1
+                    break
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'errors': self.errors,
+                'avg_latency': round(self.total_latency / self.requests, 4) if self.requests else 0,
+                'latency_histogram': {
+                    ('+Inf' if bound == float('inf') else str(bound)): count
+                    for bound, count in zip(LATENCY_BUCKETS, self.buckets)
+                },
+            }
+
+
+class ProtocolClient:
+    """单个协议地址的客户端"""
+
+    def __init__(self, base_url, pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE,
+                 retry_count=RETRY_COUNT, retry_interval=RETRY_INTERVAL):
+        self.base_url = base_url.rstrip('/')
+        self.metrics = ClientMetrics()
+
+        # 连接失败对所有方法都重试（请求尚未发出）；
+        # 读超时和 5xx 只对幂等方法重试，避免重复发送消息等副作用
+        retry = Retry(
+            total=retry_count,
+            connect=retry_count,
+            read=retry_count,
+            status=retry_count,
+            backoff_factor=retry_interval,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(['GET', 'HEAD', 'OPTIONS']),
+            raise_on_status=False,
+        )
+        self.adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                   max_retries=retry, pool_block=False)
+        self.session = requests.Session()
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+        self.session.headers.update({'Connection': 'keep-alive'})
+
+        # 探测请求（retry=False）：不重试，连接池单独且较小
+        self.probe_adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_connections, max_retries=0)
+        self.probe_session = requests.Session()
+        self.probe_session.mount('http://', self.probe_adapter)
+        self.probe_session.mount('https://', self.probe_adapter)
+        self.probe_session.headers.update({'Connection': 'keep-alive'})
+
+    def url(self, path):
+        if path.startswith(('http://', 'https://')):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def request(self, method, path, timeout=None, retry=True, **kwargs):
+        """发送请求；retry=False 时不做退避重试（健康检查、连接测试）"""
+        url = self.url(path)
+        if timeout is None:
+            timeout = resolve_timeout(urlsplit(url).path)
+        session = self.session if retry else self.probe_session
+        started = time.monotonic()
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        except requests.exceptions.RequestException:
+            self.metrics.observe(time.monotonic() - started, error=True)
+            raise
+        self.metrics.observe(time.monotonic() - started, error=response.status_code >= 500)
+        return response
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def connection_stats(self):
+        """连接池统计：新建连接数和发出的请求数"""
+        opened = 0
+        sent = 0
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            opened += pool.num_connections
+            sent += pool.num_requests
+        return opened, sent
+
+    def stats(self):
+        data = self.metrics.snapshot()
+        opened, sent = self.connection_stats()
+        data['connections_opened'] = opened
+        data['reuse_rate'] = round(1 - opened / sent, 4) if sent else 0
+        return data
+
+    def close(self):
+        self.session.close()
+        self.probe_session.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _normalize_base_url(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}{parts.path.rstrip('/')}"
+
+
+def get_client(base_url):
+    """获取协议地址对应的共享客户端"""
+    key = _normalize_base_url(base_url)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = ProtocolClient(key)
+                _clients[key] = client
+    return client
+
+
+def get_client_for_connection(connection):
+    """获取 Connection 对应的共享客户端"""
+    return get_client(connection.url)
+
+
+def get_metrics():
+    """所有协议地址的统计信息"""
+    with _clients_lock:
+        clients = dict(_clients)
+    return {base_url: client.stats() for base_url, client in clients.items()}
+
+
+def close_all():
+    """关闭所有连接池"""
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
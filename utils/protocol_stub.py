@@ -0,0 +1,167 @@
+"""
+本地协议服务器替身
+
+只依赖标准库的 asyncio HTTP/1.1 服务器，支持 keep-alive，
+模拟常用的协议接口，用于协议客户端的压测和联调::
+
+    python -m utils.protocol_stub --port 9901 --latency 0.05
+
+模拟的接口：
+- GET  /health
+- POST /api/Login/GetQR
+- POST /api/Msg/Sync              随机返回新消息
+- POST /api/Msg/SendTxt
+- POST /api/User/GetContractProfile
+- GET  /user/GetProfile
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from urllib.parse import urlsplit, parse_qs
+
+
+class ProtocolStub:
+    """协议服务器替身"""
+
+    def __init__(self, latency=0.0, message_rate=0.2):
+        self.latency = latency
+        self.message_rate = message_rate
+        self.requests = 0
+        self.connections = 0
+        self._msg_ids = itertools.count(int(time.time() * 1000))
+
+    # ---- 接口 ----
+
+    def health(self, query, body):
+        return 200, {'status': 'ok'}
+
+    def get_qr(self, query, body):
+        return 200, {'Success': True, 'Data': {'Uuid': f'stub-{next(self._msg_ids)}', 'QrUrl': ''}}
+
+    def msg_sync(self, query, body):
+        wxid = body.get('Wxid', '')
+        messages = []
+        if random.random() < self.message_rate:
+            for _ in range(random.randint(1, 3)):
+                messages.append({
+                    'NewMsgId': next(self._msg_ids),
+                    'FromUserName': {'string': f'stub_friend_{random.randint(1, 5)}'},
+                    'ToUserName': {'string': wxid},
+                    'Content': {'string': f'stub message {random.randint(1, 10000)}'},
+                    'PushContent': '',
+                    'MsgType': 1,
+                    'CreateTime': int(time.time()),
+                })
+        return 200, {'Success': True, 'Data': {'AddMsgs': messages}}
+
+    def send_txt(self, query, body):
+        return 200, {'Success': True, 'Data': {'NewMsgId': next(self._msg_ids)}}
+
+    def contract_profile(self, query, body):
+        wxid = body.get('Wxid', '')
+        return 200, {'Success': True, 'Data': {
+            'userInfo': {'NickName': {'string': f'stub-{wxid}'}},
+            'userInfoExt': {'BigHeadImgUrl': f'http://stub.local/{wxid}.png'},
+        }}
+
+    def get_profile(self, query, body):
+        key = (query.get('key') or [''])[0]
+        return 200, {'Code': 200, 'Data': {
+            'userInfo': {'nickName': {'string': f'stub-{key}'}},
+            'userInfoExt': {'bigHeadImgUrl': f'http://stub.local/{key}.png'},
+        }}
+
+    def routes(self):
+        return {
+            ('GET', '/health'): self.health,
+            ('POST', '/api/Login/GetQR'): self.get_qr,
+            ('POST', '/api/Msg/Sync'): self.msg_sync,
+            ('POST', '/api/Msg/SendTxt'): self.send_txt,
+            ('POST', '/api/User/GetContractProfile'): self.contract_profile,
+            ('GET', '/user/GetProfile'): self.get_profile,
+        }
+
+    # ---- HTTP ----
+
+    async def handle_connection(self, reader, writer):
+        self.connections += 1
+        routes = self.routes()
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length') or 0)
+                raw_body = await reader.readexactly(length) if length else b''
+
+                self.requests += 1
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+
+                parts = urlsplit(target)
+                handler = routes.get((method.upper(), parts.path))
+                if handler is None:
+                    status, payload = 404, {'Success': False, 'Message': 'not found'}
+                else:
+                    try:
+                        body = json.loads(raw_body) if raw_body else {}
+                    except ValueError:
+                        body = {}
+                    status, payload = handler(parse_qs(parts.query), body)
+
+                content = json.dumps(payload).encode('utf-8')
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(content)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + content
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=0):
+        """启动服务器，返回 asyncio.Server（port=0 时自动分配端口）"""
+        return await asyncio.start_server(self.handle_connection, host, port, backlog=1024)
+
+
+async def _serve(host, port, latency, message_rate):
+    stub = ProtocolStub(latency=latency, message_rate=message_rate)
+    server = await stub.start(host, port)
+    address = server.sockets[0].getsockname()
+    print(f"协议替身服务器已启动: http://{address[0]}:{address[1]}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地协议服务器替身')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9901)
+    parser.add_argument('--latency', type=float, default=0.0, help='每个请求的模拟延迟（秒）')
+    parser.add_argument('--message-rate', type=float, default=0.2, help='Msg/Sync 返回新消息的概率')
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args.host, args.port, args.latency, args.message_rate))
+    except KeyboardInterrupt:
+        print("\n👋 协议替身服务器已停止")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""
+本地 Redis 发布/订阅替身
+
+只实现 channels_redis.pubsub.RedisPubSubChannelLayer 用到的命令
+（PUBLISH / SUBSCRIBE / UNSUBSCRIBE / PING 及 HELLO 等连接握手，支持 RESP2/RESP3），
+用于在没有 Redis 的开发机上验证多进程 Daphne 的消息分发::
+
+    python -m utils.redis_stub --port 6390
+    CHANNEL_LAYER=redis-pubsub REDIS_URL=redis://127.0.0.1:6390/0 python start.py
+
+不支持持久化、Lua 脚本和其他数据结构，不能用于 channels_redis.core.RedisChannelLayer。
+"""
+import argparse
+import asyncio
+
+
+def _bulk(value):
+    if value is None:
+        return b'$-1\r\n'
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    return b'$%d\r\n%s\r\n' % (len(value), value)
+
+
+def _array(*items, push=False):
+    # RESP3 的发布/订阅消息使用 push 类型（>）
+    parts = [b'%s%d\r\n' % (b'>' if push else b'*', len(items))]
+    for item in items:
+        parts.append(b':%d\r\n' % item if isinstance(item, int) else _bulk(item))
+    return b''.join(parts)
+
+
+class RedisPubSubStub:
+    """发布/订阅服务器"""
+
+    def __init__(self):
+        self.subscribers = {}    # channel(bytes) -> set(writer)
+        self.protocols = {}      # writer -> RESP 版本
+        self.published = 0
+
+    def _push(self, writer, *items):
+        return _array(*items, push=self.protocols.get(writer) == 3)
+
+    async def _read_command(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            # inline 命令，例如 telnet 里输入的 PING
+            return line.strip().split()
+        count = int(line[1:].strip())
+        args = []
+        for _ in range(count):
+            header = await reader.readline()
+            length = int(header[1:].strip())
+            data = await reader.readexactly(length + 2)
+            args.append(data[:-2])
+        return args
+
+    def _subscriptions(self, writer):
+        return [channel for channel, writers in self.subscribers.items() if writer in writers]
+
+    def _unsubscribe(self, writer, channel):
+        writers = self.subscribers.get(channel)
+        if writers is not None:
+            writers.discard(writer)
+            if not writers:
+                del self.subscribers[channel]
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                args = await self._read_command(reader)
+                if args is None:
+                    break
+                if not args:
+                    continue
+                command = args[0].upper()
+
+                if command == b'PUBLISH' and len(args) == 3:
+                    channel, payload = args[1], args[2]
+                    receivers = list(self.subscribers.get(channel, ()))
+                    for receiver in receivers:
+                        receiver.write(self._push(receiver, b'message', channel, payload))
+                    self.published += 1
+                    writer.write(b':%d\r\n' % len(receivers))
+                elif command == b'SUBSCRIBE':
+                    for channel in args[1:]:
+                        self.subscribers.setdefault(channel, set()).add(writer)
+                        writer.write(self._push(writer, b'subscribe', channel, len(self._subscriptions(writer))))
+                elif command == b'UNSUBSCRIBE':
+                    channels = args[1:] or self._subscriptions(writer)
+                    if not channels:
+                        writer.write(self._push(writer, b'unsubscribe', None, 0))
+                    for channel in channels:
+                        self._unsubscribe(writer, channel)
+                        writer.write(self._push(writer, b'unsubscribe', channel, len(self._subscriptions(writer))))
+                elif command == b'HELLO':
+                    version = int(args[1]) if len(args) > 1 else 2
+                    if version not in (2, 3):
+                        writer.write(b'-NOPROTO unsupported protocol version\r\n')
+                    else:
+                        self.protocols[writer] = version
+                        fields = [b'server', b'redis', b'version', b'7.0.0', b'proto', version, b'mode', b'standalone']
+                        if version == 3:
+                            writer.write(b'%%%d\r\n' % (len(fields) // 2) + b''.join(
+                                b':%d\r\n' % item if isinstance(item, int) else _bulk(item) for item in fields))
+                        else:
+                            writer.write(_array(*fields))
+                elif command == b'PING':
+                    if self._subscriptions(writer) and self.protocols.get(writer) != 3:
+                        writer.write(_array(b'pong', args[1] if len(args) > 1 else b''))
+                    else:
+                        writer.write(_bulk(args[1]) if len(args) > 1 else b'+PONG\r\n')
+                elif command == b'ECHO' and len(args) == 2:
+                    writer.write(_bulk(args[1]))
+                elif command in (b'CLIENT', b'SELECT', b'AUTH'):
+                    writer.write(b'+OK\r\n')
+                elif command == b'QUIT':
+                    writer.write(b'+OK\r\n')
+                    await writer.drain()
+                    break
+                else:
+                    writer.write(b"-ERR unknown command '%s'\r\n" % args[0])
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            for channel in self._subscriptions(writer):
+                self._unsubscribe(writer, channel)
+            self.protocols.pop(writer, None)
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=0):
+        """启动服务器，返回 asyncio.Server（port=0 时自动分配端口）"""
+        return await asyncio.start_server(self.handle_connection, host, port, backlog=1024)
+
+
+async def _serve(host, port):
+    server = await RedisPubSubStub().start(host, port)
+    address = server.sockets[0].getsockname()
+    print(f"Redis 发布/订阅替身已启动: redis://{address[0]}:{address[1]}/0")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地 Redis 发布/订阅替身')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6390)
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\n👋 Redis 替身已停止")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+"""
+统计数据缓存（按用户，stale-while-revalidate）
+
+仪表盘、统计接口被多个浏览器标签页轮询，每次都执行一批 COUNT 查询。
+这里把计算结果按用户缓存：
+
+- 新鲜期（ttl）内直接返回缓存
+- 过期但仍在 stale 期内：立即返回旧值，并在后台线程重新计算（同一键只有一个刷新任务）
+- 完全没有缓存：同一进程内同一键只计算一次，其他请求等待结果
+- 数据变化时（模型信号）递增用户的版本号，旧缓存立即失效
+
+使用 settings.CACHES['stats']（见 runtime_settings 的 STATS_CACHE），
+多进程部署请使用 file 或 redis，locmem 只在单进程内有效。
+
+用法::
+
+    from utils.stats_cache import stats_cache
+
+    data = stats_cache.get_or_compute('dashboard', lambda: compute(user), user_id=user.id)
+    stats_cache.invalidate_user(user.id)
+"""
+import functools
+import logging
+import threading
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+from django.db import close_old_connections
+from django.http import HttpResponse
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+CACHE_ALIAS = 'stats'
+KEY_PREFIX = 'stats'
+DEFAULT_TTL = 30            # 新鲜期（秒）
+DEFAULT_STALE_TTL = 300     # 过期后仍可返回旧值的时间（秒）
+REFRESH_LOCK_TIMEOUT = 60
+GLOBAL = 'all'              # 不区分用户的统计（管理员视图）
+
+
+class StatsCache:
+
+    def __init__(self, alias=CACHE_ALIAS, ttl=DEFAULT_TTL, stale_ttl=DEFAULT_STALE_TTL):
+        self.alias = alias
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'hit': 0, 'stale': 0, 'miss': 0, 'refresh': 0, 'error': 0}
+
+    @property
+    def cache(self):
+        try:
+            return caches[self.alias]
+        except InvalidCacheBackendError:
+            return caches['default']
+
+    def _count(self, key):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def stats(self):
+        with self._stats_lock:
+            return dict(self._stats)
+
+    # ---- 版本 ----
+
+    def _version_key(self, user_id):
+        return f'{KEY_PREFIX}:ver:{GLOBAL if user_id is None else user_id}'
+
+    def _version(self, user_id):
+        return self.cache.get(self._version_key(user_id), 0)
+
+    def _bump(self, user_id):
+        key = self._version_key(user_id)
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            self.cache.set(key, 1, timeout=None)
+
+    def invalidate_user(self, user_id):
+        """使用户的统计缓存失效（同时失效全局统计）"""
+        if user_id is not None:
+            self._bump(user_id)
+        self._bump(None)
+
+    def invalidate_all(self):
+        self._bump(None)
+
+    def make_key(self, namespace, user_id=None, extra=''):
+        user = GLOBAL if user_id is None else user_id
+        # 全局统计只跟随全局版本，用户统计同时跟随用户版本和全局版本
+        versions = f'{self._version(None)}' if user_id is None else f'{self._version(user_id)}.{self._version(None)}'
+        return f'{KEY_PREFIX}:{namespace}:{user}:{versions}:{extra}'
+
+    # ---- 读取 ----
+
+    def _key_lock(self, key):
+        with self._locks_guard:
+            if len(self._locks) > 10000:
+                self._locks.clear()
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _store(self, key, value, ttl, stale_ttl):
+        entry = {'value': value, 'fresh_until': time.time() + ttl}
+        self.cache.set(key, entry, timeout=ttl + stale_ttl)
+
+    def _refresh_in_background(self, key, compute, ttl, stale_ttl):
+        lock_key = f'{key}:refreshing'
+        if not self.cache.add(lock_key, 1, timeout=REFRESH_LOCK_TIMEOUT):
+            return
+
+        def refresh():
+            try:
+                self._store(key, compute(), ttl, stale_ttl)
+                self._count('refresh')
+            except Exception:
+                self._count('error')
+                logger.exception('后台刷新统计缓存失败: %s', key)
+            finally:
+                self.cache.delete(lock_key)
+                close_old_connections()
+
+        threading.Thread(target=refresh, name='stats-cache-refresh', daemon=True).start()
+
+    def get_or_compute(self, namespace, compute, user_id=None, extra='', ttl=None, stale_ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        stale_ttl = self.stale_ttl if stale_ttl is None else stale_ttl
+        key = self.make_key(namespace, user_id, extra)
+
+        entry = self.cache.get(key)
+        if entry is not None:
+            if time.time() < entry['fresh_until']:
+                self._count('hit')
+            else:
+                self._count('stale')
+                self._refresh_in_background(key, compute, ttl, stale_ttl)
+            return entry['value']
+
+        with self._key_lock(key):
+            entry = self.cache.get(key)
+            if entry is not None:
+                self._count('hit')
+                return entry['value']
+            self._count('miss')
+            value = compute()
+            self._store(key, value, ttl, stale_ttl)
+            return value
+
+
+stats_cache = StatsCache()
+
+
+def cached_view(view, namespace, per_user=True, ttl=None, stale_ttl=None, csrf_exempt=None):
+    """缓存 GET 接口的响应（JSON / DRF Response），view 可以是函数或导入路径
+
+    只为已登录用户读写缓存（per_user=False 时所有已登录用户共享一份），未登录请求直接交给
+    原视图处理权限。view 为导入路径时不会提前导入，DRF 视图需要传 csrf_exempt=True
+    以保留 @api_view 的 CSRF 豁免。
+    """
+    resolved = {}
+
+    def get_view():
+        if 'view' not in resolved:
+            resolved['view'] = import_string(view) if isinstance(view, str) else view
+        return resolved['view']
+
+    def wrapper(request, *args, **kwargs):
+        func = get_view()
+        if request.method != 'GET':
+            return func(request, *args, **kwargs)
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            return func(request, *args, **kwargs)
+
+        def compute():
+            response = func(request, *args, **kwargs)
+            if hasattr(response, 'render') and callable(response.render):
+                response.render()
+            return {
+                'status': response.status_code,
+                'content': response.content,
+                'content_type': response.get('Content-Type'),
+            }
+
+        user_id = user.id if per_user else None
+        extra = request.get_full_path()
+        data = stats_cache.get_or_compute(namespace, compute, user_id=user_id, extra=extra,
+                                          ttl=ttl, stale_ttl=stale_ttl)
+        if data['status'] != 200:
+            # 错误响应不缓存
+            stats_cache.cache.delete(stats_cache.make_key(namespace, user_id, extra))
+        return HttpResponse(data['content'], status=data['status'], content_type=data['content_type'])
+
+    if not isinstance(view, str):
+        wrapper = functools.wraps(view)(wrapper)
+    if csrf_exempt is None:
+        csrf_exempt = False if isinstance(view, str) else getattr(view, 'csrf_exempt', False)
+    wrapper.csrf_exempt = csrf_exempt
+    return wrapper
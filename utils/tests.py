@@ -0,0 +1,173 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.test import SimpleTestCase
+
+from utils import protocol_client
+from utils.coalescing import CoalescingCache, SingleFlight
+
+
+class LoaderError(Exception):
+    pass
+
+
+def _start_leader(flight, key, func):
+    """在线程中以 key 调用 flight.do(func)，返回 (线程, 结果列表)"""
+    outcome = []
+
+    def run():
+        try:
+            outcome.append(('value', flight.do(key, func)))
+        except Exception as e:
+            outcome.append(('error', e))
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread, outcome
+
+
+def _on_wait(flight, key):
+    """返回一个 Event：有调用开始等待 key 的进行中请求时置位"""
+    call = flight._calls[key]
+    waiting = threading.Event()
+    original = call.event.wait
+
+    def wait(*args, **kwargs):
+        waiting.set()
+        return original(*args, **kwargs)
+
+    call.event.wait = wait
+    return waiting
+
+
+class SingleFlightErrorTests(SimpleTestCase):
+    def test_waiter_receives_leader_error(self):
+        flight = SingleFlight()
+        entered = threading.Event()
+        release = threading.Event()
+        error = LoaderError('protocol down')
+        calls = []
+
+        def failing():
+            calls.append('leader')
+            entered.set()
+            release.wait(5)
+            raise error
+
+        leader, leader_outcome = _start_leader(flight, 'k', failing)
+        self.assertTrue(entered.wait(5))
+        waiting = _on_wait(flight, 'k')
+
+        waiter, waiter_outcome = _start_leader(flight, 'k', lambda: calls.append('waiter'))
+        self.assertTrue(waiting.wait(5))
+        release.set()
+        leader.join(5)
+        waiter.join(5)
+
+        self.assertEqual(leader_outcome, [('error', error)])
+        self.assertEqual(waiter_outcome, [('error', error)])
+        self.assertEqual(calls, ['leader'])
+
+    def test_failed_key_is_released(self):
+        flight = SingleFlight()
+
+        def failing():
+            raise LoaderError('boom')
+
+        with self.assertRaises(LoaderError):
+            flight.do('k', failing)
+        self.assertEqual(flight._calls, {})
+        self.assertEqual(flight.do('k', lambda: 42), (42, False))
+
+
+class CoalescingCacheErrorTests(SimpleTestCase):
+    def test_leader_error_is_raised_and_not_cached(self):
+        cache = CoalescingCache(ttl=60)
+
+        def failing():
+            raise LoaderError('boom')
+
+        with self.assertRaises(LoaderError):
+            cache.fetch('k', failing)
+        self.assertEqual(cache.fetch('k', lambda: 'ok'), ('ok', 'miss'))
+        self.assertEqual(cache.fetch('k', failing), ('ok', 'hit'))
+        self.assertEqual(cache.stats()['errors'], 1)
+
+    def test_waiter_retries_with_own_loader_after_shared_failure(self):
+        cache = CoalescingCache(ttl=60)
+        entered = threading.Event()
+        release = threading.Event()
+
+        def failing():
+            entered.set()
+            release.wait(5)
+            raise LoaderError('leader account expired')
+
+        outcome = []
+        leader = threading.Thread(target=lambda: outcome.append(self._fetch(cache, failing)), daemon=True)
+        leader.start()
+        self.assertTrue(entered.wait(5))
+        waiting = _on_wait(cache.flight, 'k')
+
+        result = []
+        waiter = threading.Thread(target=lambda: result.append(cache.fetch('k', lambda: 'fresh')), daemon=True)
+        waiter.start()
+        self.assertTrue(waiting.wait(5))
+        release.set()
+        leader.join(5)
+        waiter.join(5)
+
+        self.assertIsInstance(outcome[0], LoaderError)
+        self.assertEqual(result, [('fresh', 'miss')])
+        self.assertEqual(cache.fetch('k', failing), ('fresh', 'hit'))
+
+    @staticmethod
+    def _fetch(cache, loader):
+        try:
+            return cache.fetch('k', loader)
+        except LoaderError as e:
+            return e
+
+
+class _UnavailableHandler(BaseHTTPRequestHandler):
+    """所有请求返回 503，记录请求次数"""
+
+    def do_GET(self):
+        self.server.hits += 1
+        self.send_response(503)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class ProtocolClientRetryTests(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _UnavailableHandler)
+        self.server.hits = 0
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.base_url = f'http://127.0.0.1:{self.server.server_port}'
+
+    def test_shared_session_retries(self):
+        client = protocol_client.ProtocolClient(self.base_url, retry_count=2, retry_interval=0)
+        self.addCleanup(client.close)
+        self.assertEqual(client.get('/health').status_code, 503)
+        self.assertEqual(self.server.hits, 3)
+
+    def test_probe_request_is_not_retried(self):
+        client = protocol_client.ProtocolClient(self.base_url, retry_count=2, retry_interval=0)
+        self.addCleanup(client.close)
+        self.assertEqual(client.get('/health', retry=False).status_code, 503)
+        self.assertEqual(self.server.hits, 1)
+
+    def test_connection_health_check_is_a_single_request(self):
+        from connections.models import Connection
+
+        self.addCleanup(protocol_client.close_all)
+        connection = Connection(name='c', url=self.base_url, connection_type='WeCharPadPro')
+        self.assertFalse(connection.test_connection())
+        self.assertEqual(self.server.hits, 1)
@@ -90,6 +90,11 @@ class QRCodeSession(models.Model):
         verbose_name_plural = '二维码会话'
         db_table = 'qr_code_session'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+            models.Index(fields=['connection', '-created_at']),
+            models.Index(fields=['status', 'expires_at']),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.get_session_type_display()} - {self.get_status_display()}"
@@ -164,6 +169,11 @@ class LoginRecord(models.Model):
         verbose_name_plural = '登录记录'
         db_table = 'wechat_login_record'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['user', '-created_at']),
+            models.Index(fields=['connection', '-created_at']),
+        ]
     
     def __str__(self):
         status = '成功' if self.success else '失败'